@@ -1,30 +1,96 @@
+import json
+import os
+import time
+from functools import lru_cache
 import dash
-from dash import dcc, html, Input, Output, State, callback_context
+from dash import dcc, html, Input, Output, State, ClientsideFunction, callback_context
+from dash.exceptions import PreventUpdate
+from flask import Response, request, stream_with_context
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import pandas as pd
+from plotly.utils import PlotlyJSONEncoder
 import numpy as np
 from wealth_inequality_sim import WealthInequalitySimulation, AgentStyle
+from array_codec import encode_array
+from emulator import SweepEmulator
+from mean_field import predict, simulation_config
+from state_store import get_store, new_session_id
+from sweep import (MAX_STEPS, PREDICTION_PREFIX, SWEEP_PARAMETERS, SweepRunner, axis_values,
+                   get_cache, plan_sweep)
 
 # Initialize Dash app
 app = dash.Dash(__name__, suppress_callback_exceptions=True)
 app.title = "Wealth Inequality Emergence"
+server = app.server  # Expose Flask server for gunicorn
+
+# Server-side session state (set WEALTH_SIM_STORE=sqlite:///sessions.db for multiple workers)
+STORE = get_store()
+
+# Replay checkpoints: every 1000 rounds, thinned to at most 50 per session
+CHECKPOINT_INTERVAL = 1000
+MAX_CHECKPOINTS = 50
+
+# Distribution snapshots are never charted, so keep compact quantile
+# summaries (a few KB each) that the session store can afford to persist
+SNAPSHOT_MODE = 'quantiles'
+SNAPSHOT_QUANTILES = 101
+
+# Live updates are pushed over Server-Sent Events (<prefix>stream/<session_id>);
+# WEALTH_SIM_PUSH=0 falls back to polling through the 50ms interval
+PUSH_UPDATES = os.environ.get('WEALTH_SIM_PUSH', '1') != '0'
+STREAM_FPS = 20  # Frames per second while a run is streaming
+STREAM_MAX_POINTS = 5000  # Points kept per trace as deltas extend the charts
+WEALTH_BINS = 40
+
+# Mean-field "predicted" Gini on the inequality chart: 100 trades per agent
+# (50 N rounds), doubled whenever the run outgrows it
+PREDICTION_TRADES = 100
+
+# Parameter sweeps (/sweep): cells run on a background process pool
+# ($WEALTH_SIM_SWEEP_WORKERS processes per web worker) and their results
+# are cached for every user in the session store's database
+SWEEP_CACHE = get_cache()
+SWEEP_RUNNER = SweepRunner(SWEEP_CACHE, int(os.environ.get('WEALTH_SIM_SWEEP_WORKERS', 0)) or None)
+SWEEP_POLL_MS = 1000  # Heatmap refresh while cells are running
+SWEEP_MAX_REPLICAS = 200  # Per cell, when running to a precision target
+# Instant previews on the Simulation page, emulated from the cached sweep cells
+EMULATOR = SweepEmulator(SWEEP_CACHE)
+SWEEP_OPTIONS = [{'label': label, 'value': name} for name, (label, _) in SWEEP_PARAMETERS.items()]
+SWEEP_COLUMN_STYLE = {'width': '32%', 'display': 'inline-block', 'verticalAlign': 'top',
+                      'padding': '15px', 'backgroundColor': 'white', 'borderRadius': '4px',
+                      'border': '1px solid #ecf0f1', 'boxSizing': 'border-box'}
+SWEEP_INPUT_STYLE = {'width': '30%', 'marginRight': '3%', 'padding': '6px',
+                     'border': '1px solid #ddd', 'borderRadius': '4px'}
+
+# Chart series dtypes (sent as base64 typed arrays, see array_codec)
+SERIES_DTYPES = {
+    'gini_history': 'f4',
+    'active_count_history': 'i4',
+    'top_10_percent_history': 'f4',
+    'top_1_percent_history': 'f4',
+}
 
 # App layout
 app.layout = html.Div([
     # Store components
-    dcc.Store(id='sim-state', data=None),
+    dcc.Store(id='sim-state', data=None),  # Session token only - the simulation lives in STORE
     dcc.Store(id='running-state', data=False),
-    dcc.Interval(id='interval-component', interval=50, disabled=True),  # Faster updates (50ms)
+    dcc.Interval(id='interval-component', interval=50, disabled=True),  # Polling fallback (50ms)
+    dcc.Store(id='push-status', data=None),  # Written by the live-updates client
+    dcc.Location(id='url'),
     
     # Header
     html.Div([
         html.H1("Wealth Inequality Emergence", 
                 style={'textAlign': 'center', 'color': '#2c3e50', 'marginBottom': '5px', 'fontWeight': '300', 'fontSize': '42px'}),
+        # Page links (both pages stay mounted, see display_page)
+        html.Div([
+            dcc.Link("Simulation", href=app.get_relative_path('/'), style={'marginRight': '20px', 'color': '#3498db'}),
+            dcc.Link("Sweep", href=app.get_relative_path('/sweep'), style={'color': '#3498db'}),
+        ], style={'textAlign': 'center', 'marginBottom': '15px', 'fontSize': '15px'}),
     ]),
     
     # Parameters panel
-    html.Div([
+    html.Div(id='simulation-controls', children=[
         # Parameters in one row
         html.Div([
             # Column 1: Basic Setup
@@ -49,7 +115,7 @@ app.layout = html.Div([
                       'padding': '20px', 'marginRight': '0.75%',
                       'backgroundColor': 'white', 'borderRadius': '4px', 
                       'border': '1px solid #ecf0f1',
-                      'boxSizing': 'border-box', 'height': '300px'}),
+                      'boxSizing': 'border-box', 'height': '340px'}),
             
             # Column 2: Agent Styles
             html.Div([
@@ -73,7 +139,7 @@ app.layout = html.Div([
                       'padding': '20px', 'marginLeft': '0.75%', 'marginRight': '0.75%',
                       'backgroundColor': 'white', 'borderRadius': '4px', 
                       'border': '1px solid #ecf0f1',
-                      'boxSizing': 'border-box', 'height': '300px'}),
+                      'boxSizing': 'border-box', 'height': '340px'}),
             
             # Column 3: Rich-Get-Richer Bias
             html.Div([
@@ -90,11 +156,20 @@ app.layout = html.Div([
                     html.Div("Poorer: 50% - bias", style={'fontSize': '12px', 'color': '#7f8c8d'}),
                 ], style={'marginTop': '20px', 'padding': '12px', 'backgroundColor': '#f8f9fa', 
                          'borderRadius': '4px', 'border': '1px solid #ecf0f1'}),
+                
+                html.Label("Trading Network", style={'marginTop': '15px', 'fontSize': '13px', 'color': '#7f8c8d', 'display': 'block', 'marginBottom': '5px'}),
+                dcc.Dropdown(id='topology', value='none', clearable=False,
+                            options=[{'label': 'Everyone (random pairs)', 'value': 'none'},
+                                     {'label': 'Ring', 'value': 'ring'},
+                                     {'label': 'Lattice', 'value': 'lattice'},
+                                     {'label': 'Erdős–Rényi', 'value': 'erdos_renyi'},
+                                     {'label': 'Barabási–Albert', 'value': 'barabasi_albert'}],
+                            style={'fontSize': '13px'}),
             ], style={'width': '32.5%', 'display': 'inline-block', 'verticalAlign': 'top', 
                       'padding': '20px', 'marginLeft': '0.75%',
                       'backgroundColor': 'white', 'borderRadius': '4px', 
                       'border': '1px solid #ecf0f1',
-                      'boxSizing': 'border-box', 'height': '300px'}),
+                      'boxSizing': 'border-box', 'height': '340px'}),
         ], style={'marginBottom': '20px', 'whiteSpace': 'nowrap'}),
         
         # Redistribution Policies Row
@@ -121,6 +196,22 @@ app.layout = html.Div([
                 dcc.Slider(id='wealth-tax-rate', min=0.001, max=0.10, step=0.001, value=0.02,
                           marks={0.001: '0.1%', 0.02: '2%', 0.05: '5%', 0.10: '10%'},
                           tooltip={"placement": "bottom", "always_visible": True}),
+                
+                dcc.RadioItems(id='wealth-tax-mode', value='flat', inline=True,
+                              options=[{'label': ' Flat (top %)', 'value': 'flat'},
+                                       {'label': ' Progressive', 'value': 'progressive'}],
+                              style={'marginTop': '10px', 'fontSize': '12px', 'color': '#2c3e50'},
+                              inputStyle={'marginLeft': '10px'}),
+                
+                html.Label("Progressivity γ (rate = r × (w / median)^γ)", style={'marginTop': '10px', 'fontSize': '12px', 'color': '#7f8c8d', 'display': 'block', 'marginBottom': '5px'}),
+                dcc.Slider(id='wealth-tax-exponent', min=0.0, max=3.0, step=0.1, value=1.0,
+                          marks={0: '0', 1: '1', 2: '2', 3: '3'},
+                          tooltip={"placement": "bottom", "always_visible": True}),
+                
+                html.Label("Collect Every k Rounds", style={'marginTop': '10px', 'fontSize': '12px', 'color': '#7f8c8d', 'display': 'block', 'marginBottom': '5px'}),
+                dcc.Input(id='wealth-tax-interval', type='number', value=1, min=1, max=1000, step=1,
+                         style={'width': '100%', 'padding': '6px', 'fontSize': '12px', 'border': '1px solid #dfe6e9',
+                                'borderRadius': '4px', 'boxSizing': 'border-box'}),
             ], style={'width': '32%', 'display': 'inline-block', 'verticalAlign': 'top', 
                       'padding': '15px', 'marginRight': '2%',
                       'backgroundColor': 'white', 'borderRadius': '4px', 
@@ -185,18 +276,27 @@ app.layout = html.Div([
         
         html.Div(id='validation-message', 
                 style={'marginTop': '8px', 'color': '#e74c3c', 'textAlign': 'center', 'fontSize': '13px'}),
-        
+        html.Div(id='emulator-preview',
+                style={'marginTop': '8px', 'color': '#7f8c8d', 'textAlign': 'center', 'fontSize': '13px'}),
+    
     ], style={'backgroundColor': '#f8f9fa', 'padding': '20px', 'borderRadius': '4px', 
               'marginBottom': '20px', 'border': '1px solid #ecf0f1'}),
     
     # Main content
-    html.Div([
+    html.Div(id='simulation-main', children=[
         # Status bar
         html.Div(id='status-bar', style={'padding': '10px', 'backgroundColor': '#3498db',
                                          'color': 'white', 'borderRadius': '4px',
                                          'marginBottom': '15px', 'fontSize': '13px',
                                          'textAlign': 'center'}),
         
+        # Replay scrubber (jump to any past round while stopped)
+        html.Div([
+            html.Label("Replay round", style={'fontSize': '13px', 'color': '#7f8c8d'}),
+            dcc.Slider(id='seek-round', min=0, max=0, step=1, value=0, disabled=True,
+                      marks=None, tooltip={"placement": "bottom", "always_visible": False}),
+        ], style={'marginBottom': '15px'}),
+        
         # Key metrics
         html.Div(id='key-metrics', style={'marginBottom': '15px'}),
         
@@ -216,10 +316,104 @@ app.layout = html.Div([
         
         # Results table
         html.Div(id='results-table', style={'marginBottom': '15px', 'marginTop': '15px'}),
+    
+    ], style={'padding': '0 20px'}),
+    
+    # Sweep page: final Gini / top 1% / bankruptcy over a grid of two parameters,
+    # everything else taken from the Simulation page
+    html.Div(id='sweep-page', hidden=True, children=[
+        dcc.Store(id='sweep-plan', data=None),  # Axes and cell keys - results live in SWEEP_CACHE
+        dcc.Interval(id='sweep-interval', interval=SWEEP_POLL_MS, disabled=True),
+        
+        html.Div([
+            html.Div([
+                html.H4("Horizontal axis", style={'color': '#2c3e50', 'marginTop': '0', 'fontWeight': '400'}),
+                dcc.Dropdown(id='sweep-x-param', options=SWEEP_OPTIONS, value='rich_bias', clearable=False),
+                html.Label("Min / max / steps", style={'fontSize': '13px', 'color': '#7f8c8d', 'display': 'block', 'marginTop': '10px'}),
+                dcc.Input(id='sweep-x-min', type='number', value=0.0, style=SWEEP_INPUT_STYLE),
+                dcc.Input(id='sweep-x-max', type='number', value=0.15, style=SWEEP_INPUT_STYLE),
+                dcc.Input(id='sweep-x-steps', type='number', value=8, min=1, max=MAX_STEPS, step=1, style=SWEEP_INPUT_STYLE),
+            ], style=SWEEP_COLUMN_STYLE),
+            html.Div([
+                html.H4("Vertical axis", style={'color': '#2c3e50', 'marginTop': '0', 'fontWeight': '400'}),
+                dcc.Dropdown(id='sweep-y-param', options=SWEEP_OPTIONS, value='wealth_tax_rate', clearable=False),
+                html.Label("Min / max / steps", style={'fontSize': '13px', 'color': '#7f8c8d', 'display': 'block', 'marginTop': '10px'}),
+                dcc.Input(id='sweep-y-min', type='number', value=0.001, style=SWEEP_INPUT_STYLE),
+                dcc.Input(id='sweep-y-max', type='number', value=0.10, style=SWEEP_INPUT_STYLE),
+                dcc.Input(id='sweep-y-steps', type='number', value=8, min=1, max=MAX_STEPS, step=1, style=SWEEP_INPUT_STYLE),
+            ], style={**SWEEP_COLUMN_STYLE, 'marginLeft': '2%'}),
+            html.Div([
+                html.H4("Runs per cell", style={'color': '#2c3e50', 'marginTop': '0', 'fontWeight': '400'}),
+                html.Label("Rounds / replicas / Gini precision (+-)", style={'fontSize': '13px', 'color': '#7f8c8d', 'display': 'block'}),
+                dcc.Input(id='sweep-rounds', type='number', value=20000, min=100, max=1000000, step=100, style=SWEEP_INPUT_STYLE),
+                dcc.Input(id='sweep-replicas', type='number', value=2, min=1, max=20, step=1, style=SWEEP_INPUT_STYLE),
+                dcc.Input(id='sweep-precision', type='number', placeholder='off', min=0.001, max=0.1, step=0.001,
+                          style=SWEEP_INPUT_STYLE),
+                dcc.Checklist(
+                    id='sweep-preview',
+                    options=[{'label': ' Mean-field preview (steep regions run first)', 'value': 'enabled'}],
+                    value=['enabled'],
+                    style={'fontSize': '13px', 'marginTop': '10px'}
+                ),
+                html.P("With a precision, replicas is the first wave: cells add replicas until their "
+                       "final Gini is known to +- that at 95% (noisy cells get more runs). "
+                       "Agents, initial wealth and all other settings come from the Simulation page.",
+                       style={'fontSize': '12px', 'color': '#95a5a6', 'marginTop': '10px'}),
+            ], style={**SWEEP_COLUMN_STYLE, 'marginLeft': '2%'}),
+        ], style={'marginBottom': '15px'}),
+        
+        html.Div([
+            html.Button('Run sweep', id='sweep-btn', n_clicks=0,
+                       style={'width': '140px', 'padding': '10px 20px', 'fontSize': '14px', 'fontWeight': '500',
+                              'backgroundColor': '#27ae60', 'color': 'white', 'border': 'none',
+                              'borderRadius': '4px', 'cursor': 'pointer'}),
+        ], style={'textAlign': 'center'}),
+        html.Div(id='sweep-status', style={'padding': '10px', 'backgroundColor': '#3498db',
+                                           'color': 'white', 'borderRadius': '4px', 'margin': '15px 0',
+                                           'fontSize': '13px', 'textAlign': 'center'}),
         
+        # Heatmaps fill in as cells finish
+        html.Div([
+            html.Div([dcc.Graph(id='sweep-gini', config={'displayModeBar': False})],
+                    style={'width': '32%', 'display': 'inline-block'}),
+            html.Div([dcc.Graph(id='sweep-top-1', config={'displayModeBar': False})],
+                    style={'width': '32%', 'display': 'inline-block', 'marginLeft': '2%'}),
+            html.Div([dcc.Graph(id='sweep-bankrupt', config={'displayModeBar': False})],
+                    style={'width': '32%', 'display': 'inline-block', 'marginLeft': '2%'}),
+        ]),
     ], style={'padding': '0 20px'}),
 ])
 
+# Button styles (shared by the control callback and the auto-stop on convergence)
+START_ENABLED_STYLE = {
+    'width': '120px', 'padding': '10px 20px', 'fontSize': '14px', 'fontWeight': '500',
+    'backgroundColor': '#27ae60', 'color': 'white', 'border': 'none',
+    'borderRadius': '4px', 'cursor': 'pointer', 'marginRight': '10px'
+}
+START_DISABLED_STYLE = {
+    'width': '120px', 'padding': '10px 20px', 'fontSize': '14px', 'fontWeight': '500',
+    'backgroundColor': '#1e7e34', 'color': '#cccccc', 'border': 'none',
+    'borderRadius': '4px', 'cursor': 'not-allowed', 'marginRight': '10px', 'opacity': '0.7'
+}
+STOP_ENABLED_STYLE = {
+    'width': '120px', 'padding': '10px 20px', 'fontSize': '14px', 'fontWeight': '500',
+    'backgroundColor': '#e74c3c', 'color': 'white', 'border': 'none',
+    'borderRadius': '4px', 'cursor': 'pointer', 'marginRight': '10px'
+}
+STOP_DISABLED_STYLE = {
+    'width': '120px', 'padding': '10px 20px', 'fontSize': '14px', 'fontWeight': '500',
+    'backgroundColor': '#95a5a6', 'color': '#cccccc', 'border': 'none',
+    'borderRadius': '4px', 'cursor': 'not-allowed', 'marginRight': '10px', 'opacity': '0.6'
+}
+
+def save_session(sim, sim_data):
+    """Store the simulation server-side and return the token kept in the browser"""
+    session_id = sim_data['session_id'] if sim_data else new_session_id()
+    with STORE.lock(session_id):
+        STORE.save_simulation(session_id, sim)
+    # Fresh revision so dependent callbacks re-render even if the round is unchanged
+    return {'session_id': session_id, 'revision': new_session_id()}
+
 # Callbacks
 @app.callback(
     Output('contrarian-display', 'children'),
@@ -230,6 +424,54 @@ def update_contrarian(greedy, neutral):
     contrarian = 1.0 - greedy - neutral
     return f"Contrarian Ratio: {contrarian:.2f}"
 
+@app.callback(
+    Output('emulator-preview', 'children'),
+    [Input('n-agents', 'value'),
+     Input('initial-wealth', 'value'),
+     Input('greedy-ratio', 'value'),
+     Input('neutral-ratio', 'value'),
+     Input('rich-bias', 'value'),
+     Input('wealth-tax-enabled', 'value'),
+     Input('wealth-tax-threshold', 'value'),
+     Input('wealth-tax-rate', 'value'),
+     Input('wealth-tax-mode', 'value'),
+     Input('wealth-tax-exponent', 'value'),
+     Input('wealth-tax-interval', 'value'),
+     Input('ubi-enabled', 'value'),
+     Input('ubi-amount', 'value'),
+     Input('safety-net-enabled', 'value'),
+     Input('safety-net-floor', 'value'),
+     Input('topology', 'value')]
+)
+def preview_outcome(n_agents, initial_wealth, greedy_ratio, neutral_ratio, rich_bias,
+                    wealth_tax_enabled_list, wealth_tax_threshold, wealth_tax_rate, wealth_tax_mode,
+                    wealth_tax_exponent, wealth_tax_interval, ubi_enabled_list, ubi_amount,
+                    safety_net_enabled_list, safety_net_floor, topology):
+    """Expected outcome of the current settings, emulated from finished sweep cells"""
+    EMULATOR.refresh()  # Picks up new cells in the background, at most every few seconds
+    if None in (n_agents, initial_wealth, greedy_ratio, neutral_ratio, rich_bias):
+        return ""
+    emulation = EMULATOR.predict(dict(
+        n_agents=n_agents, initial_wealth=initial_wealth,
+        greedy_ratio=greedy_ratio, neutral_ratio=neutral_ratio, rich_bias=rich_bias,
+        wealth_tax_enabled=bool(wealth_tax_enabled_list), wealth_tax_threshold=wealth_tax_threshold,
+        wealth_tax_rate=wealth_tax_rate, wealth_tax_mode=wealth_tax_mode,
+        wealth_tax_exponent=wealth_tax_exponent, wealth_tax_interval=wealth_tax_interval or 1,
+        ubi_enabled=bool(ubi_enabled_list), ubi_amount=ubi_amount,
+        safety_net_enabled=bool(safety_net_enabled_list), safety_net_floor=safety_net_floor,
+        topology=None if topology in (None, 'none') else topology,
+    ))
+    if emulation is None:
+        return "No sweep results with these policies and network yet: run a sweep to get instant previews"
+    mean, std = emulation.mean, emulation.std
+    text = (f"Preview after {emulation.n_rounds:,} rounds (from {emulation.cells} sweep cells): "
+            f"Gini {mean['gini']:.2f} \u00b1 {2 * std['gini']:.2f}, "
+            f"top 1% {mean['top_1_percent']:.1f} \u00b1 {2 * std['top_1_percent']:.1f}%, "
+            f"survival {100 * (1 - mean['bankrupt_fraction']):.0f} \u00b1 {200 * std['bankrupt_fraction']:.0f}%")
+    if emulation.nearest > 1.0:
+        text += " - far from any computed cell, so only a rough guess"
+    return text
+
 @app.callback(
     [Output('sim-state', 'data'),
      Output('running-state', 'data'),
@@ -251,10 +493,14 @@ def update_contrarian(greedy, neutral):
      State('wealth-tax-enabled', 'value'),
      State('wealth-tax-threshold', 'value'),
      State('wealth-tax-rate', 'value'),
+     State('wealth-tax-mode', 'value'),
+     State('wealth-tax-exponent', 'value'),
+     State('wealth-tax-interval', 'value'),
      State('ubi-enabled', 'value'),
      State('ubi-amount', 'value'),
      State('safety-net-enabled', 'value'),
      State('safety-net-floor', 'value'),
+     State('topology', 'value'),
      State('sim-state', 'data'),
      State('running-state', 'data')]
 )
@@ -262,36 +508,22 @@ def control_simulation(start_clicks, stop_clicks, reset_clicks,
                        n_agents, initial_wealth, greedy_ratio, neutral_ratio,
                        rich_bias, speed_multiplier,
                        wealth_tax_enabled_list, wealth_tax_threshold, wealth_tax_rate,
+                       wealth_tax_mode, wealth_tax_exponent, wealth_tax_interval,
                        ubi_enabled_list, ubi_amount,
-                       safety_net_enabled_list, safety_net_floor,
+                       safety_net_enabled_list, safety_net_floor, topology,
                        sim_data, is_running):
     
-    # Define button styles
-    start_enabled_style = {
-        'width': '120px', 'padding': '10px 20px', 'fontSize': '14px', 'fontWeight': '500',
-        'backgroundColor': '#27ae60', 'color': 'white', 'border': 'none',
-        'borderRadius': '4px', 'cursor': 'pointer', 'marginRight': '10px'
-    }
-    start_disabled_style = {
-        'width': '120px', 'padding': '10px 20px', 'fontSize': '14px', 'fontWeight': '500',
-        'backgroundColor': '#1e7e34', 'color': '#cccccc', 'border': 'none',
-        'borderRadius': '4px', 'cursor': 'not-allowed', 'marginRight': '10px', 'opacity': '0.7'
-    }
-    stop_enabled_style = {
-        'width': '120px', 'padding': '10px 20px', 'fontSize': '14px', 'fontWeight': '500',
-        'backgroundColor': '#e74c3c', 'color': 'white', 'border': 'none',
-        'borderRadius': '4px', 'cursor': 'pointer', 'marginRight': '10px'
-    }
-    stop_disabled_style = {
-        'width': '120px', 'padding': '10px 20px', 'fontSize': '14px', 'fontWeight': '500',
-        'backgroundColor': '#95a5a6', 'color': '#cccccc', 'border': 'none',
-        'borderRadius': '4px', 'cursor': 'not-allowed', 'marginRight': '10px', 'opacity': '0.6'
-    }
+    # Button styles
+    start_enabled_style = START_ENABLED_STYLE
+    start_disabled_style = START_DISABLED_STYLE
+    stop_enabled_style = STOP_ENABLED_STYLE
+    stop_disabled_style = STOP_DISABLED_STYLE
     
     # Helper to convert checklist values
     wealth_tax_enabled = True if wealth_tax_enabled_list else False
     ubi_enabled = True if ubi_enabled_list else False
     safety_net_enabled = True if safety_net_enabled_list else False
+    topology = None if topology in (None, 'none') else topology
     
     ctx = callback_context
     if not ctx.triggered:
@@ -307,13 +539,21 @@ def control_simulation(start_clicks, stop_clicks, reset_clicks,
             wealth_tax_enabled=wealth_tax_enabled,
             wealth_tax_threshold=wealth_tax_threshold,
             wealth_tax_rate=wealth_tax_rate,
+            wealth_tax_mode=wealth_tax_mode,
+            wealth_tax_exponent=wealth_tax_exponent,
+            wealth_tax_interval=wealth_tax_interval or 1,
             ubi_enabled=ubi_enabled,
             ubi_amount=ubi_amount,
             safety_net_enabled=safety_net_enabled,
             safety_net_floor=safety_net_floor,
+            topology=topology,
+            checkpoint_interval=CHECKPOINT_INTERVAL,
+            max_checkpoints=MAX_CHECKPOINTS,
+            snapshot_mode=SNAPSHOT_MODE,
+            snapshot_quantiles=SNAPSHOT_QUANTILES,
         )
         sim.reset()
-        sim_data = sim.to_dict()
+        sim_data = save_session(sim, sim_data)
         return (sim_data, False, True, "", False, True, start_enabled_style, stop_disabled_style)
     
     button_id = ctx.triggered[0]['prop_id'].split('.')[0]
@@ -332,16 +572,24 @@ def control_simulation(start_clicks, stop_clicks, reset_clicks,
                 wealth_tax_enabled=wealth_tax_enabled,
                 wealth_tax_threshold=wealth_tax_threshold,
                 wealth_tax_rate=wealth_tax_rate,
+                wealth_tax_mode=wealth_tax_mode,
+                wealth_tax_exponent=wealth_tax_exponent,
+                wealth_tax_interval=wealth_tax_interval or 1,
                 ubi_enabled=ubi_enabled,
                 ubi_amount=ubi_amount,
                 safety_net_enabled=safety_net_enabled,
                 safety_net_floor=safety_net_floor,
+                topology=topology,
+                checkpoint_interval=CHECKPOINT_INTERVAL,
+                max_checkpoints=MAX_CHECKPOINTS,
+                snapshot_mode=SNAPSHOT_MODE,
+                snapshot_quantiles=SNAPSHOT_QUANTILES,
             )
             sim.reset()
-            sim_data = sim.to_dict()
+            sim_data = save_session(sim, sim_data)
         
-        # Start simulation: disable Start (dark green), enable Stop (red)
-        return (sim_data, True, False, "", True, False, start_disabled_style, stop_enabled_style)
+        # Start simulation: disable Start (dark green), enable Stop (red); poll only without push
+        return (sim_data, True, PUSH_UPDATES, "", True, False, start_disabled_style, stop_enabled_style)
     
     elif button_id == 'stop-btn':
         # Stop simulation: enable Start (green), disable Stop (gray)
@@ -356,19 +604,27 @@ def control_simulation(start_clicks, stop_clicks, reset_clicks,
             wealth_tax_enabled=wealth_tax_enabled,
             wealth_tax_threshold=wealth_tax_threshold,
             wealth_tax_rate=wealth_tax_rate,
+            wealth_tax_mode=wealth_tax_mode,
+            wealth_tax_exponent=wealth_tax_exponent,
+            wealth_tax_interval=wealth_tax_interval or 1,
             ubi_enabled=ubi_enabled,
             ubi_amount=ubi_amount,
             safety_net_enabled=safety_net_enabled,
             safety_net_floor=safety_net_floor,
+            topology=topology,
+            checkpoint_interval=CHECKPOINT_INTERVAL,
+            max_checkpoints=MAX_CHECKPOINTS,
+            snapshot_mode=SNAPSHOT_MODE,
+            snapshot_quantiles=SNAPSHOT_QUANTILES,
         )
         sim.reset()
-        sim_data = sim.to_dict()
+        sim_data = save_session(sim, sim_data)
         # Reset: enable Start (green), disable Stop (gray)
         return (sim_data, False, True, "", False, True, start_enabled_style, stop_disabled_style)
     
     # Default: based on current running state
     if is_running:
-        return (sim_data, True, False, "", True, False, start_disabled_style, stop_enabled_style)
+        return (sim_data, True, PUSH_UPDATES, "", True, False, start_disabled_style, stop_enabled_style)
     else:
         return (sim_data, False, True, "", False, True, start_enabled_style, stop_disabled_style)
 
@@ -382,7 +638,18 @@ def control_simulation(start_clicks, stop_clicks, reset_clicks,
      Output('concentration-chart', 'figure'),
      Output('results-table', 'children'),
      Output('interval-component', 'interval'),
-     Output('sim-state', 'data', allow_duplicate=True)],
+     Output('sim-state', 'data', allow_duplicate=True),
+     # Auto-stop once the run has converged
+     Output('running-state', 'data', allow_duplicate=True),
+     Output('interval-component', 'disabled', allow_duplicate=True),
+     Output('start-btn', 'disabled', allow_duplicate=True),
+     Output('stop-btn', 'disabled', allow_duplicate=True),
+     Output('start-btn', 'style', allow_duplicate=True),
+     Output('stop-btn', 'style', allow_duplicate=True),
+     # Replay scrubber follows the current round
+     Output('seek-round', 'max'),
+     Output('seek-round', 'value'),
+     Output('seek-round', 'disabled')],
     [Input('interval-component', 'n_intervals'),
      Input('sim-state', 'data')],
     [State('running-state', 'data'),
@@ -392,18 +659,21 @@ def control_simulation(start_clicks, stop_clicks, reset_clicks,
 def update_simulation(n_intervals, sim_data, is_running, speed_multiplier):
     """Update simulation and display - triggered by interval OR state changes"""
     
+    keep_controls = (dash.no_update,) * 6
+    stop_controls = (False, True, False, True, START_ENABLED_STYLE, STOP_DISABLED_STYLE)
+    no_scrubber = (0, 0, True)
+    
     ctx = callback_context
     if not ctx.triggered:
-        return create_empty_outputs() + (sim_data,)
+        return create_empty_outputs() + (dash.no_update,) + keep_controls + no_scrubber
     
     trigger_id = ctx.triggered[0]['prop_id'].split('.')[0]
     
     try:
         if sim_data is None:
-            return create_empty_outputs() + (sim_data,)
+            return create_empty_outputs() + (dash.no_update,) + keep_controls + no_scrubber
         
-        # Deserialize simulation
-        sim = WealthInequalitySimulation.from_dict(sim_data)
+        session_id = sim_data['session_id']
         
         # Run simulation steps ONLY if triggered by interval and running
         if trigger_id == 'interval-component' and is_running:
@@ -413,29 +683,68 @@ def update_simulation(n_intervals, sim_data, is_running, speed_multiplier):
             # Cap speed multiplier to prevent UI freezing
             max_steps = min(int(speed_multiplier), 100)
             
-            for _ in range(max_steps):
-                can_continue = sim.step()
-                if not can_continue:
-                    break
-                
-                # Safety check: if only a few agents left, stop
-                active_count = len([a for a in sim.agents if a.active])
-                if active_count < 2:
-                    break
-            
-            # Serialize back
-            sim_data = sim.to_dict()
+            try:
+                # Any worker can advance any session; the lock serializes ticks
+                with STORE.lock(session_id, timeout=0.2):
+                    sim = STORE.load_simulation(session_id)
+                    if sim is not None:
+                        # Stops early on convergence or when fewer than two agents are left
+                        sim.run(max_steps)
+                        STORE.save_simulation(session_id, sim)
+            except TimeoutError:
+                # Another request is already advancing this session - skip the tick
+                return (dash.no_update,) * 18
+        else:
+            sim = STORE.load_simulation(session_id)
+        
+        if sim is None:
+            # Session expired (or the server restarted with an in-memory store)
+            return create_empty_outputs() + (None,) + stop_controls + no_scrubber
+        
+        controls = keep_controls
+        if is_running and sim.converged:
+            # Dynamics have settled: stop ticking instead of burning CPU
+            is_running = False
+            controls = stop_controls
         
         # Get current results and display
-        results = sim.get_current_results()
+        results = sim.get_current_results(include_agents=False)
         outputs = create_all_outputs(sim, results, is_running)
-        return outputs + (sim_data,)
+        scrubber = (sim.furthest_round, sim.current_round, bool(is_running) or not sim.checkpoints)
+        return outputs + (dash.no_update,) + controls + scrubber
     
     except Exception as e:
         print(f"Error in update_simulation: {e}")
         import traceback
         traceback.print_exc()
-        return create_empty_outputs() + (sim_data,)
+        return create_empty_outputs() + (dash.no_update,) + keep_controls + no_scrubber
+
+@app.callback(
+    Output('sim-state', 'data', allow_duplicate=True),
+    Input('seek-round', 'value'),
+    [State('sim-state', 'data'),
+     State('running-state', 'data')],
+    prevent_initial_call=True
+)
+def seek_simulation(round_number, sim_data, is_running):
+    """Jump to a past round: restore the nearest checkpoint and replay"""
+    if sim_data is None or is_running or round_number is None:
+        raise PreventUpdate
+    
+    session_id = sim_data['session_id']
+    try:
+        with STORE.lock(session_id, timeout=1.0):
+            sim = STORE.load_simulation(session_id)
+            # The scrubber is also moved by update_simulation - nothing to do then
+            if sim is None or sim.current_round == round_number:
+                raise PreventUpdate
+            sim.seek(round_number)
+            STORE.save_simulation(session_id, sim)
+    except (TimeoutError, ValueError):
+        raise PreventUpdate
+    
+    # New revision re-renders the charts at the replayed round
+    return {'session_id': session_id, 'revision': new_session_id()}
 
 def create_empty_outputs():
     empty_fig = go.Figure()
@@ -452,27 +761,18 @@ def create_empty_outputs():
         50
     )
 
-def create_all_outputs(sim, results, is_running):
-    # Downsample history data for performance if too many data points
-    max_points = 500  # Maximum points to display in charts
-    
-    def downsample_data(data_list):
-        """Downsample data to max_points for chart performance"""
-        if len(data_list) <= max_points:
-            return data_list
-        # Take every nth point to reduce to max_points
-        step = len(data_list) // max_points
-        return data_list[::step]
-    
-    # Status bar
-    active_count = len([a for a in sim.agents if a.active])
-    
+def status_text(sim, results, is_running):
+    """One-line run summary shown in the status bar"""
     # Build status message with redistribution info
-    status_parts = [f"{'Running' if is_running else 'Paused'} | Round: {sim.current_round} | Active: {active_count} agents | Bankrupt: {results['bankrupt_count']} (< ${sim.min_wealth})"]
+    if sim.converged:
+        run_state = f"Converged at round {sim.converged_at_round} ({sim.convergence_reason})"
+    else:
+        run_state = 'Running' if is_running else 'Paused'
+    status_parts = [f"{run_state} | Round: {sim.current_round} | Active: {sim.active_count} agents | Bankrupt: {results['bankrupt_count']} (< ${sim.min_wealth})"]
     
     policies_active = []
     if sim.wealth_tax_enabled:
-        policies_active.append("Wealth Tax")
+        policies_active.append("Progressive Tax" if sim.wealth_tax_mode == 'progressive' else "Wealth Tax")
     if sim.ubi_enabled:
         policies_active.append("UBI")
     if sim.safety_net_enabled:
@@ -481,32 +781,54 @@ def create_all_outputs(sim, results, is_running):
     if policies_active:
         status_parts.append(f"Policies: {', '.join(policies_active)}")
     
-    status = " | ".join(status_parts)
+    if sim.topology is not None:
+        status_parts.append(f"Network: {sim.topology.kind.replace('_', '-')}")
     
-    # Key metrics
+    return " | ".join(status_parts)
+
+def redistribution_lines(sim, results):
+    """Totals for the active redistribution policies, one line each"""
+    redist_text = []
+    if sim.wealth_tax_enabled:
+        redist_text.append(f"Tax: ${results['total_taxes_collected']:.1f}")
+    if sim.ubi_enabled:
+        redist_text.append(f"UBI: ${results['total_ubi_distributed']:.1f}")
+    if sim.safety_net_enabled:
+        redist_text.append(f"Safety: {results['safety_net_interventions']}")
+    return [html.Div(line, style={'fontSize': '10px', 'color': '#2c3e50'}) for line in redist_text]
+
+def metric_values(results):
+    """Formatted latest Gini and top shares, keyed by metric element id"""
     final_gini = results['gini_history'][-1] if results['gini_history'] else 0
     top_10 = results['top_10_percent_history'][-1] if results['top_10_percent_history'] else 0
     top_1 = results['top_1_percent_history'][-1] if results['top_1_percent_history'] else 0
+    return {'metric-gini': f"{final_gini:.3f}",
+            'metric-top-10': f"{top_10:.1f}%",
+            'metric-top-1': f"{top_1:.1f}%"}
+
+def build_metrics(sim, results):
+    """Key metric boxes (latest Gini, top shares, redistribution totals)"""
+    values = metric_values(results)
     
     # Build metrics with redistribution stats
     metric_boxes = [
         html.Div([
             html.Div("Gini", style={'fontSize': '11px', 'color': '#95a5a6', 'marginBottom': '4px'}),
-            html.Div(f"{final_gini:.3f}", style={'fontSize': '24px', 'fontWeight': '500', 'color': '#2c3e50'}),
+            html.Div(values['metric-gini'], id='metric-gini', style={'fontSize': '24px', 'fontWeight': '500', 'color': '#2c3e50'}),
         ], style={'width': '23%', 'display': 'inline-block', 'padding': '12px',
                  'backgroundColor': 'white', 'borderRadius': '4px', 'textAlign': 'center',
                  'border': '1px solid #ecf0f1', 'boxSizing': 'border-box', 'verticalAlign': 'top'}),
         
         html.Div([
             html.Div("Top 10%", style={'fontSize': '11px', 'color': '#95a5a6', 'marginBottom': '4px'}),
-            html.Div(f"{top_10:.1f}%", style={'fontSize': '24px', 'fontWeight': '500', 'color': '#2c3e50'}),
+            html.Div(values['metric-top-10'], id='metric-top-10', style={'fontSize': '24px', 'fontWeight': '500', 'color': '#2c3e50'}),
         ], style={'width': '23%', 'display': 'inline-block', 'padding': '12px',
                  'backgroundColor': 'white', 'borderRadius': '4px', 'textAlign': 'center',
                  'marginLeft': '2%', 'border': '1px solid #ecf0f1', 'boxSizing': 'border-box', 'verticalAlign': 'top'}),
         
         html.Div([
             html.Div("Top 1%", style={'fontSize': '11px', 'color': '#95a5a6', 'marginBottom': '4px'}),
-            html.Div(f"{top_1:.1f}%", style={'fontSize': '24px', 'fontWeight': '500', 'color': '#e74c3c'}),
+            html.Div(values['metric-top-1'], id='metric-top-1', style={'fontSize': '24px', 'fontWeight': '500', 'color': '#e74c3c'}),
         ], style={'width': '23%', 'display': 'inline-block', 'padding': '12px',
                  'backgroundColor': 'white', 'borderRadius': '4px', 'textAlign': 'center',
                  'marginLeft': '2%', 'border': '1px solid #ecf0f1', 'boxSizing': 'border-box', 'verticalAlign': 'top'}),
@@ -514,64 +836,132 @@ def create_all_outputs(sim, results, is_running):
     
     # Add redistribution metric if any policy is active
     if sim.wealth_tax_enabled or sim.ubi_enabled or sim.safety_net_enabled:
-        redist_text = []
-        if sim.wealth_tax_enabled:
-            redist_text.append(f"Tax: ${results['total_taxes_collected']:.1f}")
-        if sim.ubi_enabled:
-            redist_text.append(f"UBI: ${results['total_ubi_distributed']:.1f}")
-        if sim.safety_net_enabled:
-            redist_text.append(f"Safety: {results['safety_net_interventions']}")
-        
         metric_boxes.append(
             html.Div([
                 html.Div("Redistribution", style={'fontSize': '11px', 'color': '#95a5a6', 'marginBottom': '4px'}),
-                html.Div([
-                    html.Div(line, style={'fontSize': '10px', 'color': '#2c3e50'}) for line in redist_text
-                ]),
+                html.Div(redistribution_lines(sim, results), id='metric-redistribution'),
             ], style={'width': '23%', 'display': 'inline-block', 'padding': '12px',
                      'backgroundColor': '#e8f5e9', 'borderRadius': '4px', 'textAlign': 'center',
                      'marginLeft': '2%', 'border': '1px solid #27ae60', 'boxSizing': 'border-box', 'verticalAlign': 'top'})
         )
     
-    metrics = html.Div(metric_boxes)
+    return html.Div(metric_boxes)
+
+def histogram_bars(wealths):
+    """Bin centres, counts and widths of the wealth distribution"""
+    counts, edges = np.histogram(wealths, bins=WEALTH_BINS)
+    return {'x': ((edges[:-1] + edges[1:]) / 2).astype(np.float32),
+            'y': counts.astype(np.int32),
+            'width': np.diff(edges).astype(np.float32)}
+
+def wealth_histogram(wealths):
+    """Wealth distribution as pre-binned bars (ships 3 x 40 numbers, not every agent)"""
+    wealth_fig = go.Figure()
+    if len(wealths) > 0:
+        wealth_fig.add_trace(go.Bar(**histogram_bars(wealths), marker=dict(color='#27ae60')))
+    wealth_fig.update_layout(
+        title={'text': "Wealth Distribution", 'font': {'size': 14}},
+        xaxis_title="Wealth", yaxis_title="Agents",
+        height=300, bargap=0,
+        margin=dict(l=50, r=20, t=40, b=40),
+        uirevision='constant'
+    )
+    return wealth_fig
+
+def build_table(results):
+    """Survival and average wealth per trading style"""
+    type_data = []
+    for style, data in results['results_by_style'].items():
+        type_data.append({
+            'Style': style.capitalize(),
+            'Initial Count': data['total'],
+            'Active': data['active'],
+            'Bankruptcies': data['total'] - data['active'],
+            'Survival Rate': f"{data['survival_rate']*100:.1f}%",
+            'Avg Wealth': f"${data['avg_wealth']:.2f}"
+        })
+    
+    columns = list(type_data[0]) if type_data else []
+    return html.Table([
+        html.Thead(
+            html.Tr([html.Th(col, style={'backgroundColor': '#3498db', 'color': 'white', 
+                                         'padding': '8px', 'fontSize': '12px', 'fontWeight': '500'}) 
+                    for col in columns])
+        ),
+        html.Tbody([
+            html.Tr([
+                html.Td(row[col], style={'padding': '8px', 'fontSize': '12px', 'border': '1px solid #ecf0f1'}) 
+                for col in columns
+            ], style={'backgroundColor': '#f8f9fa' if i % 2 == 0 else 'white'}) 
+            for i, row in enumerate(type_data)
+        ])
+    ], style={'width': '100%', 'borderCollapse': 'collapse', 'border': '1px solid #ecf0f1',
+              'textAlign': 'center', 'borderRadius': '4px'})
+
+@lru_cache(maxsize=32)
+def _mean_field(config_items, horizon):
+    return predict(horizon, **dict(config_items))
+
+def predicted_gini(sim):
+    """Mean-field trajectory for the run's parameters (cached per parameter set and horizon)"""
+    horizon = max(1, PREDICTION_TRADES * sim.n_agents // 2)
+    while horizon < sim.current_round:
+        horizon *= 2
+    return _mean_field(tuple(sorted(simulation_config(sim).items())), horizon)
+
+def create_all_outputs(sim, results, is_running):
+    # Downsample history data for performance if too many data points
+    max_points = 500  # Maximum points to display in charts
+    
+    def downsample_data(data_list):
+        """Downsample data to max_points for chart performance"""
+        if len(data_list) <= max_points:
+            return data_list
+        # Take every nth point to reduce to max_points
+        step = len(data_list) // max_points
+        return data_list[::step]
+    
+    status = status_text(sim, results, is_running)
+    metrics = build_metrics(sim, results)
+    
+    # Real round numbers on the x axis, so pushed deltas can extend the traces
+    rounds = downsample_data(sim.history_rounds.astype(np.int32))
+    # NumPy series go out as base64 typed arrays (float32 is plenty for a chart)
+    series = {key: np.asarray(results[key], dtype=SERIES_DTYPES[key]) for key in SERIES_DTYPES}
     
     # Inequality evolution chart (single plot) - DOWNSAMPLED
     inequality_fig = go.Figure()
-    gini_data = downsample_data(results['gini_history'])
+    gini_data = downsample_data(series['gini_history'])
     inequality_fig.add_trace(
-        go.Scatter(y=gini_data, mode='lines',
+        go.Scatter(x=rounds, y=gini_data, mode='lines',
                   line=dict(color='#e74c3c', width=2), name='Gini Coefficient')
     )
+    # Trace 1, after the live-extended trace 0
+    prediction = predicted_gini(sim)
+    inequality_fig.add_trace(
+        go.Scatter(x=prediction.rounds.astype(np.int32), y=prediction.gini.astype(np.float32),
+                   mode='lines', line=dict(color='#95a5a6', width=1.5, dash='dash'),
+                   name='Predicted (mean-field)')
+    )
     inequality_fig.update_layout(
         title={'text': "Inequality Over Time", 'font': {'size': 14}},
         xaxis_title="Round",
         yaxis_title="Gini",
         height=300,
-        showlegend=False,
+        showlegend=True,
         margin=dict(l=50, r=20, t=40, b=40),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
         uirevision='constant'  # Prevent unnecessary replotting
     )
     
     # Wealth histogram
-    wealth_fig = go.Figure()
-    if len(results['current_wealths']) > 0:
-        wealth_fig.add_trace(go.Histogram(
-            x=results['current_wealths'], nbinsx=40,
-            marker=dict(color='#27ae60')
-        ))
-    wealth_fig.update_layout(
-        title={'text': "Wealth Distribution", 'font': {'size': 14}},
-        xaxis_title="Wealth", yaxis_title="Agents",
-        height=300,
-        margin=dict(l=50, r=20, t=40, b=40),
-        uirevision='constant'
-    )
+    wealth_fig = wealth_histogram(results['current_wealths'])
     
     # Survival chart - DOWNSAMPLED
     survival_fig = go.Figure()
-    survival_data = downsample_data(results['active_count_history'])
+    survival_data = downsample_data(series['active_count_history'])
     survival_fig.add_trace(go.Scatter(
-        y=survival_data, mode='lines',
+        x=rounds, y=survival_data, mode='lines',
         fill='tozeroy', line=dict(color='#9467bd', width=2)
     ))
     survival_fig.update_layout(
@@ -584,15 +974,15 @@ def create_all_outputs(sim, results, is_running):
     
     # Wealth concentration chart - DOWNSAMPLED
     concentration_fig = go.Figure()
-    top_10_data = downsample_data(results['top_10_percent_history'])
-    top_1_data = downsample_data(results['top_1_percent_history'])
+    top_10_data = downsample_data(series['top_10_percent_history'])
+    top_1_data = downsample_data(series['top_1_percent_history'])
     
     concentration_fig.add_trace(go.Scatter(
-        y=top_10_data, mode='lines',
+        x=rounds, y=top_10_data, mode='lines',
         name='Top 10%', line=dict(color='#f39c12', width=2)
     ))
     concentration_fig.add_trace(go.Scatter(
-        y=top_1_data, mode='lines',
+        x=rounds, y=top_1_data, mode='lines',
         name='Top 1%', line=dict(color='#e74c3c', width=2)
     ))
     concentration_fig.update_layout(
@@ -604,38 +994,283 @@ def create_all_outputs(sim, results, is_running):
         uirevision='constant'
     )
     
-    # Results table
-    type_data = []
-    for style, data in results['results_by_style'].items():
-        type_data.append({
-            'Style': style.capitalize(),
-            'Initial Count': data['total'],
-            'Active': data['active'],
-            'Bankruptcies': data['total'] - data['active'],
-            'Survival Rate': f"{data['survival_rate']*100:.1f}%",
-            'Avg Wealth': f"${data['avg_wealth']:.2f}"
-        })
-    
-    df = pd.DataFrame(type_data)
-    table = html.Table([
-        html.Thead(
-            html.Tr([html.Th(col, style={'backgroundColor': '#3498db', 'color': 'white', 
-                                         'padding': '8px', 'fontSize': '12px', 'fontWeight': '500'}) 
-                    for col in df.columns])
-        ),
-        html.Tbody([
-            html.Tr([
-                html.Td(df.iloc[i][col], style={'padding': '8px', 'fontSize': '12px', 'border': '1px solid #ecf0f1'}) 
-                for col in df.columns
-            ], style={'backgroundColor': '#f8f9fa' if i % 2 == 0 else 'white'}) 
-            for i in range(len(df))
-        ])
-    ], style={'width': '100%', 'borderCollapse': 'collapse', 'border': '1px solid #ecf0f1',
-              'textAlign': 'center', 'borderRadius': '4px'})
+    table = build_table(results)
     
     return (status, metrics, inequality_fig, wealth_fig, survival_fig, 
             concentration_fig, table, 50)  # Return 50ms for responsive updates
 
+def sse_event(event, payload):
+    """One Server-Sent Events frame; Dash components serialize via to_plotly_json"""
+    return f"event: {event}\ndata: {json.dumps(payload, cls=PlotlyJSONEncoder)}\n\n"
+
+def stream_delta(sim, since_round, is_running=True, include_table=False):
+    """What changed since since_round: new history points plus current views"""
+    results = sim.get_current_results(include_agents=False)
+    rounds = sim.history_rounds
+    new = int(np.searchsorted(rounds, since_round, side='right'))
+    
+    def recent(key):
+        # Most of the payload is these series: send them as base64 typed arrays
+        return encode_array(results[key][new:], SERIES_DTYPES[key])
+    
+    delta = {
+        'rounds': encode_array(rounds[new:], 'i4'),
+        'gini': recent('gini_history'),
+        'active_count': recent('active_count_history'),
+        'top_10_percent': recent('top_10_percent_history'),
+        'top_1_percent': recent('top_1_percent_history'),
+        'status': status_text(sim, results, is_running),
+        # Text of the metric boxes rendered by build_metrics
+        'metrics': metric_values(results),
+        'histogram': {key: encode_array(values, values.dtype.str[1:])
+                      for key, values in histogram_bars(results['current_wealths']).items()},
+        'max_points': STREAM_MAX_POINTS,
+    }
+    if sim.wealth_tax_enabled or sim.ubi_enabled or sim.safety_net_enabled:
+        delta['metrics']['metric-redistribution'] = redistribution_lines(sim, results)
+    if include_table:
+        delta['table'] = build_table(results)
+    return delta
+
+def session_events(session_id, speed_multiplier):
+    """Advance a session frame by frame, yielding a delta after each frame
+    
+    Frames that add no rounds send nothing (a ': ping' comment every 15 s
+    keeps proxies from closing the connection). The stream ends with a
+    'done' event once the run converges or can no longer step, and with
+    'gone' if the session has expired.
+    """
+    max_steps = min(max(int(speed_multiplier or 1), 1), 100)
+    frame = 1.0 / STREAM_FPS
+    sent_round = None
+    bankrupt = None
+    last_sent = last_table = time.monotonic()
+    
+    while True:
+        started = time.monotonic()
+        try:
+            # Same lock as the polling path, so the two never double-step a session
+            with STORE.lock(session_id, timeout=frame):
+                sim = STORE.load_simulation(session_id)
+                if sim is not None:
+                    if sent_round is None:
+                        # Client already shows the server-rendered state up to here
+                        sent_round = sim.current_round
+                        bankrupt = sim.n_agents - sim.active_count
+                    stepped = sim.run(max_steps)
+                    if stepped:
+                        STORE.save_simulation(session_id, sim)
+        except TimeoutError:
+            continue
+        
+        if sim is None:
+            yield sse_event('gone', {})
+            return
+        
+        finished = sim.converged or not stepped
+        if stepped or finished:
+            # Style table only changes when someone goes bankrupt (and is resent at most once a second)
+            include_table = finished or (sim.n_agents - sim.active_count != bankrupt
+                                         and time.monotonic() - last_table >= 1.0)
+            if include_table:
+                bankrupt = sim.n_agents - sim.active_count
+                last_table = time.monotonic()
+            yield sse_event('done' if finished else 'delta',
+                            stream_delta(sim, sent_round, not finished, include_table))
+            sent_round = sim.current_round
+            last_sent = time.monotonic()
+        elif time.monotonic() - last_sent > 15:
+            yield ": ping\n\n"
+            last_sent = time.monotonic()
+        if finished:
+            return
+        
+        time.sleep(max(0.0, frame - (time.monotonic() - started)))
+
+# Under the app's path prefix, where assets/live_updates.js looks for it
+@server.route(app.config.routes_pathname_prefix + 'stream/<session_id>')
+def stream_session(session_id):
+    """Server-Sent Events channel for one running session (see assets/live_updates.js)"""
+    speed = request.args.get('speed', 1, type=int)
+    return Response(stream_with_context(session_events(session_id, speed)),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+if PUSH_UPDATES:
+    # Open / close the browser's EventSource whenever the run starts, stops or changes speed
+    app.clientside_callback(
+        ClientsideFunction(namespace='live', function_name='connect'),
+        Output('push-status', 'data'),
+        [Input('running-state', 'data'),
+         Input('speed-multiplier', 'value')],
+        [State('sim-state', 'data')],
+        prevent_initial_call=True
+    )
+
+# Parameter sweeps
+@app.callback(
+    [Output('simulation-controls', 'hidden'),
+     Output('simulation-main', 'hidden'),
+     Output('sweep-page', 'hidden')],
+    Input('url', 'pathname')
+)
+def display_page(pathname):
+    """Show one page; hiding instead of unmounting keeps a running simulation alive"""
+    on_sweep = app.strip_relative_path(pathname or '/') == 'sweep'
+    return on_sweep, on_sweep, not on_sweep
+
+def sweep_axis_range(param):
+    """Default min / max when an axis parameter is picked"""
+    return list(SWEEP_PARAMETERS[param][1])
+
+for axis in ('x', 'y'):
+    app.callback(
+        [Output(f'sweep-{axis}-min', 'value'),
+         Output(f'sweep-{axis}-max', 'value')],
+        Input(f'sweep-{axis}-param', 'value'),
+        prevent_initial_call=True
+    )(sweep_axis_range)
+
+@app.callback(
+    [Output('sweep-plan', 'data'),
+     Output('sweep-interval', 'disabled'),
+     Output('sweep-status', 'children')],
+    Input('sweep-btn', 'n_clicks'),
+    [State('sweep-x-param', 'value'),
+     State('sweep-x-min', 'value'),
+     State('sweep-x-max', 'value'),
+     State('sweep-x-steps', 'value'),
+     State('sweep-y-param', 'value'),
+     State('sweep-y-min', 'value'),
+     State('sweep-y-max', 'value'),
+     State('sweep-y-steps', 'value'),
+     State('sweep-rounds', 'value'),
+     State('sweep-replicas', 'value'),
+     State('sweep-precision', 'value'),
+     State('sweep-preview', 'value'),
+     # Everything not swept comes from the Simulation page
+     State('n-agents', 'value'),
+     State('initial-wealth', 'value'),
+     State('greedy-ratio', 'value'),
+     State('neutral-ratio', 'value'),
+     State('rich-bias', 'value'),
+     State('wealth-tax-enabled', 'value'),
+     State('wealth-tax-threshold', 'value'),
+     State('wealth-tax-rate', 'value'),
+     State('wealth-tax-mode', 'value'),
+     State('wealth-tax-exponent', 'value'),
+     State('wealth-tax-interval', 'value'),
+     State('ubi-enabled', 'value'),
+     State('ubi-amount', 'value'),
+     State('safety-net-enabled', 'value'),
+     State('safety-net-floor', 'value'),
+     State('topology', 'value')],
+    prevent_initial_call=True
+)
+def start_sweep(n_clicks, x_param, x_min, x_max, x_steps, y_param, y_min, y_max, y_steps,
+                n_rounds, replicas, precision, preview_list, n_agents, initial_wealth, greedy_ratio, neutral_ratio, rich_bias,
+                wealth_tax_enabled_list, wealth_tax_threshold, wealth_tax_rate, wealth_tax_mode,
+                wealth_tax_exponent, wealth_tax_interval, ubi_enabled_list, ubi_amount,
+                safety_net_enabled_list, safety_net_floor, topology):
+    """Queue the grid and return at once - cells run on SWEEP_RUNNER's pool"""
+    if None in (x_min, x_max, x_steps, y_min, y_max, y_steps, n_rounds, replicas):
+        return dash.no_update, dash.no_update, "Error: fill in every range, rounds and replicas"
+    if x_param == y_param:
+        return dash.no_update, dash.no_update, "Error: pick two different parameters"
+    
+    base = dict(
+        n_agents=n_agents, initial_wealth=initial_wealth,
+        greedy_ratio=greedy_ratio, neutral_ratio=neutral_ratio,
+        rich_bias=rich_bias,
+        wealth_tax_enabled=bool(wealth_tax_enabled_list),
+        wealth_tax_threshold=wealth_tax_threshold,
+        wealth_tax_rate=wealth_tax_rate,
+        wealth_tax_mode=wealth_tax_mode,
+        wealth_tax_exponent=wealth_tax_exponent,
+        wealth_tax_interval=wealth_tax_interval or 1,
+        ubi_enabled=bool(ubi_enabled_list),
+        ubi_amount=ubi_amount,
+        safety_net_enabled=bool(safety_net_enabled_list),
+        safety_net_floor=safety_net_floor,
+        topology=None if topology in (None, 'none') else topology,
+    )
+    plan = plan_sweep(base, x_param, axis_values(x_min, x_max, x_steps),
+                      y_param, axis_values(y_min, y_max, y_steps), int(n_rounds), int(replicas),
+                      precision=precision or None, max_replicas=SWEEP_MAX_REPLICAS)
+    # Mean-field preview: predicted on the pool, drawn under the pending
+    # cells as the predictions arrive, and steep cells queue first
+    plan['preview'] = bool(preview_list)
+    SWEEP_RUNNER.submit(plan, prescreen=plan['preview'])
+    
+    # The browser only needs the axes and cell keys to poll the cache
+    del plan['configs']
+    return plan, False, dash.no_update
+
+@app.callback(
+    [Output('sweep-gini', 'figure'),
+     Output('sweep-top-1', 'figure'),
+     Output('sweep-bankrupt', 'figure'),
+     Output('sweep-status', 'children', allow_duplicate=True),
+     Output('sweep-interval', 'disabled', allow_duplicate=True)],
+    [Input('sweep-interval', 'n_intervals'),
+     Input('sweep-plan', 'data')],
+    prevent_initial_call='initial_duplicate'
+)
+def update_sweep(n_intervals, plan):
+    """Redraw the heatmaps from whatever cells the cache holds so far"""
+    if plan is None:
+        return (sweep_heatmap(None, None, 'Final Gini', (0, 1)),
+                sweep_heatmap(None, None, 'Top 1% share (%)', (0, 100)),
+                sweep_heatmap(None, None, 'Bankrupt fraction', (0, 1)),
+                "Pick two parameters and click Run sweep", True)
+    
+    values, done, total = SWEEP_CACHE.grid(plan['keys'])
+    predicted = predicted_done = None
+    if plan.get('preview'):
+        predicted, predicted_done, _ = SWEEP_CACHE.grid(plan['keys'], PREDICTION_PREFIX)
+    failed = sum(key in SWEEP_RUNNER.failed for row in plan['keys'] for key in row if key is not None)
+    finished = done + failed >= total
+    status = f"{done} / {total} cells finished"
+    if failed:
+        status += f" | {failed} failed"
+    if plan.get('precision') and done:
+        replicas = values['replicas'][np.isfinite(values['replicas'])]
+        status += f" | {int(replicas.min())}-{int(replicas.max())} replicas per cell for Gini +-{plan['precision']:g}"
+    if not finished:
+        per_cell = f"{plan['replicas']}+" if plan.get('precision') else plan['replicas']
+        status += f" | {per_cell} x {plan['n_rounds']:,} rounds per cell, running in the background"
+        if predicted_done is not None and predicted_done < total:
+            status += f" | predicting the grid ({predicted_done} / {total})"
+        elif predicted_done is not None:
+            status += " | faded cells: mean-field prediction"
+    predicted = predicted or {}
+    return (sweep_heatmap(plan, values['gini'], 'Final Gini', (0, 1), predicted.get('gini')),
+            sweep_heatmap(plan, values['top_1_percent'], 'Top 1% share (%)', (0, 100),
+                          predicted.get('top_1_percent')),
+            sweep_heatmap(plan, values['bankrupt_fraction'], 'Bankrupt fraction', (0, 1),
+                          predicted.get('bankrupt_fraction')),
+            status, finished)
+
+def sweep_heatmap(plan, z, title, z_range, predicted=None):
+    """One metric over the grid; pending cells are gaps (or show the faded
+    mean-field prediction), the color scale stays fixed"""
+    fig = go.Figure()
+    if plan is not None and predicted is not None:
+        fig.add_trace(go.Heatmap(
+            z=predicted, x=plan['x_values'], y=plan['y_values'],
+            zmin=z_range[0], zmax=z_range[1], colorscale='Viridis', opacity=0.35, showscale=False,
+            hovertemplate='%{x}, %{y}: %{z:.3f} (predicted)<extra></extra>'))
+    if plan is not None:
+        fig.add_trace(go.Heatmap(
+            z=z, x=plan['x_values'], y=plan['y_values'],
+            zmin=z_range[0], zmax=z_range[1], colorscale='Viridis',
+            hovertemplate='%{x}, %{y}: %{z:.3f}<extra></extra>'))
+        fig.update_xaxes(title_text=SWEEP_PARAMETERS[plan['x_param']][0])
+        fig.update_yaxes(title_text=SWEEP_PARAMETERS[plan['y_param']][0])
+    fig.update_layout(title=title, height=380, margin=dict(l=60, r=20, t=50, b=50),
+                      font=dict(size=12, color='#2c3e50'))
+    return fig
+
 if __name__ == '__main__':
     app.run(debug=True)
 
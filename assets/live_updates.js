@@ -0,0 +1,122 @@
+// Live updates over Server-Sent Events (served by <prefix>stream/<session_id>)
+//
+// While a run is active the server advances the session and pushes one
+// delta per frame; this script applies it to the charts in place. Nothing
+// is requested while a tab is idle, and a run costs a single long-lived
+// request instead of 20 callbacks per second.
+var TYPED_ARRAYS = {
+    i1: Int8Array, u1: Uint8Array, i2: Int16Array, u2: Uint16Array,
+    i4: Int32Array, u4: Uint32Array, f4: Float32Array, f8: Float64Array
+};
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    live: {
+        connect: function (running, speed, simData) {
+            var live = window.dash_clientside.live;
+            live.close();
+            if (!running || !simData || typeof EventSource === 'undefined') {
+                return {connected: false};
+            }
+
+            var url = live.prefix() + 'stream/' + encodeURIComponent(simData.session_id) +
+                '?speed=' + encodeURIComponent(speed || 1);
+            var source = new EventSource(url);
+            live.source = source;
+
+            source.addEventListener('delta', function (event) {
+                live.apply(JSON.parse(event.data));
+            });
+            source.addEventListener('done', function (event) {
+                live.apply(JSON.parse(event.data));
+                live.finish(simData);
+            });
+            source.addEventListener('gone', function () {
+                live.finish(simData);
+            });
+            // EventSource reconnects on its own after network errors; the
+            // server resumes from the stored session, so nothing is lost
+            return {connected: true, session_id: simData.session_id};
+        },
+
+        // The app's requests_pathname_prefix ('/' unless served under a path),
+        // from the config Dash renders into the page
+        prefix: function () {
+            var config = document.getElementById('_dash-config');
+            var prefix = config && JSON.parse(config.textContent).requests_pathname_prefix;
+            return prefix || '/';
+        },
+
+        close: function () {
+            var live = window.dash_clientside.live;
+            if (live.source) {
+                live.source.close();
+                live.source = null;
+            }
+        },
+
+        finish: function (simData) {
+            // A fresh revision makes the server render the final state once,
+            // which also stops the run and restores the buttons and scrubber
+            window.dash_clientside.live.close();
+            dash_clientside.set_props('sim-state', {
+                data: {session_id: simData.session_id, revision: String(Date.now())}
+            });
+        },
+
+        // Base64 typed arrays ({dtype, bdata}, see array_codec.py) to plain arrays
+        decode: function (spec) {
+            if (!spec || spec.bdata === undefined) {
+                return spec;
+            }
+            var bytes = Uint8Array.from(atob(spec.bdata), function (c) { return c.charCodeAt(0); });
+            return Array.from(new TYPED_ARRAYS[spec.dtype](bytes.buffer));
+        },
+
+        extend: function (id, update, traces, maxPoints) {
+            // Figures rendered from typed arrays keep the {dtype, bdata} spec in
+            // gd.data, which extendTraces cannot append to: decode it first
+            var decode = window.dash_clientside.live.decode;
+            var gd = document.querySelector('#' + id + ' .js-plotly-plot');
+            if (gd && gd.data) {
+                traces.forEach(function (i) {
+                    var trace = gd.data[i];
+                    if (trace) {
+                        trace.x = decode(trace.x);
+                        trace.y = decode(trace.y);
+                    }
+                });
+            }
+            dash_clientside.set_props(id, {extendData: [update, traces, maxPoints]});
+        },
+
+        apply: function (delta) {
+            var live = window.dash_clientside.live;
+            var set = dash_clientside.set_props;
+            var n = delta.max_points;
+            var x = live.decode(delta.rounds);
+            if (x.length) {
+                live.extend('inequality-chart', {x: [x], y: [live.decode(delta.gini)]}, [0], n);
+                live.extend('survival-chart', {x: [x], y: [live.decode(delta.active_count)]}, [0], n);
+                live.extend('concentration-chart', {
+                    x: [x, x],
+                    y: [live.decode(delta.top_10_percent), live.decode(delta.top_1_percent)]
+                }, [0, 1], n);
+            }
+            // Bars are restyled in place; the server re-renders the full figure when the run stops
+            var hist = document.querySelector('#wealth-hist .js-plotly-plot');
+            if (hist && hist.data && hist.data.length && window.Plotly) {
+                var bars = delta.histogram;
+                Plotly.restyle(hist, {
+                    x: [live.decode(bars.x)], y: [live.decode(bars.y)], width: [live.decode(bars.width)]
+                }, [0]);
+            }
+            set('status-bar', {children: delta.status});
+            Object.keys(delta.metrics).forEach(function (id) {
+                set(id, {children: delta.metrics[id]});
+            });
+            if (delta.table) {
+                set('results-table', {children: delta.table});
+            }
+        }
+    }
+});
@@ -0,0 +1,139 @@
+import numpy as np
+from dataclasses import dataclass, asdict, field
+from typing import List, Optional, Sequence, Tuple
+
+
+@dataclass
+class ConvergenceDetector:
+    """Detects when the yard-sale dynamics have settled
+    
+    Fed one (gini, active_count) sample per recorded round, so the same
+    detector can be used by the engine, the Dash loop and batch jobs. The
+    samples are folded into block means as they arrive, which keeps the
+    detector O(1) per round and independent of how much history is retained.
+    
+    A run counts as converged when either
+      - the population is absorbed: at most `absorbing_active` agents are
+        still active (bankruptcy is irreversible, so nothing else can happen), or
+      - over the last `n_blocks` blocks the Gini has no meaningful trend
+        (least-squares drift across the window below `slope_tol`), its
+        fluctuation is small (std below `std_tol`) and nobody went bankrupt.
+    """
+    block: Optional[int] = None  # Rounds per block (None = scale with active agents)
+    n_blocks: int = 4  # Blocks per test window
+    slope_tol: float = 0.005  # Max Gini drift across one window
+    std_tol: float = 0.01  # Max Gini standard deviation inside the window
+    absorbing_active: int = 2  # Active agents at or below this = absorbing state
+    min_block: int = 100  # Lower bound for the automatic block length
+    # Running state (serialized with the detector)
+    block_len: int = 0
+    block_active: int = -1
+    block_sum: float = 0.0
+    block_sumsq: float = 0.0
+    block_count: int = 0
+    blocks: List[Tuple[float, float]] = field(default_factory=list)  # (mean, mean of squares)
+    
+    def block_for(self, active_count: int) -> int:
+        """Block length in rounds for the current number of active agents"""
+        if self.block is not None:
+            return self.block
+        # Every active agent should get to trade many times inside one block
+        return max(self.min_block, 50 * active_count)
+    
+    def is_absorbed(self, active_count: int) -> bool:
+        """Absorbing-state check: too few agents left to change anything"""
+        return active_count <= self.absorbing_active
+    
+    def reset(self):
+        """Clear the running state (keeps the configuration)"""
+        self.block_len = 0
+        self.block_active = -1
+        self.block_sum = 0.0
+        self.block_sumsq = 0.0
+        self.block_count = 0
+        self.blocks = []
+    
+    def _start_block(self, active_count: int):
+        self.block_len = self.block_for(active_count)
+        self.block_active = active_count
+        self.block_sum = 0.0
+        self.block_sumsq = 0.0
+        self.block_count = 0
+    
+    def update(self, gini: float, active_count: int) -> Optional[str]:
+        """Add one sample. Returns the convergence reason ('absorbed' / 'plateau') or None"""
+        if self.is_absorbed(active_count):
+            return 'absorbed'
+        
+        if active_count != self.block_active:
+            # A bankruptcy (or the first sample): the dynamics moved, start over
+            self.blocks = []
+            self._start_block(active_count)
+        
+        self.block_sum += gini
+        self.block_sumsq += gini * gini
+        self.block_count += 1
+        
+        if self.block_count < self.block_len:
+            return None
+        
+        self.blocks.append((self.block_sum / self.block_count,
+                            self.block_sumsq / self.block_count))
+        if len(self.blocks) > self.n_blocks:
+            self.blocks.pop(0)
+        self._start_block(active_count)
+        
+        return 'plateau' if self._is_plateau() else None
+    
+    def _is_plateau(self) -> bool:
+        """Windowed slope and variance tests over the completed blocks"""
+        if len(self.blocks) < self.n_blocks:
+            return False
+        
+        stats = np.asarray(self.blocks, dtype=np.float64)
+        means = stats[:, 0]
+        
+        # Least-squares slope of the block means, as total drift across the window
+        x = np.arange(len(means), dtype=np.float64)
+        x -= x.mean()
+        slope = np.dot(x, means - means.mean()) / np.dot(x, x)
+        if abs(slope) * len(means) > self.slope_tol:
+            return False
+        
+        # Pooled variance of the raw samples inside the window
+        mean = means.mean()
+        variance = max(stats[:, 1].mean() - mean * mean, 0.0)
+        return np.sqrt(variance) <= self.std_tol
+    
+    def scan(self, gini_history: Sequence[float],
+             active_count_history: Sequence[int]) -> Tuple[Optional[int], Optional[str]]:
+        """Offline check of recorded histories with a fresh copy of this detector.
+        Returns (index of the converging sample, reason) or (None, None)."""
+        detector = ConvergenceDetector(**self.config())
+        for i, (gini, active) in enumerate(zip(gini_history, active_count_history)):
+            reason = detector.update(gini, active)
+            if reason is not None:
+                return i, reason
+        return None, None
+    
+    def config(self) -> dict:
+        """Configuration fields only (no running state)"""
+        return {
+            'block': self.block,
+            'n_blocks': self.n_blocks,
+            'slope_tol': self.slope_tol,
+            'std_tol': self.std_tol,
+            'absorbing_active': self.absorbing_active,
+            'min_block': self.min_block,
+        }
+    
+    def to_dict(self) -> dict:
+        return asdict(self)
+    
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> 'ConvergenceDetector':
+        if not data:
+            return cls()
+        data = dict(data)
+        data['blocks'] = [tuple(b) for b in data.get('blocks', [])]
+        return cls(**data)
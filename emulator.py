@@ -0,0 +1,210 @@
+"""Emulator over cached sweep cells: instant previews with uncertainty
+
+Every finished sweep cell is one agent-based data point - settings ->
+final Gini, top 1% share and bankrupt fraction - in the shared sweep
+cache. `SweepEmulator` fits a Gaussian process to those cells and answers
+"expected final metrics for these settings" with a standard deviation that
+grows away from computed cells, in a fraction of a millisecond:
+
+* Inputs are the continuous settings (FEATURES). Each sweepable parameter
+  is scaled so its default sweep range is one unit; agents, initial
+  wealth and rounds count in decades. A policy that is off contributes
+  zeros, so "no UBI" sits next to "a little UBI".
+* Settings that cannot be interpolated (tax mode, topology, min_wealth,
+  ...) split the cells into separate models (`regime`).
+* Each model: squared-exponential kernel, constant mean and a nugget for
+  replica noise, on standardized metrics. The length scale and nugget are
+  picked from a small grid by closed-form leave-one-out predictive
+  density, with one matrix inverse per candidate shared by all metrics.
+* `refresh` lists the cache at most every `refresh_interval` seconds and
+  refits the regimes that gained cells, in a background thread, so the
+  emulator sharpens by itself as sweeps finish. Each model keeps its
+  newest `max_cells` cells.
+
+    emulator = SweepEmulator(get_cache())
+    emulator.refresh(wait=True)
+    emulator.predict({'n_agents': 200, 'rich_bias': 0.08})  # Emulation or None
+"""
+import inspect
+import json
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from sweep import CELL_METRICS, SWEEP_PARAMETERS, SweepCache
+from wealth_inequality_sim import WealthInequalitySimulation
+
+# Continuous inputs: the sweepable parameters (one unit = their default
+# range), then agents, initial wealth and rounds (one unit = a decade)
+SWEPT_FEATURES = tuple(SWEEP_PARAMETERS)
+LOG_FEATURES = ('n_agents', 'initial_wealth', 'n_rounds')
+FEATURES = SWEPT_FEATURES + LOG_FEATURES
+_SPANS = np.array([high - low for _, (low, high) in SWEEP_PARAMETERS.values()]
+                  + [np.log(10.0)] * len(LOG_FEATURES))
+
+LENGTH_SCALES = (0.15, 0.3, 0.6)  # Candidate kernel length scales (feature units)
+NUGGETS = (1e-3, 1e-2, 1e-1)  # Candidate noise variances (standardized metrics)
+METRIC_BOUNDS = {'gini': (0.0, 1.0), 'top_1_percent': (0.0, 100.0), 'bankrupt_fraction': (0.0, 1.0)}
+DEFAULT_MAX_CELLS = 500  # Per model; an n x n inverse is refitted as cells arrive
+
+_DEFAULTS = {name: parameter.default for name, parameter
+             in inspect.signature(WealthInequalitySimulation.__init__).parameters.items()}
+
+
+def _setting(config: dict, name: str):
+    value = config.get(name)
+    return _DEFAULTS.get(name) if value is None else value
+
+
+def features(config: dict, n_rounds: int) -> np.ndarray:
+    """Scaled input vector of a configuration (see FEATURES)"""
+    taxed = bool(_setting(config, 'wealth_tax_enabled'))
+    progressive = taxed and _setting(config, 'wealth_tax_mode') == 'progressive'
+    # A tax every k rounds is close to 1/k of the rate every round
+    interval = max(1, int(_setting(config, 'wealth_tax_interval')))
+    values = {
+        'rich_bias': _setting(config, 'rich_bias'),
+        'greedy_ratio': _setting(config, 'greedy_ratio'),
+        'neutral_ratio': _setting(config, 'neutral_ratio'),
+        'wealth_tax_rate': _setting(config, 'wealth_tax_rate') / interval if taxed else 0.0,
+        'wealth_tax_threshold': _setting(config, 'wealth_tax_threshold') if taxed and not progressive else 0.0,
+        'wealth_tax_exponent': _setting(config, 'wealth_tax_exponent') if progressive else 0.0,
+        'ubi_amount': _setting(config, 'ubi_amount') if _setting(config, 'ubi_enabled') else 0.0,
+        'safety_net_floor': _setting(config, 'safety_net_floor') if _setting(config, 'safety_net_enabled') else 0.0,
+        'n_agents': np.log(_setting(config, 'n_agents')),
+        'initial_wealth': np.log(_setting(config, 'initial_wealth')),
+        'n_rounds': np.log(max(1, n_rounds)),
+    }
+    return np.array([values[name] for name in FEATURES], dtype=np.float64) / _SPANS
+
+
+def regime(config: dict) -> str:
+    """Settings a model cannot interpolate over: cells must match them exactly"""
+    taxed = bool(_setting(config, 'wealth_tax_enabled'))
+    progressive = taxed and _setting(config, 'wealth_tax_mode') == 'progressive'
+    return json.dumps([_setting(config, 'wealth_tax_mode') if taxed else None,
+                       _setting(config, 'wealth_tax_max_rate') if progressive else None,
+                       _setting(config, 'min_wealth'), config.get('topology'),
+                       config.get('topology_params')], sort_keys=True, default=str)
+
+
+@dataclass
+class Emulation:
+    """Emulated final metrics of one configuration"""
+    mean: Dict[str, float]
+    std: Dict[str, float]  # Uncertainty of the mean (grows away from computed cells)
+    n_rounds: int
+    cells: int  # Cells in the model that answered
+    nearest: float  # Distance to the nearest computed cell, in kernel length scales
+
+
+class _GaussianProcess:
+    """GP posterior over standardized metrics (one column each), hyperparameters by LOO"""
+    
+    def __init__(self, x: np.ndarray, y: np.ndarray):
+        self.x = x
+        self.offset = y.mean(axis=0)
+        self.scale = y.std(axis=0)
+        self.scale[self.scale < 1e-9] = 1.0
+        z = (y - self.offset) / self.scale
+        sq = ((x[:, None, :] - x[None, :, :]) ** 2).sum(axis=2)
+        best = -np.inf
+        for length in LENGTH_SCALES:
+            correlation = np.exp(-0.5 * sq / length ** 2)
+            for nugget in NUGGETS:
+                inverse = np.linalg.inv(correlation + nugget * np.eye(len(x)))
+                alpha = inverse @ z
+                # Leave-one-out: residual alpha_i / inv_ii, variance 1 / inv_ii
+                diagonal = np.diag(inverse)[:, None]
+                score = float(np.sum(0.5 * np.log(diagonal) - 0.5 * alpha ** 2 / diagonal))
+                if score > best:
+                    best = score
+                    self.length, self.nugget = length, nugget
+                    self.inverse, self.alpha = inverse, alpha
+    
+    def predict(self, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray, float]:
+        """Mean and standard deviation per metric, and the nearest cell's distance"""
+        sq = ((self.x - x) ** 2).sum(axis=1)
+        k = np.exp(-0.5 * sq / self.length ** 2)
+        mean = self.offset + self.scale * (k @ self.alpha)
+        variance = max(1.0 - float(k @ self.inverse @ k), 0.0)
+        return mean, self.scale * np.sqrt(variance), float(np.sqrt(sq.min())) / self.length
+
+
+class SweepEmulator:
+    """Gaussian-process emulators over the cells of a sweep cache, one per regime"""
+    
+    def __init__(self, cache: SweepCache, refresh_interval: float = 5.0,
+                 max_cells: int = DEFAULT_MAX_CELLS):
+        self.cache = cache
+        self.refresh_interval = refresh_interval
+        self.max_cells = max_cells
+        self._seen = set()  # Cache keys already loaded (or without inputs)
+        self._cells: Dict[str, List[Tuple[np.ndarray, List[float], int]]] = {}  # regime -> cells
+        self._models: Dict[str, _GaussianProcess] = {}
+        self._rounds: Dict[str, int] = {}  # regime -> typical rounds of its cells
+        self._last_refresh = -np.inf
+        self._refreshing = threading.Lock()
+    
+    @property
+    def cells(self) -> int:
+        return sum(len(cells) for cells in self._cells.values())
+    
+    def refresh(self, wait: bool = False) -> bool:
+        """Load new cells and refit - in the background unless `wait` - at most
+        once per refresh_interval; returns whether a refresh was started"""
+        if time.monotonic() - self._last_refresh < self.refresh_interval and not wait:
+            return False
+        if not self._refreshing.acquire(blocking=wait):
+            return False
+        self._last_refresh = time.monotonic()
+        if wait:
+            self._refresh()
+        else:
+            threading.Thread(target=self._refresh, daemon=True).start()
+        return True
+    
+    def _refresh(self):
+        try:
+            grown = set()
+            for key in self.cache.keys():
+                if key in self._seen:
+                    continue
+                self._seen.add(key)
+                result = self.cache.get(key)
+                if result is None or 'config' not in result:
+                    continue  # Expired, or cached before cells kept their inputs
+                config = result['config']
+                name = regime(config)
+                cells = self._cells.setdefault(name, [])
+                cells.append((features(config, result['n_rounds']),
+                              [result[metric] for metric in CELL_METRICS], result['n_rounds']))
+                del cells[:-self.max_cells]
+                grown.add(name)
+            for name in grown:
+                cells = self._cells[name]
+                x = np.array([cell[0] for cell in cells])
+                y = np.array([cell[1] for cell in cells], dtype=np.float64)
+                model = _GaussianProcess(x, y)
+                rounds = [cell[2] for cell in cells]
+                self._rounds[name] = max(set(rounds), key=rounds.count)
+                self._models[name] = model  # Swapped in whole: readers never see a half fit
+        finally:
+            self._refreshing.release()
+    
+    def predict(self, config: dict, n_rounds: Optional[int] = None) -> Optional[Emulation]:
+        """Emulated final metrics after n_rounds (default: the rounds most of
+        the regime's cells ran), or None if no cell shares the regime"""
+        name = regime(config)
+        model = self._models.get(name)
+        if model is None:
+            return None
+        n_rounds = int(n_rounds or self._rounds[name])
+        mean, std, nearest = model.predict(features(config, n_rounds))
+        means = {metric: float(np.clip(value, *METRIC_BOUNDS[metric]))
+                 for metric, value in zip(CELL_METRICS, mean)}
+        return Emulation(mean=means, std=dict(zip(CELL_METRICS, std.tolist())), n_rounds=n_rounds,
+                         cells=len(model.x), nearest=nearest)
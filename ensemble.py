@@ -0,0 +1,407 @@
+"""Parallel replica ensembles with shared-memory result aggregation
+
+Workers write their Gini / active-count / top-share trajectories straight
+into preallocated `multiprocessing.shared_memory` arrays indexed by
+(replica, sample). Nothing but a replica index travels through the pool,
+and the parent computes means and quantiles on the shared arrays in place.
+
+Where process pools are not an option (notebooks, inside the Dash server)
+replicas can run on a thread pool instead, writing into ordinary arrays.
+Threads only overlap where the engine releases the GIL (NumPy kernels such
+as the statistics sort and the vectorized policies); `measure_thread_scaling`
+reports how much that buys for a given workload.
+"""
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from statistics import NormalDist
+from typing import Dict, Iterable, List, Literal, Optional, Sequence, Tuple
+
+import numpy as np
+
+from wealth_inequality_sim import WealthInequalitySimulation
+
+# Recorded series and their storage dtypes (float32 keeps 1000 x 1e6 runs at 4 GB per series)
+SERIES: Dict[str, np.dtype] = {
+    'gini': np.dtype(np.float32),
+    'active_count': np.dtype(np.int32),
+    'top_10_percent': np.dtype(np.float32),
+    'top_1_percent': np.dtype(np.float32),
+}
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to a block created by the parent, which alone unlinks it"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: workers share the parent's resource tracker, so the
+        # duplicate registration is harmless and cleared by the parent's unlink
+        return shared_memory.SharedMemory(name=name)
+
+
+class EnsembleResult:
+    """Owns the (replica, sample) arrays of one ensemble run
+    
+    Use as a context manager (or call close()) so the shared memory is
+    released; arrays obtained from it are invalid afterwards. With
+    shared=False (thread pools) the arrays are ordinary process memory.
+    """
+    
+    def __init__(self, n_replicas: int, n_samples: int, record_every: int,
+                 series: Sequence[str] = tuple(SERIES), shared: bool = True):
+        self.n_replicas = n_replicas
+        self.n_samples = n_samples
+        self.record_every = record_every
+        self._blocks: Dict[str, shared_memory.SharedMemory] = {}
+        self._stop_block: Optional[shared_memory.SharedMemory] = None
+        self.arrays: Dict[str, np.ndarray] = {}
+        for key in series:
+            self.arrays[key] = self._allocate(key, (n_replicas, n_samples), SERIES[key], shared)
+        # Round at which each replica stopped (converged / absorbed), -1 = ran to the end
+        self.stopped_at = self._allocate(None, (n_replicas,), np.dtype(np.int64), shared)
+        self.stopped_at[:] = -1
+    
+    def _allocate(self, key: Optional[str], shape: tuple, dtype: np.dtype, shared: bool) -> np.ndarray:
+        if not shared:
+            return np.zeros(shape, dtype=dtype)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * dtype.itemsize))
+        if key is None:
+            self._stop_block = shm
+        else:
+            self._blocks[key] = shm
+        return np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    
+    @property
+    def rounds(self) -> np.ndarray:
+        """Round number of each sample column"""
+        return np.arange(self.n_samples) * self.record_every
+    
+    def layout(self) -> dict:
+        """What a worker needs to attach: block names, shapes and dtypes"""
+        return {
+            'shape': (self.n_replicas, self.n_samples),
+            'series': {key: (shm.name, SERIES[key].str) for key, shm in self._blocks.items()},
+            'stopped_at': self._stop_block.name,
+        }
+    
+    def mean(self, key: str) -> np.ndarray:
+        """Per-sample mean across replicas (reads the shared array in place)"""
+        return self.arrays[key].mean(axis=0, dtype=np.float64)
+    
+    def std(self, key: str) -> np.ndarray:
+        return self.arrays[key].std(axis=0, dtype=np.float64)
+    
+    def quantile(self, key: str, q: Iterable[float], chunk_samples: int = 4096) -> np.ndarray:
+        """Per-sample quantiles across replicas, shape (len(q), n_samples)
+        
+        np.quantile has to partition a copy, so columns are processed in
+        chunks: the temporary is n_replicas x chunk_samples, never the whole array.
+        """
+        q = np.atleast_1d(np.asarray(q, dtype=np.float64))
+        data = self.arrays[key]
+        out = np.empty((len(q), self.n_samples), dtype=np.float64)
+        for start in range(0, self.n_samples, chunk_samples):
+            stop = min(start + chunk_samples, self.n_samples)
+            out[:, start:stop] = np.quantile(data[:, start:stop], q, axis=0)
+        return out
+    
+    def summary(self, q: Sequence[float] = (0.05, 0.5, 0.95)) -> Dict[str, dict]:
+        """Mean and quantile bands for every recorded series"""
+        return {key: {'mean': self.mean(key), 'quantiles': self.quantile(key, q), 'q': tuple(q)}
+                for key in self.arrays}
+    
+    def close(self):
+        """Drop the array views and free the shared memory"""
+        self.arrays = {}
+        self.stopped_at = None
+        blocks = list(self._blocks.values()) + ([self._stop_block] if self._stop_block else [])
+        for shm in blocks:
+            shm.close()
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+        self._blocks = {}
+        self._stop_block = None
+    
+    def __enter__(self) -> 'EnsembleResult':
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _replica_seeds(seed: Optional[int], n_replicas: int) -> List[int]:
+    """Independent, reproducible per-replica seeds"""
+    children = np.random.SeedSequence(seed).spawn(n_replicas)
+    return [int(child.generate_state(1, dtype=np.uint64)[0]) for child in children]
+
+
+def _replica_seed(root: np.random.SeedSequence, replica: int) -> int:
+    """Seed of one replica, equal to _replica_seeds(seed, n)[replica] for the same root"""
+    child = np.random.SeedSequence(root.entropy, spawn_key=root.spawn_key + (replica,))
+    return int(child.generate_state(1, dtype=np.uint64)[0])
+
+
+def run_replica_into(rows: Dict[str, np.ndarray], replica: int, seed: int, n_samples: int,
+                     record_every: int, sim_kwargs: dict) -> int:
+    """Run one replica, writing each recorded sample into rows[key][replica].
+    
+    Returns the round the replica stopped at (-1 if it ran to the end).
+    When a replica stops early (convergence / absorbing state) its last
+    values are carried forward so every column stays comparable.
+    """
+    sim = WealthInequalitySimulation(seed=seed, stats_interval=record_every,
+                                     keep_history=False, **sim_kwargs)
+    
+    stopped_at = -1
+    values = sim.last_statistics
+    for sample in range(n_samples):
+        if sample > 0 and stopped_at < 0:
+            sim.run(record_every)
+            values = sim.last_statistics
+            if sim.current_round < sample * record_every:
+                # Stopped between recording points: take the final state
+                stopped_at = sim.current_round
+                values = sim.compute_statistics()
+        for key, value in zip(SERIES, values):
+            if key in rows:
+                rows[key][replica, sample] = value
+    return stopped_at
+
+
+def _worker(layout: dict, replicas: Sequence[Tuple[int, int]], n_samples: int,
+            record_every: int, sim_kwargs: dict) -> int:
+    """Process-pool task: attach to the shared arrays and fill some replicas"""
+    blocks = []
+    try:
+        rows = {}
+        for key, (name, dtype) in layout['series'].items():
+            shm = _attach(name)
+            blocks.append(shm)
+            rows[key] = np.ndarray(layout['shape'], dtype=np.dtype(dtype), buffer=shm.buf)
+        stop_shm = _attach(layout['stopped_at'])
+        blocks.append(stop_shm)
+        stopped_at = np.ndarray((layout['shape'][0],), dtype=np.int64, buffer=stop_shm.buf)
+        
+        for replica, seed in replicas:
+            stopped_at[replica] = run_replica_into(rows, replica, seed, n_samples, record_every, sim_kwargs)
+        return len(replicas)
+    finally:
+        rows = stopped_at = None
+        for shm in blocks:
+            shm.close()
+
+
+def run_ensemble(n_replicas: int, n_rounds: int, record_every: int = 1,
+                 processes: Optional[int] = None, seed: Optional[int] = None,
+                 replicas_per_task: Optional[int] = None,
+                 series: Sequence[str] = tuple(SERIES),
+                 executor: Literal['process', 'thread'] = 'process', **sim_kwargs) -> EnsembleResult:
+    """Run n_replicas independent simulations on a process (or thread) pool.
+    
+    Every `record_every` rounds each replica writes one sample per series
+    into the shared arrays (n_rounds // record_every + 1 samples including
+    round 0). Extra keyword arguments go to WealthInequalitySimulation.
+    `processes` is the number of workers for either executor; each replica
+    owns its Generator and buffers, so threads share nothing mutable.
+    
+    The caller owns the returned EnsembleResult and must close() it.
+    """
+    if executor not in ('process', 'thread'):
+        raise ValueError(f"Unknown executor '{executor}' (expected 'process' or 'thread')")
+    n_samples = n_rounds // record_every + 1
+    result = EnsembleResult(n_replicas, n_samples, record_every, series, shared=executor == 'process')
+    seeds = _replica_seeds(seed, n_replicas)
+    jobs = list(enumerate(seeds))
+    
+    processes = processes or os.cpu_count() or 1
+    if replicas_per_task is None:
+        # A few tasks per worker for load balancing (replicas can stop early)
+        replicas_per_task = max(1, n_replicas // (processes * 4))
+    tasks = [jobs[i:i + replicas_per_task] for i in range(0, n_replicas, replicas_per_task)]
+    
+    try:
+        if processes == 1 or executor == 'thread':
+            def run_task(task):
+                for replica, replica_seed in task:
+                    result.stopped_at[replica] = run_replica_into(
+                        result.arrays, replica, replica_seed, n_samples, record_every, sim_kwargs)
+            
+            if processes == 1:
+                for task in tasks:
+                    run_task(task)
+            else:
+                with ThreadPoolExecutor(max_workers=processes) as pool:
+                    for future in [pool.submit(run_task, task) for task in tasks]:
+                        future.result()
+        else:
+            layout = result.layout()
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                futures = [pool.submit(_worker, layout, task, n_samples, record_every, sim_kwargs)
+                           for task in tasks]
+                for future in futures:
+                    future.result()
+    except BaseException:
+        result.close()
+        raise
+    return result
+
+
+def measure_thread_scaling(n_replicas: int = 32, n_rounds: int = 2000, record_every: int = 1,
+                           threads: Sequence[int] = (1, 2, 4, 8, 16, 32), seed: int = 0,
+                           repeats: int = 3, **sim_kwargs) -> List[dict]:
+    """Time the same thread-pool ensemble at each thread count
+    
+    Returns one row per thread count with wall time (best of `repeats`),
+    replicas per second, speedup over the first row and parallel efficiency. Flat speedup means
+    the workload is dominated by code that holds the GIL (the per-round
+    exchange loop); it grows when GIL-free NumPy work (large populations,
+    statistics every round, vectorized policies) dominates.
+    """
+    # Warm-up so the first row does not pay for imports and first-touch allocation
+    with run_ensemble(1, min(n_rounds, record_every), record_every, processes=1, seed=seed,
+                      executor='thread', **sim_kwargs):
+        pass
+    
+    rows = []
+    for n_threads in threads:
+        timings = []
+        for _ in range(max(1, repeats)):
+            start = time.perf_counter()
+            with run_ensemble(n_replicas, n_rounds, record_every, processes=n_threads, seed=seed,
+                              replicas_per_task=1, executor='thread', **sim_kwargs):
+                pass
+            timings.append(time.perf_counter() - start)
+        elapsed = min(timings)
+        rows.append({'threads': n_threads, 'seconds': elapsed,
+                     'replicas_per_second': n_replicas / elapsed})
+    base = rows[0]['seconds'] * rows[0]['threads']
+    for row in rows:
+        row['speedup'] = rows[0]['seconds'] / row['seconds']
+        row['efficiency'] = base / (row['seconds'] * row['threads'])
+    return rows
+
+
+def half_width(values: Sequence[float], confidence: float = 0.95) -> float:
+    """Half-width of the normal-approximation confidence interval of the mean"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 2:
+        return math.inf
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    return float(z * values.std(ddof=1) / math.sqrt(len(values)))
+
+
+def replicas_needed(values: Sequence[float], precision: float, confidence: float = 0.95) -> int:
+    """Total replicas for the interval to shrink to +-precision at the current spread"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 2:
+        return 2
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    return max(len(values), math.ceil((z * values.std(ddof=1) / precision) ** 2))
+
+
+def next_wave(values: Sequence[float], precision: float, confidence: float = 0.95,
+              max_replicas: int = 1000) -> int:
+    """Replicas to add before checking again (0 = precise enough or at the cap)
+    
+    The projected shortfall, but at most doubling the sample: the spread of a
+    few replicas is itself noisy, so the estimate is refined wave by wave.
+    """
+    n = len(values)
+    if n >= max_replicas or half_width(values, confidence) <= precision:
+        return 0
+    return max(1, min(replicas_needed(values, precision, confidence) - n, n, max_replicas - n))
+
+
+def final_statistics(seed: int, n_rounds: int, record_every: int, sim_kwargs: dict) -> Tuple[float, ...]:
+    """Run one replica to n_rounds (or until it stops) and return its final
+    (gini, active count, top 10% share, top 1% share)"""
+    sim = WealthInequalitySimulation(seed=seed, stats_interval=record_every,
+                                     keep_history=False, **sim_kwargs)
+    sim.run(n_rounds)
+    return sim.compute_statistics()
+
+
+@dataclass
+class PrecisionResult:
+    """Final statistics of every replica of every cell of a run_to_precision call"""
+    configs: List[dict]
+    values: List[np.ndarray]  # Per cell: (replicas, 4) final gini, active count, top 10%, top 1%
+    series: str
+    precision: float
+    confidence: float
+    
+    @property
+    def replicas(self) -> np.ndarray:
+        return np.array([len(v) for v in self.values])
+    
+    @property
+    def means(self) -> np.ndarray:
+        """(cells, 4) mean final statistics"""
+        return np.array([v.mean(axis=0) for v in self.values])
+    
+    @property
+    def half_widths(self) -> np.ndarray:
+        """Interval half-width of the target series in each cell"""
+        column = tuple(SERIES).index(self.series)
+        return np.array([half_width(v[:, column], self.confidence) for v in self.values])
+    
+    @property
+    def converged(self) -> np.ndarray:
+        """Cells that reached the precision (the others hit max_replicas)"""
+        return self.half_widths <= self.precision
+
+
+def run_to_precision(n_rounds: int, precision: float = 0.005, series: str = 'gini',
+                     confidence: float = 0.95, configs: Optional[Sequence[dict]] = None,
+                     min_replicas: int = 8, max_replicas: int = 1000, record_every: int = 100,
+                     processes: Optional[int] = None, seed: Optional[int] = None,
+                     executor: Literal['process', 'thread'] = 'process',
+                     **sim_kwargs) -> PrecisionResult:
+    """Add replicas in waves until the mean final `series` of each cell is
+    known to +-precision at `confidence`.
+    
+    Cells are `configs` (each merged over sim_kwargs), or just sim_kwargs.
+    Every wave submits the replicas all unfinished cells still need to one
+    pool, so noisy cells get more replicas and settled ones stop. Replica i
+    of every cell uses the same seed, equal to run_ensemble's replica i.
+    """
+    if series not in SERIES:
+        raise ValueError(f"Unknown series '{series}' (expected one of {', '.join(SERIES)})")
+    if executor not in ('process', 'thread'):
+        raise ValueError(f"Unknown executor '{executor}' (expected 'process' or 'thread')")
+    cells = [{**sim_kwargs, **config} for config in configs] if configs else [dict(sim_kwargs)]
+    column = tuple(SERIES).index(series)
+    root = np.random.SeedSequence(seed)
+    rows: List[List[Tuple[float, ...]]] = [[] for _ in cells]
+    wanted = {cell: max(2, min_replicas) for cell in range(len(cells))}
+    
+    processes = processes or os.cpu_count() or 1
+    pool = None
+    if processes > 1:
+        pool = (ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor)(max_workers=processes)
+    try:
+        while wanted:
+            jobs = [(cell, replica) for cell, count in wanted.items()
+                    for replica in range(len(rows[cell]), len(rows[cell]) + count)]
+            args = [(_replica_seed(root, replica), n_rounds, record_every, cells[cell]) for cell, replica in jobs]
+            results = (pool.map(final_statistics, *zip(*args)) if pool is not None else
+                       (final_statistics(*arg) for arg in args))
+            for (cell, _), stats in zip(jobs, results):
+                rows[cell].append(stats)
+            wanted = {}
+            for cell in range(len(cells)):
+                count = next_wave([row[column] for row in rows[cell]], precision, confidence, max_replicas)
+                if count:
+                    wanted[cell] = count
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    
+    return PrecisionResult(configs=cells, values=[np.array(r, dtype=np.float64) for r in rows],
+                           series=series, precision=precision, confidence=confidence)
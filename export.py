@@ -0,0 +1,355 @@
+"""Columnar export of run histories, per-style results and wealth snapshots
+
+A `RunExporter` listens to a simulation and appends every recorded round
+to three tables in a directory:
+
+- history: round, gini, active_count, top_10_percent, top_1_percent, the
+  cumulative policy totals and any extended metrics
+- styles: round, style, agents, active, survival_rate, avg_wealth
+- snapshots (every `snapshot_every` rounds, per mode): round, agent,
+  wealth (full); round, lower, upper, count (histogram); round, level,
+  wealth (quantiles)
+
+Rows are buffered and written every `chunk_rows` rows - Parquet
+row groups or Feather record batches (with pyarrow), otherwise one `.npy`
+member per column chunk of an `.npz` archive - so memory stays flat however
+long the run, and the engine itself can run with keep_history=False or a
+history_limit. `load_export` reads a directory back into pandas DataFrames.
+
+    with RunExporter(sim, 'runs/baseline'):
+        sim.run(1_000_000)
+    frames = load_export('runs/baseline')
+"""
+import json
+import os
+import zipfile
+from typing import Dict, List, Literal, Optional, Sequence
+
+import numpy as np
+
+from snapshot_store import SNAPSHOT_MODES, SnapshotStore, histogram_edges
+from wealth_inequality_sim import STYLES, WealthInequalitySimulation
+
+EXPORT_FORMATS = ('parquet', 'feather', 'npz')
+EXTENSIONS = {'parquet': 'parquet', 'feather': 'feather', 'npz': 'npz'}
+TABLES = ('history', 'styles', 'snapshots')
+META_FILE = 'meta.json'
+
+HISTORY_COLUMNS = ('round', 'gini', 'active_count', 'top_10_percent', 'top_1_percent',
+                   'total_taxes_collected', 'total_ubi_distributed', 'total_safety_net_paid')
+SNAPSHOT_COLUMNS = {'full': ('agent', 'wealth'), 'histogram': ('lower', 'upper', 'count'),
+                    'quantiles': ('level', 'wealth')}
+STYLE_NAMES = [style.value for style in STYLES]
+# Run state rather than configuration: left out of the exported parameters
+_STATE_KEYS = {'rng_state', 'current_round', 'furthest_round', 'total_taxes_collected',
+               'total_ubi_distributed', 'total_safety_net_paid', 'safety_net_interventions',
+               'converged_at_round', 'convergence_reason'}
+
+
+def has_pyarrow() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class _RowBuffer:
+    """Fixed-width numeric rows in one flat list - a single extend per
+    recorded round - taken as a float64 matrix (exact for the integer
+    columns too)"""
+    
+    def __init__(self, width: int):
+        self.width = width
+        self.values: list = []
+        self.written = 0
+    
+    @property
+    def rows(self) -> int:
+        return len(self.values) // self.width
+    
+    def take(self) -> np.ndarray:
+        matrix = np.array(self.values, dtype=np.float64).reshape(-1, self.width)
+        self.values = []
+        self.written += len(matrix)
+        return matrix
+
+
+class _ArrayBuffer:
+    """Per-column array parts (one per snapshot), concatenated when taken"""
+    
+    def __init__(self, columns: Sequence[str]):
+        self.parts: Dict[str, List[np.ndarray]] = {column: [] for column in columns}
+        self.rows = 0
+        self.written = 0
+    
+    def add(self, **arrays: np.ndarray):
+        for column, values in arrays.items():
+            self.parts[column].append(values)
+        self.rows += len(values)
+    
+    def take(self) -> Dict[str, np.ndarray]:
+        data = {column: np.concatenate(parts) for column, parts in self.parts.items()}
+        for parts in self.parts.values():
+            parts.clear()
+        self.written += self.rows
+        self.rows = 0
+        return data
+
+
+class _ArrowSink:
+    """Parquet (one row group per chunk) or Feather / Arrow IPC (one record batch per chunk)"""
+    
+    def __init__(self, directory: str, format: str, compression: Optional[str]):
+        import pyarrow
+        self.pa = pyarrow
+        self.directory = directory
+        self.format = format
+        self.compression = compression
+        self.writers = {}
+    
+    def write(self, name: str, data: Dict[str, np.ndarray]):
+        pa = self.pa
+        batch = pa.RecordBatch.from_arrays([pa.array(values) for values in data.values()], names=list(data))
+        writer = self.writers.get(name)
+        if writer is None:
+            path = os.path.join(self.directory, f"{name}.{EXTENSIONS[self.format]}")
+            if self.format == 'parquet':
+                import pyarrow.parquet
+                writer = pyarrow.parquet.ParquetWriter(path, batch.schema, compression=self.compression or 'snappy')
+            else:
+                options = pa.ipc.IpcWriteOptions(compression=self.compression or 'lz4')
+                writer = pa.ipc.new_file(path, batch.schema, options=options)
+            self.writers[name] = writer
+        if self.format == 'parquet':
+            writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            writer.write_batch(batch)
+    
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+
+
+class _NpzSink:
+    """One `.npz` archive per table, with a `<column>/<chunk>.npy` member per column chunk
+    
+    Members are added as the chunks arrive (np.savez would need every array
+    at once); np.load still opens the archive.
+    """
+    
+    def __init__(self, directory: str, compression: Optional[str]):
+        self.directory = directory
+        self.method = zipfile.ZIP_STORED if compression == 'none' else zipfile.ZIP_DEFLATED
+        self.archives: Dict[str, zipfile.ZipFile] = {}
+        self.chunks: Dict[str, int] = {}
+    
+    def write(self, name: str, data: Dict[str, np.ndarray]):
+        archive = self.archives.get(name)
+        if archive is None:
+            path = os.path.join(self.directory, f"{name}.npz")
+            # Level 1: most of the size saving at a fraction of the default's CPU
+            archive = zipfile.ZipFile(path, 'w', compression=self.method, compresslevel=1, allowZip64=True)
+            self.archives[name] = archive
+            self.chunks[name] = 0
+        for column, values in data.items():
+            with archive.open(f"{column}/{self.chunks[name]:06d}.npy", 'w', force_zip64=True) as member:
+                np.lib.format.write_array(member, values, allow_pickle=False)
+        self.chunks[name] += 1
+    
+    def close(self):
+        for archive in self.archives.values():
+            archive.close()
+        self.archives = {}
+
+
+class RunExporter:
+    """Streams a simulation's recorded rounds to columnar files in `path`
+    
+    Attaches to `sim.listeners` on creation and detaches on close() (or at
+    the end of a with block). The first row is the attach round (with the
+    statistics the engine last recorded); then every round the engine
+    records, in the order they are run: after a seek() back, rounds repeat.
+    
+    format: 'parquet' or 'feather' (need pyarrow), 'npz', or 'auto'
+    (Parquet if pyarrow is installed, else npz). snapshots: a snapshot mode
+    ('full', 'histogram', 'quantiles'), 'auto' for the simulation's own mode,
+    or None for no snapshot table. snapshot_every defaults to the engine's
+    snapshot interval; snapshots fall on recorded rounds that are multiples
+    of it.
+    """
+    
+    def __init__(self, sim: WealthInequalitySimulation, path: str,
+                 format: Literal['auto', 'parquet', 'feather', 'npz'] = 'auto',
+                 snapshots: Optional[str] = 'auto', snapshot_every: Optional[int] = None,
+                 chunk_rows: int = 65536, compression: Optional[str] = None):
+        if format == 'auto':
+            format = 'parquet' if has_pyarrow() else 'npz'
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format '{format}' (expected one of {', '.join(EXPORT_FORMATS)})")
+        if format != 'npz' and not has_pyarrow():
+            raise ImportError(f"{format} export needs pyarrow (pip install pyarrow), or use format='npz'")
+        if snapshots == 'auto':
+            snapshots = sim.snapshot_mode
+        if snapshots is not None and snapshots not in SNAPSHOT_MODES:
+            raise ValueError(f"Unknown snapshot mode '{snapshots}' (expected one of {', '.join(SNAPSHOT_MODES)})")
+        
+        self.sim = sim
+        self.path = path
+        self.format = format
+        self.snapshots = snapshots
+        self.snapshot_every = max(1, int(snapshot_every or sim.stats_record_interval))
+        self.chunk_rows = max(1, int(chunk_rows))
+        os.makedirs(path, exist_ok=True)
+        self._sink = _ArrowSink(path, format, compression) if format != 'npz' else _NpzSink(path, compression)
+        
+        self.metric_keys: List[str] = list(sim.metrics_history)
+        self._history = _RowBuffer(len(HISTORY_COLUMNS) + len(self.metric_keys))
+        # Per recorded round: round, then agents, active agents and active wealth per style
+        self._styles = _RowBuffer(1 + 3 * len(STYLES))
+        
+        # Snapshots reuse the snapshot store's summaries (bins / quantile levels)
+        self._summarizer: Optional[SnapshotStore] = None
+        self._snapshots: Optional[_ArrayBuffer] = None
+        if snapshots is not None:
+            edges = sim.wealth_history.edges if sim.snapshot_mode == 'histogram' else None
+            if snapshots == 'histogram' and edges is None:
+                edges = histogram_edges(sim.min_wealth, sim.n_agents * sim.initial_wealth, sim.snapshot_bins)
+            self._summarizer = SnapshotStore(snapshots, edges, sim.snapshot_quantiles)
+            self._snapshots = _ArrayBuffer(('round',) + SNAPSHOT_COLUMNS[snapshots])
+        
+        self.start_round = sim.current_round
+        self.closed = False
+        self._write_meta(complete=False)
+        self._record(sim)
+        sim.listeners.append(self._record)
+    
+    def _record(self, sim: WealthInequalitySimulation):
+        r = sim.current_round
+        history = self._history.values
+        history.append(r)
+        history.extend(sim.last_statistics)
+        history += (sim.total_taxes_collected, sim.total_ubi_distributed, sim.total_safety_net_paid)
+        if self.metric_keys:
+            history.extend([sim.last_metrics[key] for key in self.metric_keys])
+        styles = self._styles.values
+        styles.append(r)
+        for values in sim.style_aggregates():
+            styles += values.tolist()
+        
+        if self._snapshots is not None and r % self.snapshot_every == 0:
+            self._record_snapshot(sim, r)
+        
+        if self._history.rows >= self.chunk_rows:
+            self._write_history()
+        if self._snapshots is not None and self._snapshots.rows >= self.chunk_rows:
+            self._sink.write('snapshots', self._snapshots.take())
+    
+    def _record_snapshot(self, sim: WealthInequalitySimulation, r: int):
+        ids = sim.active_ids
+        data = self._summarizer.summarize(sim.wealth[ids])
+        if self.snapshots == 'full':
+            # Copies: the engine keeps changing its own arrays
+            parts = {'agent': ids.astype(np.int64), 'wealth': np.array(data)}
+        elif self.snapshots == 'histogram':
+            edges = self._summarizer.edges
+            parts = {'lower': edges[:-1], 'upper': edges[1:], 'count': data.astype(np.int64)}
+        else:
+            parts = {'level': self._summarizer.levels, 'wealth': data}
+        self._snapshots.add(round=np.full(len(data), r, dtype=np.int64), **parts)
+    
+    def _write_history(self):
+        """Write the buffered history and per-style rows as columns"""
+        matrix = self._history.take()
+        history = dict(zip(HISTORY_COLUMNS + tuple(self.metric_keys), matrix.T))
+        for column in ('round', 'active_count'):
+            history[column] = history[column].astype(np.int64)
+        self._sink.write('history', history)
+        
+        matrix = self._styles.take()
+        n = len(STYLES)
+        totals, active, wealth = (matrix[:, 1 + k * n:1 + (k + 1) * n].ravel() for k in range(3))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            survival_rate = np.where(totals > 0, active / totals, 0.0)
+            avg_wealth = np.where(active > 0, wealth / active, 0.0)
+        self._sink.write('styles', {
+            'round': np.repeat(matrix[:, 0], n).astype(np.int64),
+            'style': np.tile(np.array(STYLE_NAMES), len(matrix)),
+            'agents': totals.astype(np.int64), 'active': active.astype(np.int64),
+            'survival_rate': survival_rate, 'avg_wealth': avg_wealth})
+    
+    def _write_meta(self, complete: bool):
+        config = {key: value for key, value in self.sim.to_dict(max_history=1, compact=True).items()
+                  if key not in _STATE_KEYS and isinstance(value, (bool, int, float, str, type(None)))}
+        written = {'history': self._history.written, 'styles': self._styles.written * len(STYLES)}
+        if self._snapshots is not None:
+            written['snapshots'] = self._snapshots.written
+        meta = {'format': self.format, 'rows': written,
+                'snapshot_mode': self.snapshots, 'snapshot_every': self.snapshot_every,
+                'start_round': self.start_round, 'end_round': self.sim.current_round,
+                'complete': complete, 'parameters': config}
+        with open(os.path.join(self.path, META_FILE), 'w') as f:
+            json.dump(meta, f, indent=2)
+    
+    def flush(self):
+        """Write every buffered row now (a short chunk)"""
+        if self._history.rows:
+            self._write_history()
+        if self._snapshots is not None and self._snapshots.rows:
+            self._sink.write('snapshots', self._snapshots.take())
+    
+    def close(self):
+        """Flush, finish the files and detach from the simulation"""
+        if self.closed:
+            return
+        if self._record in self.sim.listeners:
+            self.sim.listeners.remove(self._record)
+        self.flush()
+        self._sink.close()
+        self._write_meta(complete=True)
+        self.closed = True
+    
+    def __enter__(self) -> 'RunExporter':
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _read_npz(path: str) -> Dict[str, np.ndarray]:
+    with np.load(path, allow_pickle=False) as archive:
+        chunks: Dict[str, List[str]] = {}
+        for key in archive.files:
+            column, _ = key.rsplit('/', 1)
+            chunks.setdefault(column, []).append(key)
+        return {column: np.concatenate([archive[key] for key in sorted(keys)])
+                for column, keys in chunks.items()}
+
+
+def load_export(path: str, tables: Sequence[str] = TABLES) -> dict:
+    """The exported tables of `path` as pandas DataFrames (name -> DataFrame)
+    
+    Tables that were never written (e.g. no snapshots) are left out. Every
+    frame carries the run's metadata (format, parameters, rounds) in
+    `frame.attrs['meta']`.
+    """
+    import pandas as pd
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+    frames = {}
+    for name in tables:
+        file = os.path.join(path, f"{name}.{EXTENSIONS[meta['format']]}")
+        if not os.path.exists(file):
+            continue
+        if meta['format'] == 'parquet':
+            frame = pd.read_parquet(file)
+        elif meta['format'] == 'feather':
+            frame = pd.read_feather(file)
+        else:
+            frame = pd.DataFrame(_read_npz(file))
+        if 'style' in frame:
+            frame['style'] = frame['style'].astype('category')
+        frame.attrs['meta'] = meta
+        frames[name] = frame
+    return frames
@@ -0,0 +1,134 @@
+"""Inequality metrics from one sorted wealth array
+
+`InequalityMetrics.compute` takes the ascending sort the engine already
+makes for its statistics and derives every selected metric from it with a
+single cumulative sum (Gini, percentile shares, Palma, Lorenz points) and
+at most one pass of logs / powers (Theil, Atkinson). Enabling more metrics
+adds O(N) work per snapshot, never another sort.
+"""
+from typing import Dict, Iterable, Optional, Sequence, Union
+
+import numpy as np
+
+METRICS = ('gini', 'theil', 'atkinson', 'palma', 'lorenz', 'shares')
+
+
+def _share_key(side: str, fraction: float) -> str:
+    return f"{side}_{fraction * 100:g}%"
+
+
+class InequalityMetrics:
+    """Configurable set of inequality metrics
+    
+    - gini: Gini coefficient
+    - theil: Theil T index (0 log 0 = 0)
+    - atkinson: Atkinson index for each epsilon in `atkinson_epsilons`
+      ('atkinson_0.5', ...); 1.0 when epsilon >= 1 and someone holds nothing
+    - palma: top 10% share / bottom 40% share
+    - lorenz: Lorenz curve at `lorenz_points` evenly spaced population shares
+    - shares: % of wealth held by the top / bottom fractions in
+      `top_shares` / `bottom_shares` ('top_10%', 'bottom_50%', ...)
+    """
+    
+    def __init__(self, metrics: Iterable[str] = METRICS,
+                 atkinson_epsilons: Sequence[float] = (0.5, 1.0, 2.0),
+                 top_shares: Sequence[float] = (0.1, 0.01),
+                 bottom_shares: Sequence[float] = (0.5,),
+                 lorenz_points: int = 21):
+        self.metrics = tuple(dict.fromkeys(metrics))
+        unknown = set(self.metrics) - set(METRICS)
+        if unknown:
+            raise ValueError(f"Unknown metrics {sorted(unknown)} (expected any of {', '.join(METRICS)})")
+        self.atkinson_epsilons = tuple(float(e) for e in atkinson_epsilons)
+        self.top_shares = tuple(float(p) for p in top_shares)
+        self.bottom_shares = tuple(float(p) for p in bottom_shares)
+        self.lorenz_points = max(2, int(lorenz_points))
+    
+    @property
+    def scalar_keys(self) -> tuple:
+        """Keys of the scalar outputs (everything but the Lorenz curve), in order"""
+        keys = []
+        for name in self.metrics:
+            if name == 'atkinson':
+                keys += [f"atkinson_{e:g}" for e in self.atkinson_epsilons]
+            elif name == 'shares':
+                keys += [_share_key('top', p) for p in self.top_shares]
+                keys += [_share_key('bottom', p) for p in self.bottom_shares]
+            elif name != 'lorenz':
+                keys.append(name)
+        return tuple(keys)
+    
+    def compute(self, sorted_wealths: np.ndarray) -> Dict[str, Union[float, np.ndarray]]:
+        """All selected metrics of an ascending-sorted wealth array"""
+        w = np.asarray(sorted_wealths, dtype=np.float64)
+        n = len(w)
+        cumulative = np.cumsum(w) if n else w
+        total = float(cumulative[-1]) if n else 0.0
+        if n == 0 or total <= 0:
+            return self._degenerate()
+        mean = total / n
+        
+        def top(fraction: float) -> float:
+            # Wealth of the richest max(1, floor(n * fraction)) agents
+            k = max(1, int(n * fraction))
+            return total - float(cumulative[n - k - 1]) if k < n else total
+        
+        def bottom(fraction: float) -> float:
+            k = int(n * fraction)
+            return float(cumulative[k - 1]) if k > 0 else 0.0
+        
+        out: Dict[str, Union[float, np.ndarray]] = {}
+        log_ratio = None
+        for name in self.metrics:
+            if name == 'gini':
+                # sum_i (2i - n - 1) w_i / (n total), via the cumulative sum
+                out['gini'] = float((n + 1 - 2 * cumulative.sum() / total) / n)
+            elif name in ('theil', 'atkinson'):
+                ratio = w / mean
+                if log_ratio is None:
+                    log_ratio = np.log(ratio, out=np.zeros(n), where=ratio > 0)
+                if name == 'theil':
+                    out['theil'] = float(np.dot(ratio, log_ratio) / n)
+                    continue
+                for epsilon in self.atkinson_epsilons:
+                    key = f"atkinson_{epsilon:g}"
+                    if epsilon >= 1 and w[0] <= 0:
+                        out[key] = 1.0
+                    elif epsilon == 1:
+                        out[key] = float(1.0 - np.exp(log_ratio.mean()))
+                    elif epsilon == 0.5:
+                        out[key] = float(1.0 - np.sqrt(ratio).mean() ** 2)
+                    elif epsilon == 2:
+                        # Harmonic mean (everyone holds something here)
+                        out[key] = float(1.0 - 1.0 / np.reciprocal(ratio).mean())
+                    else:
+                        power = np.exp((1 - epsilon) * log_ratio, out=np.zeros(n), where=ratio > 0)
+                        out[key] = float(1.0 - power.mean() ** (1 / (1 - epsilon)))
+            elif name == 'palma':
+                poorest = bottom(0.4)
+                out['palma'] = top(0.1) / poorest if poorest > 0 else float('inf')
+            elif name == 'lorenz':
+                index = np.rint(np.linspace(0, n, self.lorenz_points)).astype(np.int64)
+                out['lorenz'] = np.concatenate(([0.0], cumulative))[index] / total
+            elif name == 'shares':
+                for p in self.top_shares:
+                    out[_share_key('top', p)] = top(p) / total * 100
+                for p in self.bottom_shares:
+                    out[_share_key('bottom', p)] = bottom(p) / total * 100
+        return out
+    
+    def _degenerate(self) -> Dict[str, Union[float, np.ndarray]]:
+        """Nobody (or nothing) left: perfect equality by convention"""
+        out: Dict[str, Union[float, np.ndarray]] = dict.fromkeys(self.scalar_keys, 0.0)
+        if 'lorenz' in self.metrics:
+            out['lorenz'] = np.linspace(0.0, 1.0, self.lorenz_points)
+        return out
+    
+    def to_dict(self) -> dict:
+        return {'metrics': list(self.metrics), 'atkinson_epsilons': list(self.atkinson_epsilons),
+                'top_shares': list(self.top_shares), 'bottom_shares': list(self.bottom_shares),
+                'lorenz_points': self.lorenz_points}
+    
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> Optional['InequalityMetrics']:
+        return cls(**data) if data else None
@@ -0,0 +1,337 @@
+"""Mean-field surrogate: the wealth density evolved as a Fokker-Planck equation
+
+SIMULATION_SUMMARY.md describes the dynamics as a biased random walk with
+an absorbing barrier. This module solves that walk in the continuum: the
+density of active agents of each trading style lives on a log-spaced
+wealth grid from min_wealth to the largest reachable wealth, and is
+advanced per round of the agent-based model:
+
+* Trades: each round one pair trades, so an active agent trades at rate
+  2 / N_active. The drift and diffusion of log-wealth per trade are the
+  exact first two moments of the log-jump, ln(1 + S / w) with probability
+  0.5 + b if the partner is poorer (0.5 - b if richer) and ln(1 - S / w)
+  otherwise, averaged over the current partner density with stake
+  S = min(f w, f' w'). The moments are two matrix-vector products against
+  kernels built once per grid. The Fokker-Planck equation is stepped with
+  an explicit upwind scheme; mass crossing min_wealth is bankrupt.
+* Policies are closed-form maps of each grid point, remapped onto the grid
+  (mass-conserving linear interpolation): the flat tax as the exact
+  "descending ceiling" solution of taxing the top X% for the step's
+  rounds, the progressive tax as the solution of dw/dt = -r(w) w against
+  the density's median, UBI as a shift and the safety net as a floor.
+
+The cost does not depend on N (only the grid's upper end does), so Gini,
+top-share and survival trajectories take milliseconds for 100 or 10^6
+agents. It is a mean-field prediction: well-mixed trading (no network
+topology), no finite-N luck, and at very small N the top 1% of a
+continuum is not one agent.
+
+    from mean_field import predict
+    prediction = predict(20000, n_agents=1000, rich_bias=0.05)
+    prediction.gini[-1]
+"""
+import inspect
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from wealth_inequality_sim import STAKE_FRACTIONS
+
+DEFAULT_SPACING = 0.2  # Log-wealth between grid points (~60 points for 100 agents)
+DEFAULT_MAX_STEP = 2.0  # Trades per agent per step (policies are applied once per step)
+
+
+@dataclass
+class MeanFieldResult:
+    """Predicted statistics at the recorded rounds, plus the final density"""
+    rounds: np.ndarray
+    gini: np.ndarray
+    active_count: np.ndarray
+    top_10_percent: np.ndarray
+    top_1_percent: np.ndarray
+    wealth_grid: np.ndarray  # Grid points (wealth)
+    density: np.ndarray  # Final agents per grid point, per style (styles x points)
+    n_agents: int
+    elapsed: float  # Seconds
+    
+    @property
+    def bankrupt_fraction(self) -> np.ndarray:
+        return np.maximum(1.0 - self.active_count / self.n_agents, 0.0)
+    
+    def final(self) -> Dict[str, float]:
+        """Final values, keyed like sweep.CELL_METRICS"""
+        return {'gini': float(self.gini[-1]), 'top_1_percent': float(self.top_1_percent[-1]),
+                'bankrupt_fraction': float(self.bankrupt_fraction[-1])}
+
+
+def _gini_and_shares(wealth: np.ndarray, mass: np.ndarray) -> Tuple[float, float, float]:
+    """Gini and top 10% / 1% wealth shares (percent) of `mass` agents at ascending `wealth`"""
+    population = mass.sum()
+    amounts = mass * wealth
+    total = amounts.sum()
+    if population <= 0 or total <= 0:
+        return 0.0, 0.0, 0.0
+    lorenz = np.cumsum(amounts) / total
+    gini = 1.0 - float(np.dot(mass / population, lorenz + np.concatenate(([0.0], lorenz[:-1]))))
+    # Top shares from the rich end, taking part of the grid point at the cut
+    from_top = np.cumsum(mass[::-1])
+    top_amounts = np.cumsum(amounts[::-1])
+    shares = []
+    for fraction in (0.10, 0.01):
+        wanted = fraction * population
+        k = int(np.searchsorted(from_top, wanted))
+        if k >= len(mass):
+            shares.append(100.0)
+            continue
+        before_mass = from_top[k - 1] if k else 0.0
+        before_amount = top_amounts[k - 1] if k else 0.0
+        shares.append(float(100.0 * (before_amount + (wanted - before_mass) * wealth[::-1][k]) / total))
+    return max(gini, 0.0), shares[0], shares[1]
+
+
+class MeanFieldModel:
+    """Continuum counterpart of WealthInequalitySimulation (same parameter names)
+    
+    `spacing` sets the grid resolution (log-wealth) and `max_step` the
+    trades per agent between policy applications; both trade accuracy for
+    speed.
+    """
+    
+    def __init__(self, n_agents: int = 100, initial_wealth: float = 100.0,
+                 greedy_ratio: float = 0.33, neutral_ratio: float = 0.33,
+                 rich_bias: float = 0.05, min_wealth: float = 0.1,
+                 wealth_tax_enabled: bool = False, wealth_tax_threshold: float = 0.10,
+                 wealth_tax_rate: float = 0.02, wealth_tax_mode: str = 'flat',
+                 wealth_tax_exponent: float = 1.0, wealth_tax_max_rate: float = 0.5,
+                 wealth_tax_interval: int = 1,
+                 ubi_enabled: bool = False, ubi_amount: float = 1.0,
+                 safety_net_enabled: bool = False, safety_net_floor: float = 10.0,
+                 spacing: float = DEFAULT_SPACING, max_step: float = DEFAULT_MAX_STEP):
+        self.n_agents = int(n_agents)
+        self.initial_wealth = float(initial_wealth)
+        self.fractions = np.array([greedy_ratio, neutral_ratio,
+                                   max(0.0, 1.0 - greedy_ratio - neutral_ratio)])
+        self.rich_bias = float(rich_bias)
+        self.min_wealth = float(min_wealth)
+        self.wealth_tax_enabled = wealth_tax_enabled
+        self.wealth_tax_threshold = wealth_tax_threshold
+        self.wealth_tax_rate = wealth_tax_rate
+        self.wealth_tax_mode = wealth_tax_mode
+        self.wealth_tax_exponent = wealth_tax_exponent
+        self.wealth_tax_max_rate = wealth_tax_max_rate
+        self.wealth_tax_interval = max(1, int(wealth_tax_interval))
+        self.ubi_enabled = ubi_enabled
+        self.ubi_amount = ubi_amount
+        self.safety_net_enabled = safety_net_enabled
+        self.safety_net_floor = safety_net_floor
+        self.spacing = float(spacing)
+        self.max_step = float(max_step)
+    
+    @classmethod
+    def from_config(cls, config: dict, **options) -> 'MeanFieldModel':
+        """Model for a simulation config, ignoring what has no mean-field
+        counterpart (seed, topology, recording and memory options, ...)"""
+        kwargs = {name: value for name, value in config.items() if name in MODEL_PARAMETERS}
+        kwargs.update(options)
+        return cls(**kwargs)
+    
+    # --- Grid and trade kernels ---
+    
+    def _grid(self, n_rounds: int):
+        """Log-wealth grid points from min_wealth to the largest reachable wealth"""
+        top = self.n_agents * self.initial_wealth
+        if self.ubi_enabled:
+            top += self.n_agents * self.ubi_amount * n_rounds
+        if self.safety_net_enabled:
+            top += self.n_agents * self.safety_net_floor
+        low, high = np.log(self.min_wealth), np.log(max(top, 2 * self.initial_wealth))
+        # Spacing nudged so initial_wealth is a grid point: the starting
+        # density is then one spike, with a Gini of exactly 0
+        start = np.log(self.initial_wealth) - low
+        self.h = start / max(1, int(np.ceil(start / self.spacing))) if start > 0 else self.spacing
+        self.cells = max(16, int(np.ceil((high - low) / self.h - 1e-9)) + 1)
+        self.y = low + self.h * np.arange(self.cells)
+        self.w = np.exp(self.y)
+        # Kernels: moments of the log-jump of (style s, point i) trading with
+        # (style s', point j), rows s * cells + i, columns s' * cells + j
+        g = self.cells
+        ratio = self.w[None, :] / self.w[:, None]
+        win = 0.5 + self.rich_bias * np.sign(np.subtract.outer(np.arange(g), np.arange(g)))
+        n_styles = len(STAKE_FRACTIONS)
+        self._drift_kernel = np.empty((n_styles * g, n_styles * g))
+        self._spread_kernel = np.empty((n_styles * g, n_styles * g))
+        for s, own in enumerate(STAKE_FRACTIONS):
+            for t, other in enumerate(STAKE_FRACTIONS):
+                x = np.minimum(own, other * ratio)
+                up, down = np.log1p(x), np.log1p(-x)
+                rows, cols = slice(s * g, (s + 1) * g), slice(t * g, (t + 1) * g)
+                self._drift_kernel[rows, cols] = win * up + (1.0 - win) * down
+                self._spread_kernel[rows, cols] = 0.5 * (win * up * up + (1.0 - win) * down * down)
+        # With a floor no single loss (at most the largest stake) reaches min_wealth
+        self._absorbing = not (self.safety_net_enabled and
+                               self.safety_net_floor * (1.0 - STAKE_FRACTIONS.max()) >= self.min_wealth)
+    
+    def _remap(self, mass: np.ndarray, y_new: np.ndarray) -> np.ndarray:
+        """Move each grid point's mass to log-wealth y_new (same shape), split
+        linearly between the two nearest grid points"""
+        g = self.cells
+        position = np.clip((y_new - self.y[0]) / self.h, 0.0, g - 1.0)
+        lower = np.minimum(position.astype(np.int64), g - 2)
+        upper_part = position - lower
+        offsets = (np.arange(mass.shape[0]) * g)[:, None]
+        index = (lower + offsets).ravel()
+        out = np.bincount(index, weights=(mass * (1.0 - upper_part)).ravel(), minlength=mass.size)
+        out += np.bincount(index + 1, weights=(mass * upper_part).ravel(), minlength=mass.size)
+        return out.reshape(mass.shape)
+    
+    def _trade(self, mass: np.ndarray, trades: float) -> np.ndarray:
+        """Advance the Fokker-Planck equation by `trades` trades per agent"""
+        active = mass.sum()
+        if active <= 0:
+            return mass
+        partners = mass.ravel() / active
+        drift = (self._drift_kernel @ partners).reshape(mass.shape)
+        spread = (self._spread_kernel @ partners).reshape(mass.shape)
+        h = self.h
+        # Upwind flux through face i + 1/2: out[i] * mass[i] + back[i] * mass[i + 1]
+        face = 0.5 * (drift[:, 1:] + drift[:, :-1])
+        out = np.maximum(face, 0.0) + spread[:, :-1] / h
+        back = np.minimum(face, 0.0) - spread[:, 1:] / h
+        # Through the bottom face (bankruptcy): zero density beyond min_wealth
+        escape = np.zeros((mass.shape[0], 1))
+        if self._absorbing:
+            escape[:, 0] = np.minimum(drift[:, 0], 0.0) - 2.0 * spread[:, 0] / h
+        leaving = np.concatenate((out, np.zeros_like(escape)), axis=1) - np.concatenate((escape, back), axis=1)
+        # Explicit steps small enough to keep every coefficient non-negative
+        substeps = max(1, int(np.ceil(trades * leaving.max() / h)))
+        r = trades / substeps / h
+        diagonal = 1.0 - r * leaving
+        lower = r * out
+        upper = -r * back
+        for _ in range(substeps):
+            new = diagonal * mass
+            new[:, 1:] += lower * mass[:, :-1]
+            new[:, :-1] += upper * mass[:, 1:]
+            mass = new
+        return mass
+    
+    # --- Policies ---
+    
+    def _flat_tax(self, mass: np.ndarray, applications: float) -> np.ndarray:
+        """Tax the top `wealth_tax_threshold` by rate r, `applications` times
+        
+        Taxed agents move down ln(1 / (1 - r)) per application; agents
+        overtaken by the threshold join the taxed group. The exact result of
+        a static density: y -> max(y - shift, c) above the level c at which
+        the total log-shift equals (taxed mass) x shift.
+        """
+        shift = -np.log1p(-self.wealth_tax_rate) * applications
+        total = mass.sum(axis=0)
+        budget = self.wealth_tax_threshold * total.sum() * shift
+        # Log-shift taken if the ceiling settles at each grid point
+        above = np.clip(self.y[None, :] - self.y[:, None], 0.0, shift)  # [c, i]
+        taken = above @ total
+        k = int(np.searchsorted(-taken, -budget))  # First point taking less than the budget
+        if k == 0:
+            level = self.y[0]
+        elif k >= self.cells:
+            level = self.y[-1]
+        else:
+            # taken is linear in the level between grid points
+            level = self.y[k - 1] + self.h * (taken[k - 1] - budget) / (taken[k - 1] - taken[k])
+        y_new = np.where(self.y > level, np.maximum(self.y - shift, level), self.y)
+        return self._remap(mass, np.broadcast_to(y_new, mass.shape))
+    
+    def _progressive_tax(self, mass: np.ndarray, applications: float) -> np.ndarray:
+        """Solve dy/dt = -r(w) per application, r(w) = min(r0 (w / median)^gamma, max_rate)"""
+        total = mass.sum(axis=0)
+        cumulative = np.cumsum(total)
+        if cumulative[-1] <= 0:
+            return mass
+        y_median = float(np.interp(0.5 * cumulative[-1], cumulative, self.y))
+        r0, gamma, cap = self.wealth_tax_rate, self.wealth_tax_exponent, self.wealth_tax_max_rate
+        capped_speed = -np.log1p(-min(cap, 0.999))
+        if gamma <= 0 or r0 >= cap:
+            y_new = self.y - min(-np.log1p(-min(r0, cap)), capped_speed) * applications
+        else:
+            # Uncapped: dy/dt = -a e^(gamma y), a = r0 e^(-gamma y_median)
+            y_cap = y_median + np.log(cap / r0) / gamma
+            a = r0 * np.exp(-gamma * y_median)
+            start = np.minimum(self.y, y_cap)
+            # Time spent descending to y_cap at the capped speed
+            remaining = applications - np.maximum(self.y - y_cap, 0.0) / capped_speed
+            descended = self.y - capped_speed * applications
+            free = -np.log(np.exp(-gamma * start) + gamma * a * np.maximum(remaining, 0.0)) / gamma
+            y_new = np.where(remaining > 0, free, descended)
+        return self._remap(mass, np.broadcast_to(y_new, mass.shape))
+    
+    def _policies(self, mass: np.ndarray, rounds: float) -> np.ndarray:
+        if self.wealth_tax_enabled and self.wealth_tax_rate > 0:
+            applications = rounds / self.wealth_tax_interval
+            if self.wealth_tax_mode == 'progressive':
+                mass = self._progressive_tax(mass, applications)
+            else:
+                mass = self._flat_tax(mass, applications)
+        if self.ubi_enabled and self.ubi_amount:
+            y_new = np.log(np.maximum(self.w + self.ubi_amount * rounds, self.min_wealth))
+            mass = self._remap(mass, np.broadcast_to(y_new, mass.shape))
+        if self.safety_net_enabled:
+            y_new = np.log(np.maximum(self.w, self.safety_net_floor))
+            mass = self._remap(mass, np.broadcast_to(y_new, mass.shape))
+        return mass
+    
+    # --- Running ---
+    
+    def run(self, n_rounds: int, record_every: Optional[int] = None, points: int = 200) -> MeanFieldResult:
+        """Predicted statistics at rounds 0, record_every, 2 record_every, ...,
+        n_rounds (default: about `points` evenly spaced rounds)"""
+        started = time.perf_counter()
+        n_rounds = int(n_rounds)
+        record_every = max(1, int(record_every or -(-n_rounds // max(1, points))))
+        self._grid(n_rounds)
+        # Everyone starts at initial_wealth
+        start = np.zeros((len(self.fractions), self.cells))
+        start[:, 0] = self.fractions
+        mass = self._remap(start, np.full(start.shape, np.log(self.initial_wealth)))
+        if self.safety_net_enabled:
+            mass = self._policies(mass, 0.0)
+        recorded = np.unique(np.append(np.arange(0, n_rounds, record_every), n_rounds))
+        rows = []
+        current = 0.0
+        for target in recorded:
+            while current < target:
+                active = mass.sum() * self.n_agents
+                if active < 2:
+                    current = float(target)  # Trading has stopped (as in the engine)
+                    break
+                rounds = min(target - current, self.max_step * active / 2.0)
+                mass = self._trade(mass, 2.0 * rounds / active)
+                mass = self._policies(mass, rounds)
+                current += rounds
+            gini, top_10, top_1 = _gini_and_shares(self.w, mass.sum(axis=0))
+            rows.append((gini, mass.sum() * self.n_agents, top_10, top_1))
+        values = np.array(rows).T
+        return MeanFieldResult(rounds=recorded, gini=values[0], active_count=values[1],
+                               top_10_percent=values[2], top_1_percent=values[3],
+                               wealth_grid=self.w.copy(), density=mass * self.n_agents,
+                               n_agents=self.n_agents, elapsed=time.perf_counter() - started)
+
+
+# Simulation parameters the model takes (everything else is ignored)
+MODEL_PARAMETERS = tuple(name for name in inspect.signature(MeanFieldModel.__init__).parameters
+                         if name not in ('self', 'spacing', 'max_step'))
+
+
+def simulation_config(sim) -> dict:
+    """The model's parameters, read from a WealthInequalitySimulation"""
+    return {name: getattr(sim, name) for name in MODEL_PARAMETERS}
+
+
+def predict(n_rounds: int, record_every: Optional[int] = None, points: int = 200,
+            spacing: float = DEFAULT_SPACING, max_step: float = DEFAULT_MAX_STEP, **config) -> MeanFieldResult:
+    """Mean-field trajectory for a simulation config (engine keyword names;
+    options without a mean-field counterpart are ignored)"""
+    model = MeanFieldModel.from_config(config, spacing=spacing, max_step=max_step)
+    return model.run(n_rounds, record_every, points)
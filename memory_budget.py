@@ -0,0 +1,179 @@
+import math
+import re
+import numpy as np
+from typing import Optional, Union
+
+PRECISIONS = {'float64': np.float64, 'float32': np.float32}
+
+# Approximate cost of one recorded point across the four scalar histories
+# (list slot + boxed Python float/int each)
+HISTORY_POINT_BYTES = 4 * 32
+
+# Retention limits are enforced lazily: lists may overshoot by this factor
+# before being trimmed (amortizes the cost of deleting from the front)
+TRIM_SLACK = 1.25
+
+_UNITS = {'': 1, 'B': 1, 'K': 2**10, 'KB': 2**10, 'M': 2**20, 'MB': 2**20,
+          'G': 2**30, 'GB': 2**30, 'T': 2**40, 'TB': 2**40}
+
+
+class KahanSum:
+    """Running total with compensated (Kahan-Babuska) summation
+    
+    Keeps long-run totals such as taxes collected exact to float64 rounding
+    even after billions of small increments.
+    """
+    
+    __slots__ = ('total', 'compensation')
+    
+    def __init__(self, value: float = 0.0):
+        self.total = float(value)
+        self.compensation = 0.0
+    
+    def add(self, value: float):
+        value = float(value)
+        t = self.total + value
+        if abs(self.total) >= abs(value):
+            self.compensation += (self.total - t) + value
+        else:
+            self.compensation += (value - t) + self.total
+        self.total = t
+    
+    @property
+    def value(self) -> float:
+        return self.total + self.compensation
+
+
+def parse_bytes(size: Union[int, float, str]) -> int:
+    """Byte count from a number or a string like '64GB' / '512 MB'"""
+    if isinstance(size, (int, float)):
+        return int(size)
+    match = re.fullmatch(r'\s*([\d.]+)\s*([KMGT]?B?)\s*', size.upper())
+    if not match:
+        raise ValueError(f"Cannot parse memory size '{size}'")
+    return int(float(match.group(1)) * _UNITS[match.group(2)])
+
+
+def format_bytes(size: float) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def index_dtype(n_agents: int):
+    """int32 agent indices whenever they fit"""
+    return np.int32 if n_agents < 2**31 else np.int64
+
+
+def history_point_bytes(metric_series: int = 0) -> int:
+    """Bytes per recorded point, including extra metric histories"""
+    return HISTORY_POINT_BYTES + metric_series * HISTORY_POINT_BYTES // 4
+
+
+def agent_bytes(n_agents: int, precision: str = 'float64') -> int:
+    """Bytes per agent of engine state: wealth, stake fraction, active flag,
+    style code and the two active-list index arrays"""
+    value_size = np.dtype(PRECISIONS[precision]).itemsize
+    return 2 * value_size + 2 + 2 * np.dtype(index_dtype(n_agents)).itemsize
+
+
+def estimate_memory(n_agents: int, precision: str = 'float64', rounds: Optional[int] = None,
+                    stats_interval: int = 1, snapshot_interval: int = 5,
+                    history_limit: Optional[int] = None, snapshot_limit: Optional[int] = None,
+                    checkpoint_interval: Optional[int] = None, max_checkpoints: Optional[int] = None,
+                    n_edges: int = 0, keep_history: bool = True, metric_series: int = 0,
+                    snapshot_bytes: Optional[int] = None) -> dict:
+    """Estimated memory use in bytes, by component
+    
+    With `rounds=None`, capped components are counted at their cap and
+    uncapped ones report their growth in `per_round` instead.
+    Snapshots are counted uncompressed, as if every agent were still active
+    (upper bound), or at `snapshot_bytes` each for summary snapshots.
+    `metric_series` is the number of extra scalar metric histories.
+    """
+    value_size = np.dtype(PRECISIONS[precision]).itemsize
+    index_size = np.dtype(index_dtype(n_agents)).itemsize
+    per_round = 0.0
+    
+    def retained(interval: int, limit: Optional[int], item_bytes: float) -> float:
+        # Bytes held by a history recorded every `interval` rounds, kept up to `limit` items
+        nonlocal per_round
+        if limit is not None:
+            cap = limit * TRIM_SLACK
+            if rounds is None:
+                return cap * item_bytes
+            return min(rounds // interval + 1, cap) * item_bytes
+        if rounds is None:
+            per_round += item_bytes / interval
+            return 0.0
+        return (rounds // interval + 1) * item_bytes
+    
+    estimate = {
+        'state': n_agents * agent_bytes(n_agents, precision),
+        # Sorted copy plus float64 view while computing statistics
+        'working': n_agents * (value_size + 8),
+        'topology': (n_agents + 1) * 8 + 2 * n_edges * index_size if n_edges else 0,
+        'history': 0.0,
+        'snapshots': 0.0,
+        'checkpoints': 0.0,
+    }
+    if keep_history:
+        estimate['history'] = retained(stats_interval, history_limit, history_point_bytes(metric_series))
+        if snapshot_limit != 0:
+            snapshot_every = int(np.lcm(stats_interval, snapshot_interval))
+            estimate['snapshots'] = retained(snapshot_every, snapshot_limit,
+                                             snapshot_bytes or n_agents * value_size)
+    if checkpoint_interval:
+        # Thinning keeps at most max_checkpoints, so they are never truly unbounded
+        estimate['checkpoints'] = retained(checkpoint_interval, max_checkpoints,
+                                           n_agents * (value_size + index_size))
+    
+    estimate = {key: int(value) for key, value in estimate.items()}
+    estimate['total'] = sum(estimate.values())
+    estimate['per_round'] = per_round
+    return estimate
+
+
+def plan_memory(n_agents: int, budget: Union[int, str], precision: str = 'float64',
+                stats_interval: int = 1, checkpoint_interval: Optional[int] = None,
+                n_edges: int = 0, metric_series: int = 0, snapshot_bytes: Optional[int] = None) -> dict:
+    """Pick snapshot cadence and retention limits that keep a run within budget
+    
+    The fixed engine state comes first; what is left is split between the
+    wealth snapshots (60%, or 40% when checkpoints are on), checkpoints (30%)
+    and the scalar histories (the rest). Snapshots are taken once per sweep
+    (every ~n_agents / 2 rounds, when every agent has traded once on average),
+    since the distribution barely changes within a sweep.
+    """
+    budget = parse_bytes(budget)
+    fixed = estimate_memory(n_agents, precision, rounds=0, n_edges=n_edges, keep_history=False)['total']
+    if fixed > budget:
+        raise ValueError(f"Memory budget {format_bytes(budget)} is below the "
+                         f"{format_bytes(fixed)} needed for {n_agents:,} agents ({precision})")
+    
+    value_size = np.dtype(PRECISIONS[precision]).itemsize
+    index_size = np.dtype(index_dtype(n_agents)).itemsize
+    spare = (budget - fixed) / TRIM_SLACK
+    snapshot_share, checkpoint_share = (0.4, 0.3) if checkpoint_interval else (0.6, 0.0)
+    
+    snapshot_interval = max(5, n_agents // 2)
+    snapshot_interval = math.ceil(snapshot_interval / stats_interval) * stats_interval
+    
+    plan = {
+        'snapshot_interval': snapshot_interval,
+        'snapshot_limit': int(spare * snapshot_share // max(1, snapshot_bytes or n_agents * value_size)),
+        'history_limit': max(1, int(spare * (1.0 - snapshot_share - checkpoint_share)
+                                    // history_point_bytes(metric_series))),
+        'max_checkpoints': None,
+    }
+    if checkpoint_interval:
+        plan['max_checkpoints'] = max(1, int(spare * checkpoint_share // (n_agents * (value_size + index_size))))
+    
+    plan['estimate'] = estimate_memory(
+        n_agents, precision, stats_interval=stats_interval, snapshot_interval=snapshot_interval,
+        history_limit=plan['history_limit'], snapshot_limit=plan['snapshot_limit'],
+        checkpoint_interval=checkpoint_interval, max_checkpoints=plan['max_checkpoints'],
+        n_edges=n_edges, metric_series=metric_series, snapshot_bytes=snapshot_bytes)
+    return plan
@@ -0,0 +1,235 @@
+import numpy as np
+from typing import Optional, Union
+
+TOPOLOGY_KINDS = ('ring', 'lattice', 'erdos_renyi', 'barabasi_albert', 'edge_list')
+
+
+class Topology:
+    """Undirected trading network stored as CSR adjacency arrays
+    
+    Neighbors of node i are indices[indptr[i]:indptr[i + 1]]. The graph is
+    never rebuilt during a run - bankrupt nodes are masked out at sampling
+    time with the engine's `active` array.
+    """
+    
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, kind: str = 'custom',
+                 params: Optional[dict] = None):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=_index_dtype(len(self.indptr) - 1))
+        self.kind = kind
+        self.params = params or {}
+    
+    @property
+    def n_nodes(self) -> int:
+        return len(self.indptr) - 1
+    
+    @property
+    def n_edges(self) -> int:
+        """Number of undirected edges"""
+        return len(self.indices) // 2
+    
+    @property
+    def degree(self) -> np.ndarray:
+        return np.diff(self.indptr)
+    
+    def neighbors(self, node: int) -> np.ndarray:
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+    
+    @classmethod
+    def from_edges(cls, n_nodes: int, src: np.ndarray, dst: np.ndarray,
+                   kind: str = 'custom', params: Optional[dict] = None) -> 'Topology':
+        """Build CSR arrays from an undirected edge list (vectorized)
+        
+        Self-loops and duplicate edges are dropped; each edge is stored in
+        both directions.
+        """
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        if len(src) and (min(src.min(), dst.min()) < 0 or max(src.max(), dst.max()) >= n_nodes):
+            raise ValueError("Edge list references nodes outside [0, n_nodes)")
+        
+        keep = src != dst
+        lo = np.minimum(src[keep], dst[keep])
+        hi = np.maximum(src[keep], dst[keep])
+        
+        # Deduplicate undirected edges via a single int64 key
+        keys = np.unique(lo * n_nodes + hi)
+        lo, hi = keys // n_nodes, keys % n_nodes
+        
+        # Both directions, grouped by source node
+        rows = np.concatenate([lo, hi])
+        cols = np.concatenate([hi, lo])
+        order = np.argsort(rows, kind='stable')
+        indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n_nodes), out=indptr[1:])
+        return cls(indptr, cols[order], kind=kind, params=params)
+    
+    def sample_neighbor(self, node: int, active: np.ndarray, rng: np.random.Generator,
+                        max_tries: int = 8) -> int:
+        """Uniformly random active neighbor of node, or -1 if there is none
+        
+        O(1) expected: a few rejection draws against the active mask, with a
+        masked scan of the neighbor slice only as a fallback when most of the
+        neighborhood has gone bankrupt.
+        """
+        indptr = self.indptr
+        start = int(indptr[node])
+        degree = int(indptr[node + 1]) - start
+        if degree == 0:
+            return -1
+        
+        indices = self.indices
+        for _ in range(max_tries):
+            candidate = indices[start + int(rng.random() * degree)]
+            if active[candidate]:
+                return int(candidate)
+        
+        neighbors = indices[start:start + degree]
+        alive = neighbors[active[neighbors]]
+        if len(alive) == 0:
+            return -1
+        return int(alive[int(rng.random() * len(alive))])
+    
+    def has_active_edge(self, active: np.ndarray) -> bool:
+        """True if at least one edge still connects two active nodes (O(E))"""
+        rows = np.repeat(np.arange(self.n_nodes), self.degree)
+        return bool(np.any(active[rows] & active[self.indices]))
+    
+    def to_dict(self) -> dict:
+        """Generator spec when available, otherwise the raw CSR arrays"""
+        if self.kind in TOPOLOGY_KINDS:
+            return {'kind': self.kind, 'params': self.params}
+        return {'kind': self.kind, 'indptr': self.indptr.tolist(), 'indices': self.indices.tolist()}
+    
+    @classmethod
+    def from_dict(cls, data: dict, n_nodes: int) -> 'Topology':
+        if 'indptr' in data:
+            return cls(np.array(data['indptr']), np.array(data['indices']), kind=data['kind'])
+        return build_topology(data['kind'], n_nodes, **data['params'])
+
+
+def _index_dtype(n_nodes: int):
+    """int32 neighbor indices whenever they fit (halves memory at 1M+ nodes)"""
+    return np.int32 if n_nodes < 2**31 else np.int64
+
+
+def ring(n_nodes: int, k: int = 2) -> Topology:
+    """Ring where every node is linked to its k nearest neighbors on each side"""
+    k = max(1, min(k, (n_nodes - 1) // 2))
+    nodes = np.arange(n_nodes, dtype=np.int64)
+    src = np.repeat(nodes, k)
+    dst = (src + np.tile(np.arange(1, k + 1), n_nodes)) % n_nodes
+    return Topology.from_edges(n_nodes, src, dst, kind='ring', params={'k': k})
+
+
+def lattice(n_nodes: int, periodic: bool = True) -> Topology:
+    """2D square lattice (4-neighborhood), wrapped into a torus by default
+    
+    Nodes fill a rows x cols grid row by row; when n_nodes is not a perfect
+    rectangle the last row is partial.
+    """
+    rows = max(1, int(np.sqrt(n_nodes)))
+    cols = int(np.ceil(n_nodes / rows))
+    nodes = np.arange(n_nodes, dtype=np.int64)
+    r, c = nodes // cols, nodes % cols
+    
+    if periodic:
+        right = r * cols + (c + 1) % cols
+        down = ((r + 1) % rows) * cols + c
+    else:
+        right = np.where(c + 1 < cols, nodes + 1, -1)
+        down = np.where(r + 1 < rows, nodes + cols, -1)
+    
+    src = np.concatenate([nodes, nodes])
+    dst = np.concatenate([right, down])
+    keep = (dst >= 0) & (dst < n_nodes)
+    return Topology.from_edges(n_nodes, src[keep], dst[keep], kind='lattice',
+                               params={'periodic': periodic})
+
+
+def erdos_renyi(n_nodes: int, mean_degree: float = 8.0, seed: Optional[int] = None) -> Topology:
+    """G(n, p) random graph with p = mean_degree / (n - 1)
+    
+    Draws the edge count from the binomial, then samples that many node pairs
+    in bulk (a dense n^2 trial is impossible at 1M nodes). Duplicate pairs are
+    topped up so the edge count matches exactly.
+    """
+    rng = np.random.default_rng(seed)
+    n_pairs = n_nodes * (n_nodes - 1) // 2
+    p = min(1.0, mean_degree / max(n_nodes - 1, 1))
+    target = int(rng.binomial(n_pairs, p)) if n_pairs > 0 else 0
+    
+    keys = np.empty(0, dtype=np.int64)
+    while len(keys) < target:
+        need = target - len(keys)
+        u = rng.integers(0, n_nodes, size=int(need * 1.1) + 16)
+        v = rng.integers(0, n_nodes, size=len(u))
+        ok = u != v
+        lo, hi = np.minimum(u[ok], v[ok]), np.maximum(u[ok], v[ok])
+        keys = np.unique(np.concatenate([keys, lo * n_nodes + hi]))
+    keys = rng.permutation(keys)[:target]
+    
+    return Topology.from_edges(n_nodes, keys // n_nodes, keys % n_nodes, kind='erdos_renyi',
+                               params={'mean_degree': mean_degree, 'seed': seed})
+
+
+def barabasi_albert(n_nodes: int, m: int = 3, seed: Optional[int] = None) -> Topology:
+    """Preferential-attachment graph (Batagelj-Brandes edge-copy scheme)
+    
+    Edge e of node v = e // m copies a uniformly random earlier endpoint,
+    which picks targets proportional to degree. The copy chains are resolved
+    with vectorized pointer jumping instead of a per-node Python loop.
+    Repeated targets are merged, so a few nodes end up with fewer than m edges.
+    """
+    rng = np.random.default_rng(seed)
+    m = max(1, m)
+    n_edge_slots = n_nodes * m
+    
+    # Endpoint array M: M[2e] = source node of edge e, M[2e + 1] = M[r_e]
+    # with r_e uniform in [0, 2e]
+    sources = np.arange(n_edge_slots, dtype=np.int64) // m
+    pointer = (rng.random(n_edge_slots) * (2 * np.arange(n_edge_slots) + 1)).astype(np.int64)
+    
+    # Follow odd (target) positions back until they land on a source position
+    resolved = pointer.copy()
+    pending = np.flatnonzero(resolved % 2 == 1)
+    while len(pending):
+        resolved[pending] = pointer[(resolved[pending] - 1) // 2]
+        pending = pending[resolved[pending] % 2 == 1]
+    targets = sources[resolved // 2]
+    
+    return Topology.from_edges(n_nodes, sources, targets, kind='barabasi_albert',
+                               params={'m': m, 'seed': seed})
+
+
+def from_edge_list(path_or_edges: Union[str, np.ndarray], n_nodes: Optional[int] = None) -> Topology:
+    """Load a whitespace-separated "src dst" edge list (file path or (E, 2) array)"""
+    if isinstance(path_or_edges, str):
+        edges = np.loadtxt(path_or_edges, dtype=np.int64, comments='#', ndmin=2)
+        params = {'path': path_or_edges}
+    else:
+        edges = np.asarray(path_or_edges, dtype=np.int64).reshape(-1, 2)
+        params = {}
+    if n_nodes is None:
+        n_nodes = int(edges.max()) + 1 if len(edges) else 0
+    params['n_nodes'] = n_nodes
+    topology = Topology.from_edges(n_nodes, edges[:, 0], edges[:, 1], kind='edge_list', params=params)
+    if not params.get('path'):
+        # In-memory edges cannot be regenerated from a spec
+        topology.kind = 'custom'
+    return topology
+
+
+def build_topology(kind: str, n_nodes: int, **params) -> Topology:
+    """Build a topology by name: ring, lattice, erdos_renyi, barabasi_albert, edge_list"""
+    if kind == 'ring':
+        return ring(n_nodes, **params)
+    if kind == 'lattice':
+        return lattice(n_nodes, **params)
+    if kind == 'erdos_renyi':
+        return erdos_renyi(n_nodes, **params)
+    if kind == 'barabasi_albert':
+        return barabasi_albert(n_nodes, **params)
+    if kind == 'edge_list':
+        return from_edge_list(params['path'], n_nodes=params.get('n_nodes', n_nodes))
+    raise ValueError(f"Unknown topology '{kind}' (expected one of {', '.join(TOPOLOGY_KINDS)})")
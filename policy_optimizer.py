@@ -0,0 +1,206 @@
+"""Minimum-intervention policy search
+
+Finds the cheapest redistribution policy - wealth tax rate and threshold,
+UBI amount, safety net floor - whose final Gini (or top 10% / 1% share)
+meets a target.
+
+Cost is the wealth a policy moves: taxes collected + UBI paid + safety-net
+top-ups, per round, as a fraction of the initial total wealth. A policy
+that is switched off costs nothing. Collected taxes leave the economy, so a
+steep enough tax reaches any Gini by shrinking everyone towards zero;
+candidates must also keep `min_wealth_retained` of the initial total wealth.
+
+The search is successive halving. `n_candidates` random policies (each
+policy on with probability 1/2, values log-uniform within POLICY_BOUNDS,
+plus the no-policy baseline) all run to a short round budget in parallel;
+the best 1/eta continue to eta times that budget, and so on up to
+`n_rounds`. Survivors resume from where they stopped - simulations travel
+between rungs as compact payloads - so a rung only pays for its extra
+rounds. Candidates are ranked feasible first (by cost), then by how far
+they miss the target. This assumes the target metric has mostly settled by
+`min_rounds`; pick it at least a few times the relaxation time.
+"""
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Literal, Optional, Sequence, Tuple
+
+import numpy as np
+
+from state_store import dumps_simulation, loads_simulation
+from wealth_inequality_sim import WealthInequalitySimulation
+
+# Searched parameters and their (low, high) bounds, sampled log-uniformly
+POLICY_BOUNDS: Dict[str, Tuple[float, float]] = {
+    'wealth_tax_rate': (0.001, 0.10),
+    'wealth_tax_threshold': (0.01, 0.50),
+    'ubi_amount': (0.1, 10.0),
+    'safety_net_floor': (1.0, 50.0),
+}
+
+# Policy switch -> the searched parameters it enables
+POLICIES: Dict[str, Tuple[str, ...]] = {
+    'wealth_tax_enabled': ('wealth_tax_rate', 'wealth_tax_threshold'),
+    'ubi_enabled': ('ubi_amount',),
+    'safety_net_enabled': ('safety_net_floor',),
+}
+
+# Target metric -> index in compute_statistics()
+TARGETS = {'gini': 0, 'top_10_percent': 2, 'top_1_percent': 3}
+
+
+@dataclass
+class Candidate:
+    """One policy configuration and its latest evaluation (means over replicas)"""
+    policy: Dict[str, object]
+    metric: float = math.nan
+    metric_std: float = math.nan
+    cost: float = math.nan
+    wealth_retained: float = math.nan  # Total wealth / initial total wealth
+    rounds: int = 0  # Budget of the last rung this candidate reached
+    _states: Optional[List[bytes]] = field(default=None, repr=False)
+    
+    def violation(self, target: float, min_wealth_retained: float) -> float:
+        """How far the candidate misses the target and the wealth floor (0 if feasible)"""
+        return max(0.0, self.metric - target) + max(0.0, min_wealth_retained - self.wealth_retained)
+    
+    def rank_key(self, target: float, min_wealth_retained: float) -> tuple:
+        excess = self.violation(target, min_wealth_retained)
+        return (0, self.cost) if excess <= 0 else (1, excess)
+
+
+@dataclass
+class PolicySearchResult:
+    best: Optional[Candidate]  # Cheapest candidate meeting the target at the full budget
+    candidates: List[Candidate]  # Every candidate, with the rung it reached
+    target: str
+    target_value: float
+    min_wealth_retained: float
+    budgets: List[int]  # Round budget of each rung
+    rounds_simulated: int  # Total rounds run, over all candidates and replicas
+    elapsed: float  # Wall time in seconds
+    
+    @property
+    def finalists(self) -> List[Candidate]:
+        """Candidates evaluated at the full budget, best first"""
+        full = [c for c in self.candidates if c.rounds == self.budgets[-1]]
+        return sorted(full, key=lambda c: c.rank_key(self.target_value, self.min_wealth_retained))
+
+
+def policy_cost(sim: WealthInequalitySimulation) -> float:
+    """Wealth moved by policies per round, as a fraction of the initial total wealth"""
+    moved = sim.total_taxes_collected + sim.total_ubi_distributed + sim.total_safety_net_paid
+    return moved / (sim.n_agents * sim.initial_wealth * max(1, sim.current_round))
+
+
+def rung_budgets(n_rounds: int, min_rounds: int, eta: int) -> List[int]:
+    """Round budgets min_rounds * eta^i (roughly), ending exactly at n_rounds"""
+    n_rungs = 1 + max(0, int(math.floor(math.log(n_rounds / max(1, min_rounds), eta) + 1e-9)))
+    return [max(1, int(round(n_rounds / eta ** (n_rungs - 1 - i)))) for i in range(n_rungs)]
+
+
+def sample_policies(n_candidates: int, rng: np.random.Generator) -> List[Dict[str, object]]:
+    """The no-policy baseline plus random policies (each switch on with probability 1/2)"""
+    policies = [{switch: False for switch in POLICIES}]
+    while len(policies) < n_candidates:
+        policy: Dict[str, object] = {}
+        for switch, params in POLICIES.items():
+            policy[switch] = bool(rng.random() < 0.5)
+            if policy[switch]:
+                for param in params:
+                    low, high = POLICY_BOUNDS[param]
+                    policy[param] = round(float(np.exp(rng.uniform(np.log(low), np.log(high)))), 6)
+        if any(policy[switch] for switch in POLICIES):
+            policies.append(policy)
+    return policies
+
+
+def advance_candidate(states: Optional[List[bytes]], sim_kwargs: dict, seeds: Sequence[int],
+                      rounds: int, record_every: int) -> Tuple[List[bytes], np.ndarray, np.ndarray]:
+    """Run (or resume) one candidate's replicas up to `rounds`
+    
+    Returns the replica payloads and, per replica, the statistics
+    (gini, active count, top 10%, top 1%) and (policy cost, wealth retained).
+    """
+    sims = ([loads_simulation(state) for state in states] if states is not None else
+            [WealthInequalitySimulation(seed=seed, stats_interval=record_every, keep_history=False,
+                                        **sim_kwargs) for seed in seeds])
+    stats = np.empty((len(sims), 4))
+    costs = np.empty((len(sims), 2))
+    for i, sim in enumerate(sims):
+        # Stops early on convergence or when fewer than two agents are left
+        sim.run(rounds - sim.current_round)
+        stats[i] = sim.compute_statistics()
+        costs[i] = policy_cost(sim), sim.wealth.sum(dtype=np.float64) / (sim.n_agents * sim.initial_wealth)
+    return [dumps_simulation(sim, max_history=None) for sim in sims], stats, costs
+
+
+def optimize_policy(target: Literal['gini', 'top_10_percent', 'top_1_percent'] = 'gini',
+                    target_value: float = 0.3, min_wealth_retained: float = 0.5, n_rounds: int = 50000,
+                    min_rounds: Optional[int] = None, n_candidates: int = 27, eta: int = 3,
+                    replicas: int = 3, record_every: int = 100, seed: Optional[int] = None,
+                    processes: Optional[int] = None,
+                    executor: Literal['process', 'thread'] = 'process',
+                    **sim_kwargs) -> PolicySearchResult:
+    """Search for the cheapest policy whose final `target` metric is at most
+    `target_value` while keeping `min_wealth_retained` of the initial wealth
+    
+    Extra keyword arguments configure everything that is not searched
+    (n_agents, rich_bias, style ratios, topology, ...). Every candidate runs
+    the same `replicas` seeds, so candidates differ by policy rather than by
+    luck. `min_rounds` defaults to n_rounds / eta^2 (three rungs).
+    """
+    if target not in TARGETS:
+        raise ValueError(f"Unknown target '{target}' (expected one of {', '.join(TARGETS)})")
+    if executor not in ('process', 'thread'):
+        raise ValueError(f"Unknown executor '{executor}' (expected 'process' or 'thread')")
+    searched = set(POLICY_BOUNDS) | set(POLICIES)
+    if searched & set(sim_kwargs):
+        raise ValueError(f"{sorted(searched & set(sim_kwargs))} are searched, not fixed")
+    
+    start = time.perf_counter()
+    sampler_seed, replica_seed = np.random.SeedSequence(seed).spawn(2)
+    candidates = [Candidate(policy) for policy in sample_policies(n_candidates, np.random.default_rng(sampler_seed))]
+    seeds = [int(child.generate_state(1, dtype=np.uint64)[0]) for child in replica_seed.spawn(replicas)]
+    budgets = rung_budgets(n_rounds, min_rounds or n_rounds // eta ** 2, eta)
+    column = TARGETS[target]
+    rounds_simulated = 0
+    
+    processes = processes or os.cpu_count() or 1
+    pool = None
+    if processes > 1:
+        pool = (ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor)(max_workers=processes)
+    try:
+        alive = list(candidates)
+        for rung, budget in enumerate(budgets):
+            jobs = [(c._states, {**sim_kwargs, **c.policy}, seeds, budget, record_every) for c in alive]
+            outputs = (pool.map(advance_candidate, *zip(*jobs)) if pool is not None else
+                       (advance_candidate(*job) for job in jobs))
+            for candidate, (states, stats, costs) in zip(alive, outputs):
+                rounds_simulated += (budget - candidate.rounds) * replicas
+                candidate._states = states
+                candidate.rounds = budget
+                candidate.metric = float(stats[:, column].mean())
+                candidate.metric_std = float(stats[:, column].std())
+                candidate.cost, candidate.wealth_retained = costs.mean(axis=0).tolist()
+            
+            alive.sort(key=lambda c: c.rank_key(target_value, min_wealth_retained))
+            if rung < len(budgets) - 1:
+                # Only the survivors' payloads are needed from here on
+                for candidate in alive[max(1, math.ceil(len(alive) / eta)):]:
+                    candidate._states = None
+                alive = alive[:max(1, math.ceil(len(alive) / eta))]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    
+    for candidate in candidates:
+        candidate._states = None
+    feasible = [c for c in alive if c.violation(target_value, min_wealth_retained) <= 0]
+    return PolicySearchResult(best=feasible[0] if feasible else None, candidates=candidates,
+                              target=target, target_value=target_value,
+                              min_wealth_retained=min_wealth_retained, budgets=budgets,
+                              rounds_simulated=rounds_simulated,
+                              elapsed=time.perf_counter() - start)
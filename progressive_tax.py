@@ -0,0 +1,117 @@
+import numpy as np
+from typing import Optional
+
+
+class RunningQuantile:
+    """Maintained estimate of one quantile (default: the median) of active wealth
+    
+    Avoids a full sort every time the progressive tax needs w_median:
+      - every trade feeds the two post-trade wealths into a stochastic-
+        approximation update (traders are a random sample of the population);
+        a step moves the estimate by learning_rate * |estimate| / N, as one
+        of N values crossing the quantile moves it by about one gap,
+      - policy stages that move everyone the same way update the estimate
+        exactly (UBI shifts it, the progressive tax scales it, the safety net
+        floors it),
+      - every `refresh_interval` rounds it is re-anchored from a random
+        subsample of `sample_size` wealths with np.partition - O(sample_size),
+        independent of the population size (exact when N <= sample_size).
+    """
+    
+    def __init__(self, q: float = 0.5, sample_size: int = 2048, refresh_interval: int = 50,
+                 learning_rate: float = 1.0):
+        self.q = q
+        self.sample_size = sample_size
+        self.refresh_interval = refresh_interval
+        self.learning_rate = learning_rate
+        self.estimate: Optional[float] = None
+        self.last_refresh: Optional[int] = None
+    
+    def needs_refresh(self, current_round: int) -> bool:
+        return (self.estimate is None or self.last_refresh is None
+                or current_round - self.last_refresh >= self.refresh_interval)
+    
+    def sample_positions(self, n: int, rng: np.random.Generator) -> Optional[np.ndarray]:
+        """Positions to re-anchor from (None = use all n values)"""
+        if n <= self.sample_size:
+            return None
+        return rng.integers(0, n, size=self.sample_size)
+    
+    def refresh(self, values: np.ndarray, current_round: int):
+        """Re-anchor the estimate from a (sub)sample of the current values"""
+        if len(values) == 0:
+            self.estimate = None
+            return
+        k = int(self.q * (len(values) - 1))
+        self.estimate = float(np.partition(values, k)[k])
+        self.last_refresh = current_round
+    
+    def observe(self, value: float, n: int):
+        """Stochastic-approximation step towards the q-quantile of n values"""
+        if self.estimate is None:
+            return
+        step = self.learning_rate * max(abs(self.estimate), 1e-12) / n
+        if value < self.estimate:
+            self.estimate -= step * (1.0 - self.q)
+        else:
+            self.estimate += step * self.q
+    
+    def shift(self, delta: float):
+        """Every value moved by the same amount (e.g. UBI)"""
+        if self.estimate is not None:
+            self.estimate += delta
+    
+    def scale(self, factor: float):
+        """Every value scaled by a rank-preserving factor at the quantile"""
+        if self.estimate is not None:
+            self.estimate *= factor
+    
+    def floor(self, minimum: float):
+        """Values below `minimum` were raised to it (e.g. safety net)"""
+        if self.estimate is not None and self.estimate < minimum:
+            self.estimate = minimum
+    
+    def to_dict(self) -> dict:
+        return {'q': self.q, 'sample_size': self.sample_size,
+                'refresh_interval': self.refresh_interval,
+                'learning_rate': self.learning_rate,
+                'estimate': self.estimate, 'last_refresh': self.last_refresh}
+    
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> 'RunningQuantile':
+        if not data:
+            return cls()
+        tracker = cls(data['q'], data['sample_size'], data['refresh_interval'], data['learning_rate'])
+        tracker.estimate = data['estimate']
+        tracker.last_refresh = data['last_refresh']
+        return tracker
+
+
+def progressive_tax_rates(wealths: np.ndarray, median: float, base_rate: float,
+                          exponent: float, max_rate: float = 0.5) -> np.ndarray:
+    """Per-agent rates r(w) = r0 * (w / w_median)^gamma, capped at max_rate"""
+    if median <= 0:
+        return np.full(len(wealths), min(base_rate, max_rate))
+    rates = np.maximum(wealths, 0.0)
+    if exponent == 1.0:
+        rates *= base_rate / median
+    else:
+        rates /= median
+        # Common exponents avoid the much slower general power
+        if exponent == 2.0:
+            np.multiply(rates, rates, out=rates)
+        elif exponent == 0.5:
+            np.sqrt(rates, out=rates)
+        else:
+            np.power(rates, exponent, out=rates)
+        rates *= base_rate
+    np.minimum(rates, max_rate, out=rates)
+    return rates
+
+
+def progressive_tax_amounts(wealths: np.ndarray, median: float, base_rate: float,
+                            exponent: float, max_rate: float = 0.5) -> np.ndarray:
+    """Tax owed by each agent, r(w) * w, computed in place on one temporary"""
+    amounts = progressive_tax_rates(wealths, median, base_rate, exponent, max_rate)
+    amounts *= wealths
+    return amounts
@@ -0,0 +1,411 @@
+"""Sharded yard-sale engine: one population split across worker processes
+
+Agents are partitioned into S contiguous shards. Each shard is a regular
+WealthInequalitySimulation owned by a worker that runs the exchanges inside
+its shard; every epoch the coordinator runs a cross-shard exchange phase on
+agents drawn from all shards, and merges per-shard summaries into global
+statistics. With sketch_accuracy set, shards instead maintain a WealthSketch
+through every trade and the coordinator merges those, so statistics need
+no per-shard sort at all.
+
+Workers speak a small message protocol over `multiprocessing.connection`
+objects: local workers get a Pipe, remote ones are reached with
+Listener/Client on a TCP or Unix socket (see `serve_shard`), so the same
+coordinator can span several hosts.
+
+With the default mixing, each epoch splits its exchanges into within-shard
+and cross-shard pairs in the same proportion as uniform pairing over the
+whole population, so for short epochs the dynamics match the single-process
+model.
+
+Redistribution follows the global round count. After each epoch's exchanges
+the coordinator has every shard apply the wealth tax (on its interval), UBI
+and the safety net for the epoch's rounds. The safety net also runs after
+every local trade, as in the single-process engine. The flat tax's top
+fraction and the progressive tax's median are each shard's own, which for a
+random partition approximates the global ones.
+"""
+import multiprocessing
+from multiprocessing.connection import Client, Connection, Listener
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from wealth_inequality_sim import WealthInequalitySimulation
+from wealth_sketch import WealthSketch, merge_sketches
+
+# Local sims never record statistics on their own - the coordinator asks
+NO_STATS = 2**62
+# Policies the shards only apply when the coordinator says so (command
+# 'policies'), on the global round count instead of their own rounds
+GLOBAL_POLICIES = ('wealth_tax_enabled', 'ubi_enabled')
+
+
+def shard_summary(wealths: np.ndarray, n_buckets: int) -> dict:
+    """Count, total and equal-count buckets (count, sum) of the sorted wealths
+    
+    Exact when the shard has at most n_buckets active agents.
+    """
+    wealths = np.sort(wealths)
+    n = len(wealths)
+    if n == 0:
+        return {'count': 0, 'total': 0.0, 'bucket_counts': np.zeros(0, dtype=np.int64),
+                'bucket_sums': np.zeros(0)}
+    edges = np.linspace(0, n, min(n, n_buckets) + 1).astype(np.int64)
+    cumulative = np.concatenate([[0.0], np.cumsum(wealths, dtype=np.float64)])
+    return {'count': n, 'total': float(cumulative[-1]),
+            'bucket_counts': np.diff(edges), 'bucket_sums': np.diff(cumulative[edges])}
+
+
+def merge_summaries(summaries: Sequence[dict]) -> Tuple[float, int, float, float]:
+    """Global (gini, active count, top 10% share, top 1% share) from shard summaries
+    
+    Buckets from all shards are ordered by their mean and treated as
+    equal-valued groups, i.e. a piecewise-linear Lorenz curve. The error is
+    bounded by the within-bucket spread (O(1 / buckets per shard)).
+    """
+    count = sum(s['count'] for s in summaries)
+    total = sum(s['total'] for s in summaries)
+    if count == 0 or total <= 0:
+        return 0.0, count, 0.0, 0.0
+    
+    counts = np.concatenate([s['bucket_counts'] for s in summaries]).astype(np.float64)
+    sums = np.concatenate([s['bucket_sums'] for s in summaries])
+    order = np.argsort(sums / np.maximum(counts, 1))
+    counts, sums = counts[order], sums[order]
+    
+    # Gini = 1 - sum_b p_b (L_{b-1} + L_b) on the Lorenz polygon
+    lorenz = np.cumsum(sums) / total
+    lorenz_prev = np.concatenate([[0.0], lorenz[:-1]])
+    gini = float(1.0 - np.sum(counts / count * (lorenz_prev + lorenz)))
+    
+    def top_share(fraction: float) -> float:
+        # Wealth of the richest max(1, fraction * count) agents, splitting the last bucket
+        needed = max(1, int(count * fraction))
+        top_counts, top_sums = counts[::-1], sums[::-1]
+        before = np.concatenate([[0.0], np.cumsum(top_counts)[:-1]])
+        take = np.clip(needed - before, 0, top_counts)
+        return float(np.sum(top_sums * take / np.maximum(top_counts, 1)) / total) * 100
+    
+    return gini, count, top_share(0.10), top_share(0.01)
+
+
+def _handle(sim: Optional[WealthInequalitySimulation], message: tuple):
+    """Execute one coordinator command on this shard; returns (sim, reply)"""
+    command = message[0]
+    if command == 'init':
+        _, n_agents, seed, sim_kwargs = message
+        sim = WealthInequalitySimulation(n_agents=n_agents, seed=seed, stop_on_convergence=False,
+                                         keep_history=False, stats_interval=NO_STATS, **sim_kwargs)
+        sim.reset()
+        return sim, sim.active_count
+    
+    if command == 'run':
+        sim.run(message[1])
+        return sim, sim.active_count
+    
+    if command == 'offer':
+        # k distinct active agents for the cross-shard phase
+        ids = sim.active_ids
+        chosen = ids[sim.rng.choice(len(ids), size=message[1], replace=False)]
+        return sim, (chosen, sim.wealth[chosen].astype(np.float64), sim._stake_fraction[chosen])
+    
+    if command == 'apply':
+        _, ids, wealths = message
+        sim._assign_wealth(ids, wealths)
+        for agent_id in ids[wealths < sim.min_wealth]:
+            sim._check_bankruptcy(int(agent_id))
+        return sim, sim.active_count
+    
+    if command == 'policies':
+        # Tax and UBI of global rounds first_round.. for this shard's agents
+        _, first_round, rounds, enabled = message
+        for name, value in zip(GLOBAL_POLICIES, enabled):
+            setattr(sim, name, value)
+        try:
+            sim._apply_policies(first_round, rounds)
+        finally:
+            for name in GLOBAL_POLICIES:
+                setattr(sim, name, False)
+        return sim, sim.active_count
+    
+    if command == 'summary':
+        return sim, shard_summary(sim.wealth[sim.active_ids], message[1])
+    
+    if command == 'sketch':
+        # Maintained by the shard in sketch mode, otherwise built in O(N) (no sort)
+        if sim.sketch is not None:
+            return sim, sim.sketch
+        return sim, WealthSketch.from_values(sim.wealth[sim.active_ids], message[1])
+    
+    if command == 'wealth':
+        return sim, (sim.wealth.copy(), sim.active.copy())
+    
+    raise ValueError(f"Unknown shard command '{command}'")
+
+
+def shard_loop(conn: Connection):
+    """Serve coordinator commands on one connection until 'close'"""
+    sim = None
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message[0] == 'close':
+            break
+        try:
+            sim, reply = _handle(sim, message)
+            conn.send(('ok', reply))
+        except Exception as exc:
+            conn.send(('error', repr(exc)))
+    conn.close()
+
+
+def serve_shard(address, authkey: bytes):
+    """Run a shard worker on this host, e.g. serve_shard(('0.0.0.0', 6000), b'secret')
+    
+    Serves one coordinator at a time; authkey is required because messages
+    are pickled.
+    """
+    with Listener(address, authkey=authkey) as listener:
+        while True:
+            with listener.accept() as conn:
+                shard_loop(conn)
+
+
+class ShardedSimulation:
+    """Coordinator for a population split into n_shards worker processes
+    
+    Usage:
+        with ShardedSimulation(n_agents=10_000_000, n_shards=8, seed=1) as sim:
+            sim.run(100_000_000)
+            print(sim.gini_history[-1])
+    
+    Extra keyword arguments configure the per-shard WealthInequalitySimulation
+    (styles, rich_bias, min_wealth, policies). Policies are applied on the
+    global round count, once per epoch (see the module docstring).
+    
+    sketch_accuracy switches statistics from bucket summaries to merged
+    per-shard WealthSketches with that relative accuracy (see wealth_sketch
+    for the error bounds); `last_sketch` keeps the latest merged sketch.
+    """
+    
+    def __init__(self, n_agents: int = 100_000, n_shards: int = 4,
+                 epoch_rounds: Optional[int] = None, mixing: Optional[float] = None,
+                 seed: Optional[int] = None, stats_every: int = 1, summary_buckets: int = 1024,
+                 sketch_accuracy: Optional[float] = None,
+                 addresses: Optional[List] = None, authkey: Optional[bytes] = None, **sim_kwargs):
+        if addresses is not None:
+            n_shards = len(addresses)
+            if authkey is None:
+                raise ValueError("Remote shards need an authkey")
+        if not 1 <= n_shards <= n_agents:
+            raise ValueError(f"n_shards must be between 1 and n_agents ({n_agents})")
+        
+        self.n_agents = n_agents
+        self.n_shards = n_shards
+        # Default: a tenth of a sweep (N / 2 rounds) between mixing phases
+        self.epoch_rounds = epoch_rounds or max(100, n_agents // 20)
+        self.mixing = mixing
+        self.stats_every = max(1, stats_every)
+        self.summary_buckets = summary_buckets
+        self.sketch_accuracy = sketch_accuracy
+        self.last_sketch: Optional[WealthSketch] = None
+        if sketch_accuracy is not None:
+            sim_kwargs = dict(sim_kwargs, stats_mode='sketch', sketch_accuracy=sketch_accuracy)
+        self.rich_bias = sim_kwargs.get('rich_bias', 0.05)
+        # The shards are built with these off and apply them per epoch
+        self.policies = tuple(bool(sim_kwargs.get(name, False)) for name in GLOBAL_POLICIES)
+        self.safety_net_enabled = bool(sim_kwargs.get('safety_net_enabled', False))
+        self.sim_kwargs = dict(sim_kwargs, **{name: False for name in GLOBAL_POLICIES})
+        
+        # Contiguous partition: shard i owns global ids offsets[i]:offsets[i + 1]
+        sizes = np.full(n_shards, n_agents // n_shards)
+        sizes[:n_agents % n_shards] += 1
+        self.offsets = np.concatenate([[0], np.cumsum(sizes)])
+        self.active_counts = sizes.copy()
+        
+        seeds = np.random.SeedSequence(seed).spawn(n_shards + 1)
+        self.rng = np.random.default_rng(seeds[0])
+        self._shard_seeds = [int(s.generate_state(1, dtype=np.uint64)[0]) for s in seeds[1:]]
+        
+        self._addresses = addresses
+        self._authkey = authkey
+        self._conns: List[Connection] = []
+        self._processes: List[multiprocessing.Process] = []
+        
+        self.current_round = 0
+        self.cross_exchanges = 0
+        self.history_rounds: List[int] = []
+        self.gini_history: List[float] = []
+        self.active_count_history: List[int] = []
+        self.top_10_percent_history: List[float] = []
+        self.top_1_percent_history: List[float] = []
+    
+    # --- Worker management -------------------------------------------------
+    
+    def start(self) -> 'ShardedSimulation':
+        """Launch (or connect to) the shard workers and initialize the shards"""
+        if self._conns:
+            return self
+        if self._addresses is not None:
+            self._conns = [Client(address, authkey=self._authkey) for address in self._addresses]
+        else:
+            for _ in range(self.n_shards):
+                parent_conn, child_conn = multiprocessing.Pipe()
+                process = multiprocessing.Process(target=shard_loop, args=(child_conn,), daemon=True)
+                process.start()
+                child_conn.close()
+                self._conns.append(parent_conn)
+                self._processes.append(process)
+        
+        sizes = np.diff(self.offsets)
+        self.active_counts = np.array(self._broadcast(
+            [('init', int(size), seed, self.sim_kwargs) for size, seed in zip(sizes, self._shard_seeds)]))
+        self._record_statistics()
+        return self
+    
+    def close(self):
+        for conn in self._conns:
+            try:
+                conn.send(('close',))
+                conn.close()
+            except (OSError, EOFError):
+                pass
+        for process in self._processes:
+            process.join(timeout=5)
+        self._conns, self._processes = [], []
+    
+    def __enter__(self) -> 'ShardedSimulation':
+        return self.start()
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def _broadcast(self, messages: Sequence[tuple]) -> list:
+        """Send one message per shard, then collect the replies (shards work concurrently)"""
+        for conn, message in zip(self._conns, messages):
+            if message is not None:
+                conn.send(message)
+        replies = []
+        for shard, (conn, message) in enumerate(zip(self._conns, messages)):
+            if message is None:
+                replies.append(None)
+                continue
+            status, reply = conn.recv()
+            if status != 'ok':
+                raise RuntimeError(f"Shard {shard} failed on '{message[0]}': {reply}")
+            replies.append(reply)
+        return replies
+    
+    # --- Dynamics ----------------------------------------------------------
+    
+    def _split_epoch(self, rounds: int) -> Tuple[np.ndarray, int]:
+        """Local rounds per shard and cross-shard pairs for `rounds` global rounds"""
+        active = self.active_counts.astype(np.float64)
+        total = active.sum()
+        if total < 2:
+            return np.zeros(self.n_shards, dtype=np.int64), 0
+        # Probability that a uniform pair falls inside shard i
+        within = active * (active - 1) / (total * (total - 1))
+        if self.mixing is None:
+            cross_fraction = 1.0 - within.sum()
+            local_share = within
+        else:
+            cross_fraction = self.mixing
+            local_share = within / max(within.sum(), 1e-300) * (1.0 - cross_fraction)
+        local_rounds = self.rng.multinomial(rounds, np.append(local_share, cross_fraction)
+                                            / (local_share.sum() + cross_fraction))
+        n_cross = min(int(local_rounds[-1]), int(total) // 2)
+        return local_rounds[:-1], n_cross
+    
+    def _mix(self, n_pairs: int):
+        """Cross-shard exchange phase: n_pairs uniform random pairs over all active agents"""
+        # The local rounds just before may have bankrupted agents
+        n_pairs = min(n_pairs, int(self.active_counts.sum()) // 2)
+        if n_pairs <= 0:
+            return
+        # How many of the 2 * n_pairs distinct agents come from each shard
+        draws = self.rng.multivariate_hypergeometric(self.active_counts, 2 * n_pairs)
+        offers = self._broadcast([('offer', int(k)) if k else None for k in draws])
+        
+        shard_of = np.repeat(np.arange(self.n_shards), draws)
+        ids = np.concatenate([o[0] for o in offers if o is not None])
+        wealth = np.concatenate([o[1] for o in offers if o is not None])
+        stake_fraction = np.concatenate([o[2] for o in offers if o is not None])
+        
+        # Random pairing, then the yard-sale rule on all pairs at once
+        order = self.rng.permutation(len(ids))
+        a, b = order[0::2], order[1::2]
+        stake = np.minimum(stake_fraction[a] * wealth[a], stake_fraction[b] * wealth[b])
+        a_richer = wealth[a] > wealth[b]
+        rich_wins = self.rng.random(n_pairs) < 0.5 + self.rich_bias
+        a_wins = np.where(a_richer, rich_wins, ~rich_wins)
+        delta = np.where(a_wins, stake, -stake)
+        wealth[a] += delta
+        wealth[b] -= delta
+        
+        messages = []
+        for shard in range(self.n_shards):
+            mask = shard_of == shard
+            messages.append(('apply', ids[mask], wealth[mask]) if draws[shard] else None)
+        replies = self._broadcast(messages)
+        for shard, reply in enumerate(replies):
+            if reply is not None:
+                self.active_counts[shard] = reply
+        self.cross_exchanges += n_pairs
+    
+    def run_epoch(self, rounds: Optional[int] = None) -> int:
+        """Local exchanges in every shard, then one cross-shard phase"""
+        if not self._conns:
+            self.start()
+        rounds = rounds or self.epoch_rounds
+        local_rounds, n_cross = self._split_epoch(rounds)
+        if local_rounds.sum() + n_cross == 0:
+            return 0
+        
+        self.active_counts = np.array(self._broadcast([('run', int(r)) for r in local_rounds]))
+        self._mix(n_cross)
+        if any(self.policies) or self.safety_net_enabled:
+            self.active_counts = np.array(self._broadcast(
+                [('policies', self.current_round, rounds, self.policies)] * self.n_shards))
+        self.current_round += rounds
+        return rounds
+    
+    def run(self, max_rounds: int) -> int:
+        """Advance about max_rounds global rounds (whole epochs); returns rounds run"""
+        start_round = self.current_round
+        epochs = 0
+        while self.current_round - start_round < max_rounds:
+            rounds = min(self.epoch_rounds, max_rounds - (self.current_round - start_round))
+            if self.run_epoch(rounds) == 0:
+                break
+            epochs += 1
+            if epochs % self.stats_every == 0:
+                self._record_statistics()
+        return self.current_round - start_round
+    
+    # --- Statistics --------------------------------------------------------
+    
+    def statistics(self) -> Tuple[float, int, float, float]:
+        """Global (gini, active count, top 10% share, top 1% share) merged from shard summaries"""
+        if self.sketch_accuracy is not None:
+            sketches = self._broadcast([('sketch', self.sketch_accuracy)] * self.n_shards)
+            self.last_sketch = merge_sketches(sketches)
+            return self.last_sketch.statistics()
+        summaries = self._broadcast([('summary', self.summary_buckets)] * self.n_shards)
+        return merge_summaries(summaries)
+    
+    def _record_statistics(self):
+        gini, active_count, top_10, top_1 = self.statistics()
+        self.history_rounds.append(self.current_round)
+        self.gini_history.append(gini)
+        self.active_count_history.append(active_count)
+        self.top_10_percent_history.append(top_10)
+        self.top_1_percent_history.append(top_1)
+    
+    def gather_wealth(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Full (wealth, active) arrays in global id order - O(N) transfer, for inspection"""
+        parts = self._broadcast([('wealth',)] * self.n_shards)
+        return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
@@ -0,0 +1,161 @@
+"""Compressed wealth-distribution snapshots (the engine's wealth_history)
+
+A `SnapshotStore` behaves like the list of wealth arrays it replaces
+(append, len, indexing, slicing, del of slices) but keeps every snapshot
+as a zlib-compressed blob, decompressed lazily on access. Three modes:
+
+- full: the exact active wealths. Bytes are shuffled (all first bytes,
+  then all second bytes, ...) before compressing so the slowly varying
+  sign/exponent bytes form long runs.
+- histogram: agent counts in fixed bins (`edges`), uint32 - a few
+  hundred bytes to a few KB per snapshot, whatever the population.
+- quantiles: the wealth at `quantiles` evenly spaced levels from 0 to 1
+  (`levels`), float64 - about 8 KB per snapshot for 1000 quantiles.
+
+Each snapshot also records its round, active count and total wealth.
+"""
+import zlib
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+
+SNAPSHOT_MODES = ('full', 'histogram', 'quantiles')
+
+
+def histogram_edges(min_value: float, max_value: float, bins: int = 256) -> np.ndarray:
+    """Fixed bins for histogram mode: [0, min_value), log-spaced up to max_value, then an overflow bin"""
+    bins = max(3, int(bins))
+    inner = np.geomspace(min_value, max(max_value, min_value * 2), bins - 1)
+    return np.concatenate([[0.0], inner, [np.inf]])
+
+
+def _pack(values: np.ndarray) -> bytes:
+    values = np.ascontiguousarray(values)
+    shuffled = values.view(np.uint8).reshape(-1, values.itemsize).T
+    return zlib.compress(shuffled.tobytes(), 1)
+
+
+def _unpack(blob: bytes, dtype: np.dtype, length: int) -> np.ndarray:
+    shuffled = np.frombuffer(zlib.decompress(blob), dtype=np.uint8).reshape(dtype.itemsize, length)
+    return np.ascontiguousarray(shuffled.T).view(dtype).reshape(length)
+
+
+class SnapshotStore:
+    """List-like store of compressed wealth snapshots
+    
+    `store[i]` is the exact wealth array (full), the bin counts for `edges`
+    (histogram) or the wealth at each of `levels` (quantiles); returned
+    arrays are read-only.
+    """
+    
+    def __init__(self, mode: str = 'full', edges: Optional[Sequence[float]] = None,
+                 quantiles: int = 1000):
+        if mode not in SNAPSHOT_MODES:
+            raise ValueError(f"Unknown snapshot mode '{mode}' (expected one of {', '.join(SNAPSHOT_MODES)})")
+        if mode == 'histogram' and edges is None:
+            raise ValueError("Histogram snapshots need bin edges (see histogram_edges)")
+        self.mode = mode
+        self.edges = np.asarray(edges, dtype=np.float64) if mode == 'histogram' else None
+        self.levels = np.linspace(0.0, 1.0, max(2, int(quantiles))) if mode == 'quantiles' else None
+        self.rounds: List[int] = []
+        self.counts: List[int] = []
+        self.totals: List[float] = []
+        self._blobs: List[bytes] = []
+        self._dtypes: List[np.dtype] = []
+        self._lengths: List[int] = []
+        self._cached: Optional[tuple] = None  # (blob, array) of the last access
+    
+    def append(self, wealths: np.ndarray, round_number: int = -1):
+        """Summarize (per mode), compress and store one snapshot of the active wealths"""
+        wealths = np.asarray(wealths)
+        data = self.summarize(wealths)
+        self._blobs.append(_pack(data))
+        self._dtypes.append(data.dtype)
+        self._lengths.append(len(data))
+        self.rounds.append(int(round_number))
+        self.counts.append(len(wealths))
+        self.totals.append(float(wealths.sum(dtype=np.float64)))
+    
+    def summarize(self, wealths: np.ndarray) -> np.ndarray:
+        """What this mode keeps of one snapshot (uncompressed)"""
+        wealths = np.asarray(wealths)
+        if self.mode == 'full':
+            return wealths
+        if self.mode == 'histogram':
+            bins = np.searchsorted(self.edges, wealths, side='right') - 1
+            return np.bincount(bins, minlength=len(self.edges) - 1).astype(np.uint32)
+        return self._quantiles(wealths)
+    
+    def _quantiles(self, wealths: np.ndarray) -> np.ndarray:
+        # Linear interpolation like np.quantile, but one sort beats its
+        # partition around 1000 pivots by ~10x
+        if len(wealths) == 0:
+            return np.zeros(len(self.levels))
+        ascending = np.sort(wealths).astype(np.float64)
+        position = self.levels * (len(ascending) - 1)
+        below = np.floor(position).astype(np.int64)
+        above = np.minimum(below + 1, len(ascending) - 1)
+        return ascending[below] + (ascending[above] - ascending[below]) * (position - below)
+    
+    def _decode(self, index: int) -> np.ndarray:
+        blob = self._blobs[index]
+        if self._cached is not None and self._cached[0] is blob:
+            return self._cached[1]
+        values = _unpack(blob, self._dtypes[index], self._lengths[index])
+        values.flags.writeable = False
+        self._cached = (blob, values)
+        return values
+    
+    def __len__(self) -> int:
+        return len(self._blobs)
+    
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return [self._decode(i) for i in range(len(self))[index]]
+        return self._decode(range(len(self))[index])
+    
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._decode(i)
+    
+    def __delitem__(self, index: Union[int, slice]):
+        for series in (self._blobs, self._dtypes, self._lengths, self.rounds, self.counts, self.totals):
+            del series[index]
+    
+    def clear(self):
+        del self[:]
+        self._cached = None
+    
+    @property
+    def nbytes(self) -> int:
+        """Compressed bytes held"""
+        return sum(len(blob) for blob in self._blobs)
+    
+    def item_bytes(self, n_agents: int, value_size: int = 8) -> int:
+        """Upper bound on one snapshot's size (before compression)"""
+        if self.mode == 'full':
+            return n_agents * value_size
+        if self.mode == 'histogram':
+            return (len(self.edges) - 1) * 4
+        return len(self.levels) * 8
+    
+    def to_dict(self, max_items: Optional[int] = None) -> dict:
+        """Compressed blobs and metadata (for binary state stores)"""
+        keep = slice(-max_items, None) if max_items else slice(None)
+        return {'mode': self.mode,
+                'edges': self.edges.tolist() if self.edges is not None else None,
+                'quantiles': len(self.levels) if self.levels is not None else 0,
+                'blobs': self._blobs[keep], 'dtypes': [d.str for d in self._dtypes[keep]],
+                'lengths': self._lengths[keep], 'rounds': self.rounds[keep],
+                'counts': self.counts[keep], 'totals': self.totals[keep]}
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> 'SnapshotStore':
+        store = cls(data['mode'], data.get('edges'), data.get('quantiles') or 1000)
+        store._blobs = list(data['blobs'])
+        store._dtypes = [np.dtype(d) for d in data['dtypes']]
+        store._lengths = list(data['lengths'])
+        store.rounds = list(data['rounds'])
+        store.counts = list(data['counts'])
+        store.totals = list(data['totals'])
+        return store
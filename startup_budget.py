@@ -0,0 +1,138 @@
+"""Import-time and worker-startup budget
+
+The engine and the batch modules (ensembles, sweeps, policy search, paired
+comparisons, export, the trade log, the mean-field model, the emulator)
+must import with NumPy as their only third-party dependency, and quickly:
+every spawned pool worker pays that import before its first task. Only the
+Dash app loads dash / plotly / flask.
+
+`measure_imports` times each module's import in a fresh interpreter (the
+interpreter's own start-up excluded) and lists the third-party packages
+it pulled in; `measure_worker_startup` times a spawned worker from pool
+creation to its first finished round. `check_budget` compares both with
+IMPORT_BUDGET_MS / WORKER_BUDGET_MS:
+
+    python startup_budget.py
+"""
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Sequence
+
+# Milliseconds per module import, including what it imports (NumPy alone
+# is ~80 ms); measured values are in the README
+IMPORT_BUDGET_MS: Dict[str, float] = {
+    'numpy': 150.0,
+    'wealth_inequality_sim': 200.0,
+    'ensemble': 250.0,
+    'sweep': 250.0,
+    'policy_optimizer': 250.0,
+    'paired': 250.0,
+    'export': 250.0,
+    'trade_log': 200.0,
+    'mean_field': 200.0,
+    'emulator': 250.0,
+    'app_wealth_inequality': 1500.0,
+}
+WORKER_BUDGET_MS = 500.0  # Spawned pool: creation to first finished task
+
+# Third-party packages the non-UI modules may load; the UI modules may load
+# whatever dash needs, except the packages in UI_FORBIDDEN
+ALLOWED_PACKAGES = {'numpy'}
+UI_MODULES = {'app_wealth_inequality'}
+UI_FORBIDDEN = {'pandas'}
+
+_PROBE = '''
+import json, sys, time
+before = set(sys.modules)
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, sorted(set(sys.modules) - before)]))
+'''
+
+
+def _project_modules() -> set:
+    here = os.path.dirname(os.path.abspath(__file__))
+    return {name[:-3] for name in os.listdir(here) if name.endswith('.py')}
+
+
+def third_party(modules: Sequence[str]) -> List[str]:
+    """Top-level packages among `modules` that are neither stdlib nor this project"""
+    local = _project_modules()
+    tops = {name.split('.')[0] for name in modules}
+    return sorted(top for top in tops if top not in sys.stdlib_module_names
+                  and top not in local and not top.startswith('_')
+                  and top != 'cython_runtime')  # Created by NumPy's compiled extensions
+
+
+def measure_imports(modules: Sequence[str] = tuple(IMPORT_BUDGET_MS),
+                    repeats: int = 5) -> Dict[str, dict]:
+    """Best-of-`repeats` import time (ms) of each module in a fresh interpreter,
+    plus the third-party packages it loaded"""
+    results = {}
+    for module in modules:
+        best, loaded = float('inf'), []
+        for _ in range(repeats):
+            out = subprocess.run([sys.executable, '-c', _PROBE.format(module=module)],
+                                 capture_output=True, text=True, check=True)
+            elapsed, loaded = json.loads(out.stdout.strip().splitlines()[-1])
+            best = min(best, elapsed)
+        results[module] = {'ms': best * 1000, 'packages': third_party(loaded)}
+    return results
+
+
+def _first_task(n_rounds: int) -> int:
+    from wealth_inequality_sim import WealthInequalitySimulation
+    sim = WealthInequalitySimulation(n_agents=100, seed=0, keep_history=False)
+    return sim.run(n_rounds)
+
+
+def measure_worker_startup(repeats: int = 3, n_rounds: int = 1) -> float:
+    """Best-of-`repeats` ms from creating a one-worker spawn pool to its first
+    result (a fresh process importing the engine and running n_rounds)"""
+    context = multiprocessing.get_context('spawn')
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        with ProcessPoolExecutor(1, mp_context=context) as pool:
+            pool.submit(_first_task, n_rounds).result()
+            best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def violations(imports: Dict[str, dict], worker_ms: float) -> List[str]:
+    """Budget violations of measured imports and worker startup"""
+    problems = []
+    for module, result in imports.items():
+        if result['ms'] > IMPORT_BUDGET_MS.get(module, float('inf')):
+            problems.append(f"import {module}: {result['ms']:.0f} ms > {IMPORT_BUDGET_MS[module]:.0f} ms")
+        packages = set(result['packages'])
+        extra = packages & UI_FORBIDDEN if module in UI_MODULES else packages - ALLOWED_PACKAGES
+        if extra:
+            problems.append(f"import {module} loads {', '.join(sorted(extra))}")
+    if worker_ms > WORKER_BUDGET_MS:
+        problems.append(f"worker startup: {worker_ms:.0f} ms > {WORKER_BUDGET_MS:.0f} ms")
+    return problems
+
+
+def check_budget(repeats: int = 5) -> List[str]:
+    """Measure everything and return the budget violations (empty if within budget)"""
+    return violations(measure_imports(repeats=repeats), measure_worker_startup(max(1, repeats // 2)))
+
+
+if __name__ == '__main__':
+    imports = measure_imports()
+    worker = measure_worker_startup()
+    for module, result in imports.items():
+        packages = 'dash, plotly, flask, ...' if module in UI_MODULES else ', '.join(result['packages'])
+        print(f"{module:24s} {result['ms']:7.0f} ms  (budget {IMPORT_BUDGET_MS[module]:.0f})  {packages or '-'}")
+    print(f"{'spawned worker':24s} {worker:7.0f} ms  (budget {WORKER_BUDGET_MS:.0f})")
+    problems = violations(imports, worker)
+    for problem in problems:
+        print("over budget:", problem)
+    sys.exit(1 if problems else 0)
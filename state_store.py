@@ -0,0 +1,397 @@
+"""Session-state backends for the dashboard
+
+Simulations live server-side, keyed by a session id, so that any worker
+process (e.g. `gunicorn -w 16`) can advance any session. Every backend
+provides the same small interface: load / save / delete of a serialized
+simulation, a listing of the stored ids, plus a per-session lock that
+serializes concurrent ticks.
+
+Backends (chosen with a URL, see `get_store`):
+  memory://                  - in-process dict (single worker only)
+  sqlite:///path/to/file.db  - local file shared by all workers on one host
+  redis://host:port/db       - any Redis-compatible server (needs `redis`)
+  local-redis://             - in-process stand-in speaking the same client API
+
+Payloads are data only - JSON with NumPy arrays and byte blobs as base64 -
+so a tampered entry in a shared database cannot run code when loaded.
+"""
+import base64
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from fnmatch import fnmatchcase
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from wealth_inequality_sim import WealthInequalitySimulation
+
+DEFAULT_TTL = 3600.0  # Idle sessions expire after an hour
+DEFAULT_HISTORY = 5000  # History points kept per stored session
+
+
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+
+# Tags for the values JSON lacks; any other dict must have plain string keys
+TAGS = frozenset({'__ndarray__', '__list__', '__bytes__', '__tuple__', '__items__'})
+ARRAY_KINDS = 'biuf'  # bool, integer and float arrays only - never object arrays
+LIST_DTYPES = ('<f8', '<i8')  # Numeric lists: packed like arrays, restored as lists
+
+
+def _b64(data) -> str:
+    return base64.b64encode(data).decode('ascii')
+
+
+def _encode(value: Any) -> Any:
+    """JSON-compatible form of a compact to_dict value"""
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value) and not TAGS.intersection(value):
+            return {key: _encode(item) for key, item in value.items()}
+        return {'__items__': [[_encode(key), _encode(item)] for key, item in value.items()]}
+    if isinstance(value, list):
+        if type(value[0] if value else None) in (int, float):
+            # Numeric histories; lists mixing in anything else stay plain JSON
+            try:
+                packed = np.array(value)
+            except (ValueError, OverflowError):
+                packed = None
+            if packed is not None and packed.ndim == 1 and packed.dtype in (np.float64, np.int64):
+                code = LIST_DTYPES[packed.dtype.kind == 'i']
+                return {'__list__': code, 'data': _b64(packed.astype(code))}
+        return [_encode(item) for item in value]
+    if isinstance(value, tuple):
+        return {'__tuple__': [_encode(item) for item in value]}
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind not in ARRAY_KINDS:
+            raise TypeError(f"Cannot store {value.dtype} arrays")
+        return {'__ndarray__': value.dtype.str, 'shape': list(value.shape),
+                'data': _b64(np.ascontiguousarray(value))}
+    if isinstance(value, (bytes, bytearray)):
+        return {'__bytes__': _b64(value)}
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _decode(obj: dict) -> Any:
+    """json object_hook inverting _encode (inner values are already decoded)"""
+    if '__ndarray__' in obj:
+        dtype = np.dtype(obj['__ndarray__'])
+        if dtype.kind not in ARRAY_KINDS:
+            raise ValueError(f"Unsupported array dtype: {dtype}")
+        return np.frombuffer(base64.b64decode(obj['data']), dtype=dtype).reshape(obj['shape']).copy()
+    if '__list__' in obj:
+        if obj['__list__'] not in LIST_DTYPES:
+            raise ValueError(f"Unsupported list dtype: {obj['__list__']}")
+        return np.frombuffer(base64.b64decode(obj['data']), dtype=obj['__list__']).tolist()
+    if '__bytes__' in obj:
+        return base64.b64decode(obj['__bytes__'])
+    if '__tuple__' in obj:
+        return tuple(obj['__tuple__'])
+    if '__items__' in obj:
+        return {key: item for key, item in obj['__items__']}
+    return obj
+
+
+def dumps_simulation(sim: WealthInequalitySimulation, max_history: Optional[int] = DEFAULT_HISTORY) -> bytes:
+    """Session payload: JSON, with the agent arrays as base64 bytes"""
+    data = _encode(sim.to_dict(max_history=max_history, compact=True))
+    return json.dumps(data, separators=(',', ':')).encode()
+
+
+def loads_simulation(data: bytes) -> WealthInequalitySimulation:
+    """Inverse of dumps_simulation. Raises ValueError on anything else."""
+    return WealthInequalitySimulation.from_dict(json.loads(data, object_hook=_decode))
+
+
+class StateStore(ABC):
+    """Base class: subclasses implement the raw byte operations and locking"""
+    
+    def __init__(self, ttl: float = DEFAULT_TTL, max_history: Optional[int] = DEFAULT_HISTORY):
+        self.ttl = ttl
+        self.max_history = max_history
+    
+    @abstractmethod
+    def load(self, session_id: str) -> Optional[bytes]:
+        """Stored payload, or None"""
+    
+    @abstractmethod
+    def save(self, session_id: str, data: bytes):
+        """Store a payload (and drop expired entries)"""
+    
+    @abstractmethod
+    def delete(self, session_id: str):
+        """Remove an entry if present"""
+    
+    @abstractmethod
+    def keys(self) -> List[str]:
+        """Ids of the stored (unexpired) entries"""
+    
+    @abstractmethod
+    def _acquire(self, session_id: str, token: str, lease: float) -> bool:
+        """Try once to take the session lock"""
+    
+    @abstractmethod
+    def _release(self, session_id: str, token: str):
+        """Release the lock if `token` still holds it"""
+    
+    @contextmanager
+    def lock(self, session_id: str, timeout: float = 5.0, lease: float = 30.0) -> Iterator[None]:
+        """Hold the per-session lock. Raises TimeoutError if another worker keeps it.
+        
+        `lease` bounds how long a crashed worker can block a session.
+        """
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+        delay = 0.001
+        while not self._acquire(session_id, token, lease):
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Session {session_id} is busy")
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+        try:
+            yield
+        finally:
+            self._release(session_id, token)
+    
+    def load_simulation(self, session_id: str) -> Optional[WealthInequalitySimulation]:
+        data = self.load(session_id)
+        return loads_simulation(data) if data is not None else None
+    
+    def save_simulation(self, session_id: str, sim: WealthInequalitySimulation):
+        self.save(session_id, dumps_simulation(sim, self.max_history))
+
+
+class InProcessStore(StateStore):
+    """Plain dict + threading locks. Only valid with a single worker process."""
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._data: Dict[str, tuple] = {}
+        self._locks: Dict[str, tuple] = {}
+        self._mutex = threading.Lock()
+    
+    def _prune(self, now: float):
+        expired = [sid for sid, (_, updated) in self._data.items() if now - updated > self.ttl]
+        for sid in expired:
+            del self._data[sid]
+    
+    def load(self, session_id: str) -> Optional[bytes]:
+        with self._mutex:
+            entry = self._data.get(session_id)
+            return entry[0] if entry else None
+    
+    def save(self, session_id: str, data: bytes):
+        now = time.time()
+        with self._mutex:
+            self._data[session_id] = (data, now)
+            self._prune(now)
+    
+    def delete(self, session_id: str):
+        with self._mutex:
+            self._data.pop(session_id, None)
+    
+    def keys(self) -> List[str]:
+        now = time.time()
+        with self._mutex:
+            return [sid for sid, (_, updated) in self._data.items() if now - updated <= self.ttl]
+    
+    def _acquire(self, session_id: str, token: str, lease: float) -> bool:
+        now = time.monotonic()
+        with self._mutex:
+            holder = self._locks.get(session_id)
+            if holder is not None and holder[1] > now:
+                return False
+            self._locks[session_id] = (token, now + lease)
+            return True
+    
+    def _release(self, session_id: str, token: str):
+        with self._mutex:
+            holder = self._locks.get(session_id)
+            if holder is not None and holder[0] == token:
+                del self._locks[session_id]
+
+
+class SQLiteStore(StateStore):
+    """Local SQLite file shared by every worker process on the host
+    
+    WAL mode lets readers proceed while one worker writes; locks are rows
+    with an expiry so a crashed worker cannot wedge a session.
+    """
+    
+    def __init__(self, path: str, table: str = 'sessions', **kwargs):
+        super().__init__(**kwargs)
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table}")
+        self.path = path
+        self.table = table
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {table} "
+                         "(id TEXT PRIMARY KEY, data BLOB NOT NULL, updated REAL NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS locks "
+                         "(id TEXT PRIMARY KEY, token TEXT NOT NULL, expires REAL NOT NULL)")
+    
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads (or forked processes)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+    
+    def load(self, session_id: str) -> Optional[bytes]:
+        row = self._connect().execute(f"SELECT data FROM {self.table} WHERE id = ?", (session_id,)).fetchone()
+        return bytes(row[0]) if row else None
+    
+    def save(self, session_id: str, data: bytes):
+        now = time.time()
+        conn = self._connect()
+        conn.execute(f"INSERT OR REPLACE INTO {self.table} (id, data, updated) VALUES (?, ?, ?)",
+                     (session_id, sqlite3.Binary(data), now))
+        conn.execute(f"DELETE FROM {self.table} WHERE updated < ?", (now - self.ttl,))
+    
+    def delete(self, session_id: str):
+        self._connect().execute(f"DELETE FROM {self.table} WHERE id = ?", (session_id,))
+    
+    def keys(self) -> List[str]:
+        rows = self._connect().execute(f"SELECT id FROM {self.table} WHERE updated >= ?",
+                                       (time.time() - self.ttl,)).fetchall()
+        return [row[0] for row in rows]
+    
+    def _acquire(self, session_id: str, token: str, lease: float) -> bool:
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM locks WHERE id = ? AND expires < ?", (session_id, now))
+            cursor = conn.execute("INSERT OR IGNORE INTO locks (id, token, expires) VALUES (?, ?, ?)",
+                                  (session_id, token, now + lease))
+            conn.execute("COMMIT")
+        except sqlite3.OperationalError:
+            # Database busy beyond the connection timeout: treat as not acquired
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            return False
+        return cursor.rowcount == 1
+    
+    def _release(self, session_id: str, token: str):
+        self._connect().execute("DELETE FROM locks WHERE id = ? AND token = ?", (session_id, token))
+
+
+class RedisStore(StateStore):
+    """Any client with the redis-py get / set(nx, px) / delete API
+    
+    Works with a real Redis-compatible server (Redis, KeyDB, Valkey, ...) or
+    with `LocalRedis` as an in-process stand-in.
+    """
+    
+    RELEASE_SCRIPT = ("if redis.call('get', KEYS[1]) == ARGV[1] then "
+                      "return redis.call('del', KEYS[1]) else return 0 end")
+    
+    def __init__(self, client, prefix: str = 'wealth-sim:', **kwargs):
+        super().__init__(**kwargs)
+        self.client = client
+        self.prefix = prefix
+    
+    def _key(self, kind: str, session_id: str) -> str:
+        return f"{self.prefix}{kind}:{session_id}"
+    
+    def load(self, session_id: str) -> Optional[bytes]:
+        return self.client.get(self._key('session', session_id))
+    
+    def save(self, session_id: str, data: bytes):
+        self.client.set(self._key('session', session_id), data, px=int(self.ttl * 1000))
+    
+    def delete(self, session_id: str):
+        self.client.delete(self._key('session', session_id))
+    
+    def keys(self) -> List[str]:
+        prefix = self._key('session', '')
+        keys = (key.decode() if isinstance(key, bytes) else key
+                for key in self.client.scan_iter(match=prefix + '*'))
+        return [key[len(prefix):] for key in keys]
+    
+    def _acquire(self, session_id: str, token: str, lease: float) -> bool:
+        return bool(self.client.set(self._key('lock', session_id), token, nx=True, px=int(lease * 1000)))
+    
+    def _release(self, session_id: str, token: str):
+        key = self._key('lock', session_id)
+        if hasattr(self.client, 'eval'):
+            # Atomic compare-and-delete on a real server
+            self.client.eval(self.RELEASE_SCRIPT, 1, key, token)
+        elif self.client.get(key) in (token, token.encode()):
+            self.client.delete(key)
+
+
+class LocalRedis:
+    """In-process stand-in for the subset of the redis-py client RedisStore uses"""
+    
+    def __init__(self):
+        self._data: Dict[str, tuple] = {}
+        self._mutex = threading.Lock()
+    
+    def _live(self, key: str, now: float):
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= now:
+            del self._data[key]
+            return None
+        return entry
+    
+    def get(self, key: str):
+        with self._mutex:
+            entry = self._live(key, time.monotonic())
+            return entry[0] if entry else None
+    
+    def set(self, key: str, value, nx: bool = False, px: Optional[int] = None):
+        now = time.monotonic()
+        with self._mutex:
+            if nx and self._live(key, now) is not None:
+                return None
+            self._data[key] = (value, now + px / 1000.0 if px else None)
+            return True
+    
+    def delete(self, *keys: str) -> int:
+        with self._mutex:
+            return sum(self._data.pop(key, None) is not None for key in keys)
+    
+    def scan_iter(self, match: Optional[str] = None) -> Iterator[str]:
+        now = time.monotonic()
+        with self._mutex:
+            live = [key for key in list(self._data) if self._live(key, now) is not None]
+        return iter([key for key in live if match is None or fnmatchcase(key, match)])
+
+
+def get_store(url: Optional[str] = None, namespace: Optional[str] = None, **kwargs) -> StateStore:
+    """Create a store from a URL (default: $WEALTH_SIM_STORE or memory://)
+    
+    `namespace` keeps another kind of entry (e.g. sweep results) apart from
+    the sessions in the same database: its own SQLite table or Redis key
+    prefix, each with its own ttl.
+    """
+    url = url or os.environ.get('WEALTH_SIM_STORE', 'memory://')
+    if url.startswith('memory://'):
+        return InProcessStore(**kwargs)
+    if url.startswith('sqlite://'):
+        path = url[len('sqlite:///'):] if url.startswith('sqlite:///') else url[len('sqlite://'):]
+        if namespace:
+            kwargs['table'] = namespace
+        return SQLiteStore(path or 'wealth_sim_sessions.db', **kwargs)
+    if namespace:
+        kwargs['prefix'] = f"wealth-sim:{namespace}:"
+    if url.startswith('local-redis://'):
+        return RedisStore(LocalRedis(), **kwargs)
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        import redis  # Optional dependency, only needed for a real server
+        return RedisStore(redis.Redis.from_url(url), **kwargs)
+    raise ValueError(f"Unsupported state store URL: {url}")
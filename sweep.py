@@ -0,0 +1,400 @@
+"""Parameter sweeps on a background process pool with a shared result cache
+
+A sweep crosses two parameters (say rich_bias x wealth_tax_rate) over a
+base configuration. Every grid cell is an independent batch of seeded runs
+whose final Gini, top 1% share and bankrupt fraction are stored under a
+hash of everything that determines them, so a cell computed once - for any
+user, by any worker process sharing the cache store - is never run again.
+
+`SweepRunner.submit` only consults the cache and queues the missing cells
+on the pool, so it returns at once; finished cells land in the cache and
+`SweepCache.grid` reads the (partial) heatmaps back from there. With a
+precision target a cell keeps adding waves of replicas until its final
+Gini is known to +-precision (see ensemble.next_wave), so noisy regions of
+the grid get more replicas than quiet ones.
+
+Before spending agent-based compute, `submit(plan, prescreen=True)` has
+the pool preview the whole grid with the mean-field model (milliseconds
+per cell, cached like the cells) and then queues the cells where that
+preview changes fastest - the regime boundaries a sweep is usually after -
+first (`prescreen_order`). `predicted_grid` does the same preview in the
+calling thread.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ensemble import half_width, next_wave
+from mean_field import predict
+from state_store import StateStore, get_store
+from wealth_inequality_sim import WealthInequalitySimulation
+
+# Sweepable parameters: name -> (label, default range)
+SWEEP_PARAMETERS: Dict[str, Tuple[str, Tuple[float, float]]] = {
+    'rich_bias': ('Rich bias', (0.0, 0.15)),
+    'greedy_ratio': ('Greedy ratio', (0.0, 0.7)),
+    'neutral_ratio': ('Neutral ratio', (0.0, 0.7)),
+    'wealth_tax_rate': ('Wealth tax rate', (0.001, 0.10)),
+    'wealth_tax_threshold': ('Wealth tax threshold', (0.01, 0.50)),
+    'wealth_tax_exponent': ('Wealth tax progressivity', (0.0, 3.0)),
+    'ubi_amount': ('UBI amount', (0.1, 10.0)),
+    'safety_net_floor': ('Safety net floor', (1.0, 50.0)),
+}
+
+# Sweeping a policy parameter switches that policy on
+POLICY_SWITCHES = {
+    'wealth_tax_rate': 'wealth_tax_enabled',
+    'wealth_tax_threshold': 'wealth_tax_enabled',
+    'wealth_tax_exponent': 'wealth_tax_enabled',
+    'ubi_amount': 'ubi_enabled',
+    'safety_net_floor': 'safety_net_enabled',
+}
+
+CELL_METRICS = ('gini', 'top_1_percent', 'bankrupt_fraction')
+MAX_STEPS = 25  # Per axis, so at most 625 cells per sweep
+CACHE_VERSION = 1  # Bump when the model changes so stale cells are not reused
+DEFAULT_CACHE_TTL = 7 * 24 * 3600.0
+# Coarser than mean_field's defaults: within ~0.01 Gini, a few times faster
+PRESCREEN_OPTIONS = {'spacing': 0.3, 'max_step': 4.0}
+PREDICTION_PREFIX = 'mean_field:'  # Cache keys of predicted cells
+
+
+def axis_values(low: float, high: float, steps: int) -> List[float]:
+    """Evenly spaced axis values, rounded so equal grids hash to equal cells"""
+    steps = min(max(1, int(steps)), MAX_STEPS)
+    return [round(float(v), 6) for v in np.linspace(low, high, steps)]
+
+
+def cell_config(base: dict, x_param: str, x: float, y_param: str, y: float) -> dict:
+    """Base configuration with both swept values (and their policies) set"""
+    config = dict(base)
+    for param, value in ((x_param, x), (y_param, y)):
+        config[param] = value
+        if param in POLICY_SWITCHES:
+            config[POLICY_SWITCHES[param]] = True
+    return config
+
+
+def is_valid(config: dict) -> bool:
+    return config.get('greedy_ratio', 0.33) + config.get('neutral_ratio', 0.33) <= 1.0 + 1e-9
+
+
+def cell_key(config: dict, n_rounds: int, replicas: int, precision: Optional[float] = None,
+             confidence: float = 0.95, max_replicas: Optional[int] = None) -> str:
+    fields = {'version': CACHE_VERSION, 'config': config, 'rounds': int(n_rounds), 'replicas': int(replicas)}
+    if precision:
+        fields.update(precision=float(precision), confidence=float(confidence), max_replicas=max_replicas)
+    payload = json.dumps(fields, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def run_replicas(config: dict, n_rounds: int, seeds: Sequence[int], record_every: int = 10) -> List[List[float]]:
+    """Final (gini, top 1% share, bankrupt fraction) of one run per seed
+    
+    Every cell uses the same seeds 0, 1, ..., so neighbouring cells differ
+    by their parameters rather than by luck.
+    """
+    rows = []
+    for seed in seeds:
+        sim = WealthInequalitySimulation(seed=seed, stats_interval=record_every,
+                                         keep_history=False, **config)
+        sim.run(n_rounds)
+        gini, active_count, _, top_1 = sim.compute_statistics()
+        rows.append([gini, top_1, 1.0 - active_count / sim.n_agents])
+    return rows
+
+
+def summarize(rows: Sequence[Sequence[float]], confidence: float = 0.95) -> Dict[str, float]:
+    """Cached cell result: mean metrics, replica count and the Gini interval half-width"""
+    values = np.asarray(rows, dtype=np.float64)
+    result = dict(zip(CELL_METRICS, values.mean(axis=0).tolist()))
+    result['replicas'] = len(values)
+    result['gini_half_width'] = half_width(values[:, 0], confidence) if len(values) > 1 else None
+    return result
+
+
+def run_cell(config: dict, n_rounds: int, replicas: int, record_every: int = 10) -> Dict[str, float]:
+    """Cell result over a fixed number of replicas (seeds 0..replicas-1)"""
+    return summarize(run_replicas(config, n_rounds, range(replicas), record_every))
+
+
+def predict_cell(config: dict, n_rounds: int) -> Dict[str, float]:
+    """Mean-field final metrics of one cell (no replicas, no seeds)"""
+    return predict(n_rounds, points=1, **PRESCREEN_OPTIONS, **config).final()
+
+
+def predicted_grid(plan: dict, cache: Optional['SweepCache'] = None) -> Dict[str, np.ndarray]:
+    """Mean-field metric arrays shaped like plan['keys'] (NaN where invalid)
+    
+    With a cache, predictions are stored next to the cell results, so a
+    grid revisited by anyone is previewed without solving again.
+    """
+    keys = plan['keys']
+    shape = (len(keys), len(keys[0]) if keys else 0)
+    arrays = {metric: np.full(shape, np.nan) for metric in CELL_METRICS}
+    for i, row in enumerate(keys):
+        for j, key in enumerate(row):
+            if key is None:
+                continue
+            result = cache.get(PREDICTION_PREFIX + key) if cache is not None else None
+            if result is None:
+                result = predict_cell(plan['configs'][key], plan['n_rounds'])
+                if cache is not None:
+                    cache.put(PREDICTION_PREFIX + key, result)
+            for metric, values in arrays.items():
+                values[i, j] = result[metric]
+    return arrays
+
+
+def prescreen_order(plan: dict, predicted: Dict[str, np.ndarray], metric: str = 'gini') -> List[str]:
+    """Cell keys, steepest predicted `metric` first
+    
+    A cell's steepness is its largest difference to a valid neighbour: flat
+    regions are where the prediction is least likely to hide anything, so
+    they run last.
+    """
+    values = predicted[metric]
+    padded = np.pad(values, 1, constant_values=np.nan)
+    neighbours = np.stack([padded[:-2, 1:-1], padded[2:, 1:-1], padded[1:-1, :-2], padded[1:-1, 2:]])
+    steepness = np.nan_to_num(np.fmax.reduce(np.abs(neighbours - values), axis=0))
+    cells = [(steepness[i, j], key) for i, row in enumerate(plan['keys'])
+             for j, key in enumerate(row) if key is not None]
+    return [key for _, key in sorted(cells, key=lambda cell: -cell[0])]
+
+
+def plan_sweep(base: dict, x_param: str, x_values: Sequence[float], y_param: str,
+               y_values: Sequence[float], n_rounds: int, replicas: int,
+               precision: Optional[float] = None, confidence: float = 0.95,
+               max_replicas: int = 200) -> dict:
+    """Grid description: axes plus one cache key per cell (None where the
+    configuration is invalid, e.g. greedy + neutral > 1)
+    
+    Without `precision` every cell runs `replicas` replicas; with it,
+    `replicas` is the first wave and cells stop once their final Gini is
+    known to +-precision at `confidence` (or at max_replicas).
+    """
+    keys, configs = [], {}
+    for y in y_values:
+        row = []
+        for x in x_values:
+            config = cell_config(base, x_param, x, y_param, y)
+            if not is_valid(config):
+                row.append(None)
+                continue
+            key = cell_key(config, n_rounds, replicas, precision, confidence, max_replicas)
+            configs[key] = config
+            row.append(key)
+        keys.append(row)
+    return {'x_param': x_param, 'x_values': list(x_values),
+            'y_param': y_param, 'y_values': list(y_values),
+            'n_rounds': int(n_rounds), 'replicas': int(replicas),
+            'precision': precision, 'confidence': confidence, 'max_replicas': int(max_replicas),
+            'keys': keys, 'configs': configs}
+
+
+class SweepCache:
+    """Cell results (JSON) in a namespaced state store shared by all users and workers"""
+    
+    def __init__(self, store: StateStore):
+        self.store = store
+    
+    def get(self, key: str) -> Optional[Dict[str, float]]:
+        data = self.store.load(key)
+        return json.loads(data) if data is not None else None
+    
+    def put(self, key: str, result: Dict[str, float]):
+        self.store.save(key, json.dumps(result).encode())
+    
+    def keys(self) -> List[str]:
+        """Keys of the cached cells (mean-field predictions excluded)"""
+        return [key for key in self.store.keys() if not key.startswith(PREDICTION_PREFIX)]
+    
+    def grid(self, keys: Sequence[Sequence[Optional[str]]],
+             prefix: str = '') -> Tuple[Dict[str, np.ndarray], int, int]:
+        """Metric (and replica count) arrays shaped like `keys` (NaN where
+        pending or invalid), plus the number of finished and of valid cells
+        
+        prefix=PREDICTION_PREFIX reads the mean-field predictions instead.
+        """
+        shape = (len(keys), len(keys[0]) if keys else 0)
+        arrays = {metric: np.full(shape, np.nan) for metric in CELL_METRICS + ('replicas',)}
+        done = total = 0
+        for i, row in enumerate(keys):
+            for j, key in enumerate(row):
+                if key is None:
+                    continue
+                total += 1
+                result = self.get(prefix + key)
+                if result is None:
+                    continue
+                done += 1
+                for metric, values in arrays.items():
+                    values[i, j] = result.get(metric, np.nan)
+        return arrays, done, total
+
+
+class SweepRunner:
+    """Runs cells on a lazily started process pool, writing results to the cache
+    
+    Cells already cached, or already queued by this process, are skipped, so
+    overlapping sweeps from several users share the work. Each replica is
+    one task, so the replicas of a cell spread over all workers; a cell
+    with a precision target queues its next wave when the previous one
+    finishes. Mean-field prescreens run on the pool too. The pool uses the
+    'spawn' start method: forking a threaded web server is unsafe.
+    """
+    
+    def __init__(self, cache: SweepCache, max_workers: Optional[int] = None):
+        self.cache = cache
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending: Dict[str, List[Future]] = {}  # key -> futures of the cell's current wave
+        self.failed: Dict[str, str] = {}  # key -> error of cells whose run raised
+        self._mutex = threading.Lock()
+    
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.max_workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+    
+    def submit(self, plan: dict, order: Optional[Sequence[str]] = None, prescreen: bool = False) -> int:
+        """Queue every missing cell of a plan (in `order`); returns how many
+        
+        With prescreen, the pool first predicts every cell with the
+        mean-field model (cached under PREDICTION_PREFIX, see
+        SweepCache.grid) and the missing cells are queued steepest first
+        once all predictions are in. Nothing is computed here either way, so
+        this returns at once, e.g. inside a web request.
+        """
+        keys = [key for key in (order if order is not None else plan['configs'])
+                if self.cache.get(key) is None]
+        with self._mutex:
+            # Reserved now, so overlapping sweeps skip them until they run
+            keys = [key for key in keys if key not in self._pending]
+            for key in keys:
+                self._pending[key] = []
+        if prescreen:
+            self._prescreen(plan, keys)
+        else:
+            self._queue(plan, keys)
+        return len(keys)
+    
+    def _queue(self, plan: dict, keys: Sequence[str]):
+        """Start the first wave of each (reserved) cell, in order"""
+        for key in keys:
+            self.failed.pop(key, None)
+            self._submit_wave(key, plan['configs'][key], plan, [], plan['replicas'])
+    
+    def _prescreen(self, plan: dict, keys: List[str]):
+        """Predict the cells without a cached prediction, then queue `keys`"""
+        configs = plan['configs']
+        missing = [key for key in configs if self.cache.get(PREDICTION_PREFIX + key) is None]
+        if not missing:
+            self._finish_prescreen(plan, keys, {})
+            return
+        pool = self._pool()
+        futures = {key: pool.submit(predict_cell, configs[key], plan['n_rounds']) for key in missing}
+        remaining = [len(futures)]
+        
+        def prediction_done(key: str, future: Future):
+            # Cached as it arrives, so the (faded) preview fills in progressively
+            try:
+                if not future.cancelled() and future.exception() is None:
+                    self.cache.put(PREDICTION_PREFIX + key, future.result())
+            except Exception:
+                pass  # A lost prediction only costs its preview
+            with self._mutex:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                self._finish_prescreen(plan, keys, futures)
+        
+        for key, future in futures.items():
+            future.add_done_callback(partial(prediction_done, key))
+    
+    def _finish_prescreen(self, plan: dict, keys: List[str], futures: Dict[str, Future]):
+        if any(future.cancelled() for future in futures.values()):
+            for key in keys:
+                self._drop(key)
+            return
+        try:
+            predicted, _, _ = self.cache.grid(plan['keys'], PREDICTION_PREFIX)
+            rank = {key: i for i, key in enumerate(prescreen_order(plan, predicted))}
+            keys = sorted(keys, key=rank.__getitem__)
+        except Exception:
+            pass  # A failed preview only costs the ordering
+        self._queue(plan, keys)
+    
+    def _submit_wave(self, key: str, config: dict, plan: dict, rows: List[List[float]], count: int):
+        """Queue replicas len(rows) .. len(rows) + count - 1 of a cell, one task each"""
+        pool = self._pool()
+        futures = [pool.submit(run_replicas, config, plan['n_rounds'], [seed])
+                   for seed in range(len(rows), len(rows) + count)]
+        with self._mutex:
+            self._pending[key] = futures
+        remaining = [len(futures)]
+        
+        def replica_done(_):
+            with self._mutex:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                self._finish_wave(key, config, plan, rows, futures)
+        
+        for future in futures:
+            future.add_done_callback(replica_done)
+    
+    def _finish_wave(self, key: str, config: dict, plan: dict, rows: List[List[float]], futures: List[Future]):
+        try:
+            if any(future.cancelled() for future in futures):
+                self._drop(key)
+                return
+            errors = [future.exception() for future in futures if future.exception() is not None]
+            if errors:
+                raise errors[0]
+            for future in futures:
+                rows.extend(future.result())
+            count = 0
+            if plan.get('precision'):
+                count = next_wave([row[0] for row in rows], plan['precision'],
+                                  plan['confidence'], plan['max_replicas'])
+            if count:
+                self._submit_wave(key, config, plan, rows, count)
+                return
+            result = summarize(rows, plan.get('confidence', 0.95))
+            # The inputs too, so the emulator can learn from the cache
+            result.update(config=config, n_rounds=plan['n_rounds'])
+            self.cache.put(key, result)
+            self._drop(key)
+        except Exception as error:
+            self.failed[key] = repr(error)
+            self._drop(key)
+    
+    def _drop(self, key: str):
+        with self._mutex:
+            self._pending.pop(key, None)
+    
+    @property
+    def pending(self) -> int:
+        with self._mutex:
+            return len(self._pending)
+    
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+
+def get_cache(url: Optional[str] = None, ttl: Optional[float] = None) -> SweepCache:
+    """Sweep cache in the session store's database (or $WEALTH_SIM_SWEEP_CACHE)"""
+    url = url or os.environ.get('WEALTH_SIM_SWEEP_CACHE') or os.environ.get('WEALTH_SIM_STORE', 'memory://')
+    ttl = ttl or float(os.environ.get('WEALTH_SIM_SWEEP_TTL', DEFAULT_CACHE_TTL))
+    return SweepCache(get_store(url, namespace='sweep_cells', ttl=ttl))
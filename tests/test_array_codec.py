@@ -0,0 +1,34 @@
+import json
+
+import numpy as np
+import pytest
+
+from array_codec import DTYPES, decode_array, encode_array, is_encoded
+
+
+@pytest.mark.parametrize('dtype', sorted(DTYPES))
+def test_round_trip(dtype):
+    low = 0 if dtype.startswith('u') else -3
+    values = np.arange(low, low + 10).astype(DTYPES[dtype])
+    spec = encode_array(values, dtype)
+    assert is_encoded(spec) and spec['dtype'] == dtype
+    assert np.array_equal(decode_array(json.loads(json.dumps(spec))), values)
+
+
+def test_plain_lists_pass_through():
+    assert decode_array([1.0, 2.5]).tolist() == [1.0, 2.5]
+
+
+def test_dashboard_figures_carry_typed_arrays():
+    # Needs plotly >= 6: older versions serialize NumPy arrays as plain lists
+    plotly = pytest.importorskip('plotly')
+    if int(plotly.__version__.split('.')[0]) < 6:
+        pytest.skip("plotly < 6 does not emit bdata")
+    app = pytest.importorskip('app_wealth_inequality')
+    sim = app.WealthInequalitySimulation(n_agents=100, seed=1)
+    sim.run(300)
+    outputs = app.create_all_outputs(sim, sim.get_current_results(), False)
+    figure = json.loads(outputs[2].to_json())  # The inequality chart
+    gini = figure['data'][0]['y']
+    assert is_encoded(gini) and gini['dtype'] == 'f4'
+    assert np.allclose(decode_array(gini), sim.gini_history, atol=1e-6)
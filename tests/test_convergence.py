@@ -0,0 +1,61 @@
+import numpy as np
+
+from convergence import ConvergenceDetector
+from wealth_inequality_sim import WealthInequalitySimulation
+
+
+def test_absorbed_when_too_few_agents_remain():
+    assert ConvergenceDetector().update(0.9, 2) == 'absorbed'
+    assert ConvergenceDetector().update(0.9, 3) is None
+
+
+def test_plateau_needs_a_flat_window_and_no_bankruptcies():
+    detector = ConvergenceDetector(block=10, n_blocks=4)
+    reasons = [detector.update(0.5, 100) for _ in range(40)]
+    assert reasons[:39] == [None] * 39 and reasons[39] == 'plateau'
+    
+    # A steady trend never settles
+    drifting = ConvergenceDetector(block=10, n_blocks=4)
+    assert all(drifting.update(0.001 * i, 100) is None for i in range(400))
+    
+    # A bankruptcy starts the window over
+    detector = ConvergenceDetector(block=10, n_blocks=4)
+    for _ in range(35):
+        detector.update(0.5, 100)
+    assert all(detector.update(0.5, 99) is None for _ in range(39))
+    assert detector.update(0.5, 99) == 'plateau'
+
+
+def test_state_round_trips_and_scan_matches_online_detection():
+    rng = np.random.default_rng(0)
+    gini = 0.6 + 0.002 * rng.standard_normal(2000)
+    active = np.full(2000, 50)
+    detector = ConvergenceDetector(block=20)
+    online = next(i for i, (g, a) in enumerate(zip(gini, active)) if detector.update(g, a))
+    assert ConvergenceDetector(block=20).scan(gini, active) == (online, 'plateau')
+    
+    half = ConvergenceDetector(block=20)
+    for g, a in zip(gini[:30], active[:30]):
+        half.update(g, a)
+    restored = ConvergenceDetector.from_dict(half.to_dict())
+    assert restored == half
+
+
+def test_engine_stops_early_on_absorption():
+    sim = WealthInequalitySimulation(n_agents=10, seed=1, rich_bias=0.2)
+    rounds = sim.run(200_000)
+    assert sim.convergence_reason == 'absorbed'
+    assert rounds == sim.converged_at_round < 200_000
+    assert sim.active_count <= 2
+
+
+def test_engine_detects_a_plateau_without_bankruptcies():
+    # min_wealth=0: nobody can go bankrupt, the distribution just settles
+    sim = WealthInequalitySimulation(n_agents=30, seed=1, rich_bias=0.0, min_wealth=0.0)
+    rounds = sim.run(200_000)
+    assert sim.convergence_reason == 'plateau' and rounds < 200_000
+    
+    keep_going = WealthInequalitySimulation(n_agents=30, seed=1, rich_bias=0.0, min_wealth=0.0,
+                                            stop_on_convergence=False)
+    assert keep_going.run(rounds + 1000) == rounds + 1000
+    assert keep_going.converged_at_round == sim.converged_at_round
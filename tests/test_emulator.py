@@ -0,0 +1,82 @@
+import time
+
+import numpy as np
+import pytest
+
+from emulator import FEATURES, SweepEmulator, features, regime
+from state_store import get_store
+from sweep import SweepCache, cell_config, cell_key
+
+
+def _truth(config):
+    """A smooth stand-in for the simulated metrics"""
+    gini = 0.4 + 2.0 * config['rich_bias'] + 0.3 * config['greedy_ratio'] ** 2
+    return {'gini': gini, 'top_1_percent': 20.0 * gini, 'bankrupt_fraction': gini / 2}
+
+
+def _fill(cache, x_values, y_values, base=None):
+    for y in y_values:
+        for x in x_values:
+            config = cell_config(base or {'n_agents': 100}, 'rich_bias', x, 'greedy_ratio', y)
+            cache.put(cell_key(config, 5000, 4), {**_truth(config), 'config': config, 'n_rounds': 5000})
+
+
+@pytest.fixture
+def cache():
+    return SweepCache(get_store('memory://'))
+
+
+def test_held_out_cells_are_interpolated(cache):
+    _fill(cache, np.linspace(0.0, 0.15, 7), np.linspace(0.0, 0.7, 6))
+    emulator = SweepEmulator(cache)
+    emulator.refresh(wait=True)
+    assert emulator.cells == 42
+    
+    for x, y in [(0.0125, 0.07), (0.0625, 0.35), (0.1375, 0.63)]:
+        config = {'n_agents': 100, 'rich_bias': x, 'greedy_ratio': y}
+        emulation = emulator.predict(config)
+        assert emulation.n_rounds == 5000 and emulation.cells == 42
+        assert emulation.mean['gini'] == pytest.approx(_truth(config)['gini'], abs=0.01)
+        assert emulation.std['gini'] < 0.02
+    
+    # Far outside the computed cells the uncertainty grows
+    near = emulator.predict({'n_agents': 100, 'rich_bias': 0.05, 'greedy_ratio': 0.3})
+    far = emulator.predict({'n_agents': 100000, 'rich_bias': 0.05, 'greedy_ratio': 0.3})
+    assert far.nearest > 3 * near.nearest
+    assert far.std['gini'] > 5 * near.std['gini']
+
+
+def test_unmatched_regime_is_not_emulated(cache):
+    _fill(cache, [0.0, 0.1], [0.2, 0.5])
+    emulator = SweepEmulator(cache)
+    emulator.refresh(wait=True)
+    assert emulator.predict({'rich_bias': 0.05}) is not None
+    progressive = {'rich_bias': 0.05, 'wealth_tax_enabled': True, 'wealth_tax_mode': 'progressive'}
+    assert emulator.predict(progressive) is None
+    assert regime({'wealth_tax_mode': 'progressive'}) == regime({})  # Off: the mode is irrelevant
+
+
+def test_refresh_picks_up_new_cells(cache):
+    _fill(cache, [0.0, 0.1], [0.2, 0.5])
+    emulator = SweepEmulator(cache, refresh_interval=60.0)
+    assert emulator.predict({'rich_bias': 0.05}) is None
+    assert emulator.refresh() is True
+    deadline = time.monotonic() + 10
+    while emulator.cells < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert emulator.cells == 4
+    
+    _fill(cache, [0.05], [0.2, 0.5])
+    assert emulator.refresh() is False  # Within refresh_interval
+    emulator.refresh(wait=True)
+    assert emulator.cells == 6
+
+
+def test_features_treat_disabled_policies_as_zero():
+    index = FEATURES.index
+    off = features({'ubi_amount': 5.0, 'wealth_tax_rate': 0.05}, 1000)
+    assert off[index('ubi_amount')] == 0.0 and off[index('wealth_tax_rate')] == 0.0
+    every_10 = features({'wealth_tax_enabled': True, 'wealth_tax_rate': 0.05, 'wealth_tax_interval': 10}, 1000)
+    every_1 = features({'wealth_tax_enabled': True, 'wealth_tax_rate': 0.005}, 1000)
+    assert every_10[index('wealth_tax_rate')] == pytest.approx(every_1[index('wealth_tax_rate')])
+    assert features({}, 10000)[index('n_rounds')] - features({}, 1000)[index('n_rounds')] == pytest.approx(1.0)
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from ensemble import (SERIES, final_statistics, half_width, measure_thread_scaling, next_wave,
+                      run_ensemble, run_replica_into, run_to_precision)
+from wealth_inequality_sim import WealthInequalitySimulation
+
+
+def test_fresh_engine_has_real_round_zero_statistics():
+    sim = WealthInequalitySimulation(n_agents=200, seed=1)
+    # Everyone starts equal: no inequality, the top 10% / 1% own 10% / 1%
+    assert sim.last_statistics == sim.compute_statistics()
+    gini, active, top_10, top_1 = sim.last_statistics
+    assert gini == 0.0 and active == 200
+    assert np.isclose(top_10, 10.0) and np.isclose(top_1, 1.0)
+
+
+def test_replica_round_zero_sample():
+    rows = {key: np.zeros((1, 3), dtype=dtype) for key, dtype in SERIES.items()}
+    run_replica_into(rows, 0, seed=3, n_samples=3, record_every=50, sim_kwargs={'n_agents': 100})
+    assert rows['gini'][0, 0] == 0.0
+    assert rows['active_count'][0, 0] == 100
+    assert np.isclose(rows['top_10_percent'][0, 0], 10.0)
+    assert np.isclose(rows['top_1_percent'][0, 0], 1.0)
+
+
+def test_ensemble_round_zero_means_and_bands():
+    with run_ensemble(4, 200, record_every=100, processes=2, seed=5, n_agents=100) as result:
+        assert result.rounds.tolist() == [0, 100, 200]
+        assert np.allclose(result.mean('top_10_percent')[0], 10.0)
+        assert np.allclose(result.mean('top_1_percent')[0], 1.0)
+        assert np.allclose(result.quantile('top_1_percent', (0.05, 0.95))[:, 0], 1.0)
+        # Trading has started to concentrate wealth
+        assert result.mean('top_10_percent')[-1] > 10.0
+
+
+def test_thread_pool_matches_process_pool():
+    kwargs = dict(n_agents=100, seed=9, wealth_tax_enabled=True, ubi_enabled=True)
+    with run_ensemble(6, 300, record_every=50, processes=2, **kwargs) as processes, \
+            run_ensemble(6, 300, record_every=50, processes=3, executor='thread', **kwargs) as threads:
+        for key in SERIES:
+            np.testing.assert_array_equal(threads.arrays[key], processes.arrays[key])
+        np.testing.assert_array_equal(threads.stopped_at, processes.stopped_at)
+    with pytest.raises(ValueError):
+        run_ensemble(2, 10, executor='fiber')
+
+
+def test_thread_scaling_rows():
+    rows = measure_thread_scaling(n_replicas=4, n_rounds=100, record_every=50, threads=(1, 2),
+                                  repeats=1, n_agents=50)
+    assert [row['threads'] for row in rows] == [1, 2]
+    assert rows[0]['speedup'] == 1.0 and rows[0]['efficiency'] == 1.0
+    assert all(row['seconds'] > 0 for row in rows)
+
+
+def test_next_wave_targets_the_interval():
+    values = np.random.default_rng(0).normal(0.5, 0.05, size=8)
+    assert half_width(values) == pytest.approx(1.959964 * values.std(ddof=1) / np.sqrt(8), rel=1e-5)
+    # Far from the target: at most double the sample
+    assert next_wave(values, precision=0.001) == 8
+    assert next_wave(values, precision=1.0) == 0
+    assert next_wave(values, precision=0.001, max_replicas=10) == 2
+    assert next_wave(values[:1], precision=1.0) == 1
+
+
+def test_run_to_precision_stops_at_the_target():
+    result = run_to_precision(1500, precision=0.01, configs=[{'rich_bias': 0.0}, {'rich_bias': 0.1}],
+                              min_replicas=4, max_replicas=64, record_every=100, processes=2,
+                              executor='thread', seed=2, n_agents=60)
+    assert np.all(result.converged | (result.replicas == 64))
+    assert np.all(result.half_widths[result.converged] <= 0.01)
+    assert np.all(result.replicas > 4)
+    # Replica i of every cell uses the same seed: the first row is reproducible
+    first = final_statistics(int(np.random.SeedSequence(2).spawn(1)[0].generate_state(1, dtype=np.uint64)[0]),
+                             1500, 100, {'n_agents': 60, 'rich_bias': 0.0})
+    np.testing.assert_allclose(result.values[0][0], first)
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from export import RunExporter, load_export
+from wealth_inequality_sim import WealthInequalitySimulation
+
+pd = pytest.importorskip('pandas')
+
+
+@pytest.mark.parametrize('format', ['npz', 'parquet'])
+def test_export_matches_the_engine_history(tmp_path, format):
+    if format != 'npz':
+        pytest.importorskip('pyarrow')
+    sim = WealthInequalitySimulation(n_agents=200, seed=6, stats_interval=10, ubi_enabled=True,
+                                     metrics=['theil'])
+    # Small chunks so the tables are written in several pieces
+    with RunExporter(sim, str(tmp_path), format=format, snapshot_every=500, chunk_rows=7) as exporter:
+        sim.run(2000)
+    assert exporter._record not in sim.listeners
+    frames = load_export(str(tmp_path))
+    
+    history = frames['history']
+    assert history['round'].tolist() == list(range(0, 2001, 10))
+    np.testing.assert_allclose(history['gini'], sim.gini_history)
+    np.testing.assert_allclose(history['theil'], sim.metrics_history['theil'])
+    assert history['total_ubi_distributed'].iloc[-1] == pytest.approx(sim.total_ubi_distributed)
+    
+    styles = frames['styles']
+    last = styles[styles['round'] == 2000]
+    totals, active, wealth = sim.style_aggregates(exact=True)
+    # One row per style, in the engine's style order
+    assert last['agents'].tolist() == totals.tolist()
+    first = styles[styles['round'] == 0]
+    assert first['active'].tolist() == totals.tolist()
+    assert last['active'].tolist() == active.tolist()
+    np.testing.assert_allclose(last['avg_wealth'] * last['active'], wealth)
+    
+    snapshots = frames['snapshots']
+    assert sorted(snapshots['round'].unique()) == [0, 500, 1000, 1500, 2000]
+    final = snapshots[snapshots['round'] == 2000]
+    np.testing.assert_allclose(final['wealth'].to_numpy(), sim.wealth[final['agent'].to_numpy()])
+    
+    meta = history.attrs['meta']
+    assert meta['complete'] and meta['end_round'] == 2000
+    assert meta['rows']['history'] == len(history)
+    assert meta['parameters']['ubi_enabled'] is True
+
+
+def test_summary_snapshots_and_bad_options(tmp_path):
+    sim = WealthInequalitySimulation(n_agents=100, seed=1)
+    with RunExporter(sim, str(tmp_path), format='npz', snapshots='histogram', snapshot_every=100):
+        sim.run(300)
+    snapshots = load_export(str(tmp_path))['snapshots']
+    assert snapshots.groupby('round')['count'].sum().tolist() == [100, 100, 100, 100]
+    # Attaching mid-run starts at the current round
+    with RunExporter(sim, str(tmp_path / 'more'), format='npz', snapshots=None):
+        sim.run(100)
+    assert load_export(str(tmp_path / 'more'))['history']['round'].tolist() == list(range(300, 401))
+    with pytest.raises(ValueError):
+        RunExporter(sim, str(tmp_path / 'x'), format='csv')
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from inequality_metrics import InequalityMetrics
+from wealth_inequality_sim import WealthInequalitySimulation
+
+
+def _reference(w, epsilon):
+    """Textbook definitions, written independently of the cumulative-sum shortcuts"""
+    mean = w.mean()
+    if epsilon == 1:
+        return 1 - np.exp(np.log(w).mean()) / mean
+    return 1 - np.mean(w ** (1 - epsilon)) ** (1 / (1 - epsilon)) / mean
+
+
+def test_metrics_match_their_definitions():
+    w = np.sort(np.random.default_rng(1).lognormal(3.0, 1.2, size=1000))
+    out = InequalityMetrics(atkinson_epsilons=(0.5, 1.0, 1.5, 2.0), bottom_shares=(0.4, 0.5),
+                            lorenz_points=11).compute(w)
+    
+    pairwise = np.abs(w[:, None] - w[None, :]).mean()
+    assert out['gini'] == pytest.approx(pairwise / (2 * w.mean()))
+    ratio = w / w.mean()
+    assert out['theil'] == pytest.approx(np.mean(ratio * np.log(ratio)))
+    for epsilon in (0.5, 1.0, 1.5, 2.0):
+        assert out[f"atkinson_{epsilon:g}"] == pytest.approx(_reference(w, epsilon))
+    assert out['top_10%'] == pytest.approx(w[-100:].sum() / w.sum() * 100)
+    assert out['top_1%'] == pytest.approx(w[-10:].sum() / w.sum() * 100)
+    assert out['bottom_50%'] == pytest.approx(w[:500].sum() / w.sum() * 100)
+    assert out['palma'] == pytest.approx(out['top_10%'] / out['bottom_40%'])
+    np.testing.assert_allclose(out['lorenz'], [w[:k].sum() / w.sum() for k in range(0, 1001, 100)])
+
+
+def test_equal_and_degenerate_distributions():
+    metrics = InequalityMetrics()
+    equal = metrics.compute(np.full(100, 7.0))
+    for key in ('gini', 'theil', 'atkinson_0.5', 'atkinson_1', 'atkinson_2'):
+        assert equal[key] == pytest.approx(0.0, abs=1e-12)
+    assert equal['palma'] == pytest.approx(0.25)
+    np.testing.assert_allclose(equal['lorenz'], np.linspace(0, 1, 21))
+    
+    # Someone holding nothing: total inequality aversion gives 1
+    assert metrics.compute(np.array([0.0, 1.0, 2.0]))['atkinson_1'] == 1.0
+    assert metrics.compute(np.array([]))['gini'] == 0.0
+    with pytest.raises(ValueError):
+        InequalityMetrics(['gini', 'hoover'])
+
+
+def test_engine_records_metrics_from_the_statistics_sort():
+    sim = WealthInequalitySimulation(n_agents=300, seed=2, metrics=['gini', 'theil', 'shares'],
+                                     stats_interval=10)
+    sim.run(2000)
+    assert set(sim.metrics_history) == {'gini', 'theil', 'top_10%', 'top_1%', 'bottom_50%'}
+    assert len(sim.metrics_history['theil']) == len(sim.gini_history)
+    gini, _, top_10, _ = sim.last_statistics
+    assert sim.last_metrics['gini'] == pytest.approx(gini)
+    assert sim.last_metrics['top_10%'] == pytest.approx(top_10)
+    with pytest.raises(ValueError):
+        WealthInequalitySimulation(n_agents=10, metrics=['gini'], stats_mode='sketch')
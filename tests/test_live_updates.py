@@ -0,0 +1,44 @@
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+
+ASSET = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                     'assets', 'live_updates.js')
+
+# Loads the asset with a page whose Dash config has the given prefix, then
+# opens a stream and prints the EventSource URL
+_PAGE = '''
+var config = %s;
+global.window = {};
+global.document = {getElementById: function (id) {
+    return id === '_dash-config' && config ? {textContent: JSON.stringify(config)} : null;
+}};
+global.EventSource = function (url) { this.url = url; this.addEventListener = function () {}; };
+require(%s);
+var live = window.dash_clientside.live;
+live.connect(true, 3, {session_id: 'a b'});
+console.log(live.source.url);
+'''
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason="needs node")
+@pytest.mark.parametrize('config, url', [
+    (None, '/stream/a%20b?speed=3'),
+    ({'requests_pathname_prefix': '/'}, '/stream/a%20b?speed=3'),
+    ({'requests_pathname_prefix': '/sim/'}, '/sim/stream/a%20b?speed=3'),
+])
+def test_stream_url_follows_the_path_prefix(config, url):
+    script = _PAGE % (json.dumps(config), json.dumps(ASSET))
+    out = subprocess.run(['node', '-e', script], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == url
+
+
+def test_stream_route_under_routes_prefix():
+    app = pytest.importorskip('app_wealth_inequality')
+    client = app.server.test_client()
+    response = client.get(app.app.config.routes_pathname_prefix + 'stream/no-such-session')
+    assert response.mimetype == 'text/event-stream'
+    assert response.get_data(as_text=True).startswith('event: gone')
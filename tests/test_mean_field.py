@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from mean_field import predict
+from sweep import run_replicas
+
+CONFIGS = {
+    'fair': {'rich_bias': 0.0},
+    'rich-bias': {'rich_bias': 0.1},
+    'flat-tax': {'wealth_tax_enabled': True, 'wealth_tax_interval': 10,
+                 'ubi_enabled': True, 'ubi_amount': 0.2},
+    'progressive-tax': {'wealth_tax_enabled': True, 'wealth_tax_mode': 'progressive',
+                        'wealth_tax_interval': 20, 'ubi_enabled': True, 'ubi_amount': 0.2},
+    'ubi': {'ubi_enabled': True, 'ubi_amount': 0.5},
+    'safety-net': {'safety_net_enabled': True},
+}
+
+
+@pytest.mark.parametrize('name', list(CONFIGS))
+def test_prediction_agrees_with_the_simulation(name):
+    config = {'n_agents': 100, **CONFIGS[name]}
+    # Gini, top 1% share and bankrupt fraction of four seeded runs
+    simulated = np.mean(run_replicas(config, 10000, range(4), record_every=100), axis=0)
+    predicted = predict(10000, **config).final()
+    assert predicted['gini'] == pytest.approx(simulated[0], abs=0.045)
+    assert predicted['bankrupt_fraction'] == pytest.approx(simulated[2], abs=0.06)
+
+
+def test_prediction_starts_equal_and_spreads():
+    result = predict(5000, record_every=1000, n_agents=500)
+    assert result.rounds.tolist() == [0, 1000, 2000, 3000, 4000, 5000]
+    # Everyone starts at initial_wealth, as in the engine
+    assert result.gini[0] == pytest.approx(0.0, abs=1e-9)
+    assert result.top_10_percent[0] == pytest.approx(10.0)
+    assert result.active_count[0] == pytest.approx(500)
+    assert np.all(np.diff(result.gini) > 0)
+    assert result.density.sum() == pytest.approx(result.active_count[-1])
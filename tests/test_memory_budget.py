@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from memory_budget import TRIM_SLACK, KahanSum, parse_bytes, plan_memory
+from wealth_inequality_sim import WealthInequalitySimulation
+
+
+def test_kahan_sum_keeps_small_increments():
+    naive = 1e16
+    total = KahanSum(1e16)
+    for _ in range(1000):
+        naive += 1.0
+        total.add(1.0)
+    assert naive == 1e16
+    assert total.value == 1e16 + 1000
+
+
+def test_parse_bytes():
+    assert parse_bytes('64GB') == 64 * 2**30
+    assert parse_bytes('512 mb') == 512 * 2**20
+    assert parse_bytes(1000) == 1000
+    with pytest.raises(ValueError):
+        parse_bytes('lots')
+
+
+def test_float32_halves_the_wealth_state():
+    single = WealthInequalitySimulation(n_agents=1000, seed=1, precision='float32')
+    double = WealthInequalitySimulation(n_agents=1000, seed=1)
+    assert single.wealth.dtype == np.float32
+    assert single.memory_estimate(0)['state'] < double.memory_estimate(0)['state']
+    
+    single.run(5000)
+    # Trades only move wealth around: float32 rounding must not create or destroy it
+    assert single.wealth.sum(dtype=np.float64) == pytest.approx(double.wealth.sum(), rel=1e-5)
+    restored = WealthInequalitySimulation.from_dict(single.to_dict())
+    assert restored.wealth.dtype == np.float32
+    np.testing.assert_array_equal(restored.wealth, single.wealth)
+
+
+def test_budget_caps_retained_history():
+    sim = WealthInequalitySimulation(n_agents=2000, seed=1, memory_budget='1MB')
+    assert sim.memory_estimate()['total'] <= parse_bytes('1MB')
+    assert sim.memory_estimate()['per_round'] == 0
+    sim.run(30000)
+    assert len(sim.gini_history) <= sim.history_limit * TRIM_SLACK
+    assert len(sim.wealth_history) <= max(1, sim.snapshot_limit * TRIM_SLACK)
+    
+    with pytest.raises(ValueError):
+        plan_memory(10**6, '1MB')
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from network_topology import Topology, barabasi_albert, build_topology, erdos_renyi, lattice, ring
+from trade_log import TradeLog
+from wealth_inequality_sim import WealthInequalitySimulation
+
+
+def _edges(topology: Topology) -> set:
+    rows = np.repeat(np.arange(topology.n_nodes), topology.degree)
+    return set(zip(rows.tolist(), topology.indices.tolist()))
+
+
+def test_from_edges_is_symmetric_without_loops_or_duplicates():
+    topology = Topology.from_edges(4, [0, 1, 1, 2, 3], [1, 0, 2, 2, 0])
+    assert topology.n_edges == 3
+    assert _edges(topology) == {(0, 1), (1, 0), (1, 2), (2, 1), (0, 3), (3, 0)}
+    with pytest.raises(ValueError):
+        Topology.from_edges(3, [0], [3])
+
+
+def test_generators():
+    assert np.all(ring(100, k=3).degree == 6)
+    assert np.all(lattice(100).degree == 4)
+    assert lattice(100, periodic=False).degree.min() == 2
+    graph = erdos_renyi(2000, mean_degree=8.0, seed=1)
+    assert abs(graph.degree.mean() - 8.0) < 0.5
+    assert _edges(erdos_renyi(500, seed=2)) == _edges(erdos_renyi(500, seed=2))
+    scale_free = barabasi_albert(2000, m=3, seed=1)
+    # Preferential attachment: hubs far above the mean degree
+    assert scale_free.degree.max() > 8 * scale_free.degree.mean()
+
+
+def test_sample_neighbor_skips_bankrupt_agents():
+    topology = ring(10, k=1)
+    rng = np.random.default_rng(0)
+    active = np.ones(10, dtype=bool)
+    active[1] = False
+    assert {topology.sample_neighbor(0, active, rng) for _ in range(50)} == {9}
+    active[9] = False
+    assert topology.sample_neighbor(0, active, rng) == -1
+
+
+def test_round_trip_through_dict():
+    topology = build_topology('barabasi_albert', 300, m=2, seed=4)
+    assert _edges(Topology.from_dict(topology.to_dict(), 300)) == _edges(topology)
+    custom = Topology.from_edges(3, [0], [2])
+    assert _edges(Topology.from_dict(custom.to_dict(), 3)) == _edges(custom)
+
+
+def test_engine_only_trades_along_edges():
+    sim = WealthInequalitySimulation(n_agents=100, seed=1, topology='ring', topology_params={'k': 2})
+    sim.event_log = TradeLog()
+    sim.run(3000)
+    records = sim.event_log.recent().records
+    assert len(records) > 0
+    edges = _edges(sim.topology)
+    assert all(pair in edges for pair in zip(records['agent_a'].tolist(), records['agent_b'].tolist()))
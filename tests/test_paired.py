@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from paired import PairedSimulation, compare_policies
+from wealth_inequality_sim import WealthInequalitySimulation
+
+
+def test_identical_variants_stay_identical():
+    paired = PairedSimulation({'a': {}, 'b': {}}, seed=3, stats_interval=50, n_agents=100)
+    paired.run(2000)
+    assert paired.rounds == list(range(0, 2001, 50))
+    np.testing.assert_array_equal(paired.sims[0].wealth, paired.sims[1].wealth)
+    assert not np.any(paired.differences()['b'])
+    with pytest.raises(ValueError):
+        PairedSimulation({})
+
+
+def test_variants_share_the_initial_population():
+    paired = PairedSimulation({'none': {}, 'tax': {'wealth_tax_enabled': True}}, seed=4, n_agents=80)
+    none, tax = paired.sims
+    np.testing.assert_array_equal(none.styles, tax.styles)
+    np.testing.assert_array_equal(none.wealth, tax.wealth)
+
+
+def test_pairing_reduces_variance():
+    variants = {'none': {}, 'ubi': {'ubi_enabled': True, 'ubi_amount': 0.3}}
+    comparison = compare_policies(variants, n_replicas=8, n_rounds=3000, stats_interval=500, seed=1,
+                                  processes=1, n_agents=100)
+    assert comparison.rounds.tolist() == [0, 500, 1000, 1500, 2000, 2500, 3000]
+    assert comparison.values['gini'].shape == (8, 7, 2)
+    summary = comparison.summary()['ubi']
+    # UBI lowers the Gini, and the interval excludes zero
+    assert summary['difference'] + summary['half_width'] < 0
+    assert summary['variance_reduction'] > 1.0
+
+
+def test_shared_draws_name_agents_rather_than_positions():
+    a = WealthInequalitySimulation(n_agents=50, seed=2)
+    b = WealthInequalitySimulation(n_agents=50, seed=2)
+    # Different bankruptcies reorder the two active lists differently
+    for sim, agent in ((a, 3), (b, 40)):
+        sim.wealth[agent] = 0.0
+        sim._check_bankruptcy(agent)
+    assert a.active_ids.tolist() != b.active_ids.tolist()
+    # Candidates 3 (bankrupt in `a` only), 10 and 20: `a` skips agent 3
+    draws = [0.5, 0.5, 0.5, 3.5 / 50, 10.5 / 50, 20.5 / 50]
+    assert a._select_pair(draws) == (10, 20)
+    assert b._select_pair(draws) == (3, 10)
+    assert a._select_pair(draws[:3] + draws[4:]) == b._select_pair(draws[:3] + draws[4:]) == (10, 20)
+
+
+def test_pairing_stays_effective_over_long_horizons():
+    # A tiny change keeps the variants close for the whole run, even after
+    # they have lost different agents
+    variants = {'none': {}, 'bias': {'rich_bias': 0.0501}}
+    comparison = compare_policies(variants, n_replicas=10, n_rounds=20000, stats_interval=5000, seed=0,
+                                  processes=1, n_agents=100)
+    assert comparison.values['active_count'][:, -1, 0].mean() < 50
+    assert np.all(comparison.variance_reduction('gini')[1:] > 5)
+    assert np.all(comparison.variance_reduction('active_count')[1:] > 5)
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from policy_optimizer import (POLICIES, POLICY_BOUNDS, advance_candidate, optimize_policy,
+                              rung_budgets, sample_policies)
+
+
+def test_rung_budgets_end_at_the_full_budget():
+    assert rung_budgets(9000, 1000, 3) == [1000, 3000, 9000]
+    assert rung_budgets(5000, 5000, 3) == [5000]
+    assert rung_budgets(10000, 1000, 3)[-1] == 10000
+
+
+def test_sampled_policies_stay_in_bounds():
+    policies = sample_policies(50, np.random.default_rng(0))
+    assert policies[0] == {switch: False for switch in POLICIES}
+    for policy in policies[1:]:
+        assert any(policy[switch] for switch in POLICIES)
+        for switch, params in POLICIES.items():
+            for param in params:
+                assert (param in policy) == policy[switch]
+                if policy[switch]:
+                    low, high = POLICY_BOUNDS[param]
+                    assert low <= policy[param] <= high
+    assert sample_policies(50, np.random.default_rng(0)) == policies
+
+
+def test_resumed_candidates_match_uninterrupted_runs():
+    kwargs = {'n_agents': 60, 'wealth_tax_enabled': True, 'ubi_enabled': True}
+    states, _, _ = advance_candidate(None, kwargs, [1, 2], 300, record_every=50)
+    _, resumed, resumed_costs = advance_candidate(states, kwargs, [1, 2], 700, record_every=50)
+    _, direct, direct_costs = advance_candidate(None, kwargs, [1, 2], 700, record_every=50)
+    np.testing.assert_allclose(resumed, direct)
+    np.testing.assert_allclose(resumed_costs, direct_costs)
+
+
+def test_search_returns_the_cheapest_feasible_finalist():
+    result = optimize_policy('gini', target_value=0.3, min_wealth_retained=0.3, n_rounds=9000,
+                             min_rounds=1000, n_candidates=9, replicas=2, processes=1, seed=1,
+                             n_agents=50)
+    assert result.budgets == [1000, 3000, 9000]
+    # Successive halving: far less than running every candidate to the end
+    assert result.rounds_simulated < 9 * 2 * 9000 / 2
+    
+    best = result.best
+    assert best is not None and best.rounds == 9000
+    assert best.metric <= 0.3 and best.wealth_retained >= 0.3
+    feasible = [c for c in result.finalists if c.violation(0.3, 0.3) <= 0]
+    assert best.cost == min(c.cost for c in feasible)
+    with pytest.raises(ValueError):
+        optimize_policy(n_rounds=100, ubi_enabled=True)
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from wealth_inequality_sim import WealthInequalitySimulation
+
+POLICIES = dict(wealth_tax_enabled=True, wealth_tax_mode='progressive', wealth_tax_interval=7,
+                ubi_enabled=True, ubi_amount=0.5, safety_net_enabled=True)
+
+
+def _state(sim):
+    return (sim.current_round, sim.wealth.copy(), list(sim.gini_history),
+            sim.total_taxes_collected, sim.total_ubi_distributed)
+
+
+def _assert_same(left, right):
+    assert left[0] == right[0]
+    np.testing.assert_array_equal(left[1], right[1])
+    assert left[2] == right[2]
+    assert left[3:] == right[3:]
+
+
+def test_seek_backwards_replays_the_same_trajectory():
+    sim = WealthInequalitySimulation(n_agents=300, seed=11, checkpoint_interval=250, **POLICIES)
+    sim.run(1300)
+    expected_1300 = _state(sim)
+    
+    reference = WealthInequalitySimulation(n_agents=300, seed=11, **POLICIES)
+    reference.run(640)
+    
+    assert sim.seek(640) == 640
+    _assert_same(_state(sim), _state(reference))
+    assert sim.seek(1300) == 1300
+    _assert_same(_state(sim), expected_1300)
+    assert sim.seek(0) == 0
+    np.testing.assert_array_equal(sim.wealth, WealthInequalitySimulation(n_agents=300, seed=11).wealth)
+
+
+def test_checkpoints_are_thinned_beyond_the_limit():
+    sim = WealthInequalitySimulation(n_agents=100, seed=2, checkpoint_interval=10, max_checkpoints=8)
+    sim.run(1000)
+    assert len(sim.checkpoints) <= 8
+    assert all(r % sim.checkpoint_interval == 0 for r in sim.checkpoints)
+    expected = sim.wealth.copy()
+    sim.seek(333)
+    sim.seek(1000)
+    np.testing.assert_array_equal(sim.wealth, expected)
+
+
+def test_seek_backwards_needs_checkpoints():
+    sim = WealthInequalitySimulation(n_agents=100, seed=2)
+    sim.run(100)
+    with pytest.raises(ValueError):
+        sim.seek(50)
+    assert sim.seek(150) == 150
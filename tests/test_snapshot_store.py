@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from snapshot_store import SnapshotStore, histogram_edges
+from wealth_inequality_sim import WealthInequalitySimulation
+
+
+def _wealths(seed, n=5000):
+    return np.random.default_rng(seed).lognormal(4.0, 1.0, size=n)
+
+
+def test_full_snapshots_are_exact_and_compressed():
+    store = SnapshotStore('full')
+    # Engine-like values: a shared starting wealth with a few agents moved away from it
+    snapshots = [np.full(5000, 100.0) for _ in range(3)]
+    for i, wealths in enumerate(snapshots):
+        wealths[::10] = _wealths(i, 500)
+        store.append(wealths, round_number=5 * i)
+    assert len(store) == 3 and store.rounds == [0, 5, 10]
+    for stored, original in zip(store, snapshots):
+        np.testing.assert_array_equal(stored, original)
+        assert not stored.flags.writeable
+    assert store.nbytes < sum(w.nbytes for w in snapshots) / 2
+    
+    del store[:-1]
+    np.testing.assert_array_equal(store[0], snapshots[-1])
+    restored = SnapshotStore.from_dict(store.to_dict())
+    np.testing.assert_array_equal(restored[-1], snapshots[-1])
+    assert restored.totals == pytest.approx([snapshots[-1].sum()])
+
+
+def test_summary_modes():
+    wealths = _wealths(7)
+    edges = histogram_edges(1.0, 1e4, bins=64)
+    histogram = SnapshotStore('histogram', edges=edges)
+    histogram.append(wealths)
+    assert histogram[0].sum() == len(wealths)
+    np.testing.assert_array_equal(histogram[0], np.histogram(wealths, edges)[0])
+    
+    quantiles = SnapshotStore('quantiles', quantiles=101)
+    quantiles.append(wealths)
+    np.testing.assert_allclose(quantiles[0], np.quantile(wealths, np.linspace(0, 1, 101)))
+    assert quantiles.nbytes < 101 * 8 < wealths.nbytes
+    
+    with pytest.raises(ValueError):
+        SnapshotStore('histogram')
+    with pytest.raises(ValueError):
+        SnapshotStore('sampled')
+
+
+@pytest.mark.parametrize('mode', ['full', 'histogram', 'quantiles'])
+def test_engine_snapshots_survive_a_compact_round_trip(mode):
+    sim = WealthInequalitySimulation(n_agents=400, seed=1, snapshot_mode=mode)
+    sim.run(1000)
+    history = sim.wealth_history
+    assert len(history) == len(history.rounds) > 1
+    assert history.counts[-1] == len(sim.active_ids)
+    assert history.totals[-1] == pytest.approx(sim.wealth.sum())
+    if mode == 'full':
+        np.testing.assert_array_equal(np.sort(history[-1]), np.sort(sim.wealth[sim.active_ids]))
+    
+    restored = WealthInequalitySimulation.from_dict(sim.to_dict(max_history=50, compact=True))
+    if mode == 'full':
+        # Full arrays stay out of session payloads
+        assert len(restored.wealth_history) == 0
+    else:
+        assert len(restored.wealth_history) == 50
+        np.testing.assert_array_equal(restored.wealth_history[-1], history[-1])
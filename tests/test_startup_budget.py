@@ -0,0 +1,29 @@
+from startup_budget import IMPORT_BUDGET_MS, UI_MODULES, measure_imports, third_party, violations
+
+BATCH_MODULES = [module for module in IMPORT_BUDGET_MS if module not in UI_MODULES]
+
+
+def test_batch_modules_only_load_numpy():
+    # Import times depend on the machine; the dependency rule does not
+    for module, result in measure_imports(BATCH_MODULES, repeats=1).items():
+        assert set(result['packages']) <= {'numpy'}, module
+
+
+def test_third_party_skips_stdlib_and_project_modules():
+    loaded = ['json', 'numpy', 'numpy.linalg', 'sweep', '_io', 'dash.html', 'cython_runtime']
+    assert third_party(loaded) == ['dash', 'numpy']
+
+
+def test_violations():
+    within = {'sweep': {'ms': 100.0, 'packages': ['numpy']},
+              'app_wealth_inequality': {'ms': 900.0, 'packages': ['dash', 'flask', 'plotly']}}
+    assert violations(within, worker_ms=100.0) == []
+    
+    over = {'sweep': {'ms': 900.0, 'packages': ['numpy', 'pandas']},
+            'app_wealth_inequality': {'ms': 900.0, 'packages': ['dash', 'pandas']}}
+    problems = violations(over, worker_ms=5000.0)
+    assert len(problems) == 4
+    assert any(p.startswith('import sweep: 900 ms') for p in problems)
+    assert 'import sweep loads pandas' in problems
+    assert 'import app_wealth_inequality loads pandas' in problems
+    assert any(p.startswith('worker startup') for p in problems)
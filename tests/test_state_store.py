@@ -0,0 +1,116 @@
+import json
+import pickle
+import threading
+
+import numpy as np
+import pytest
+
+from state_store import StateStore, dumps_simulation, get_store, loads_simulation, new_session_id
+from wealth_inequality_sim import WealthInequalitySimulation
+
+
+@pytest.fixture(params=['memory://', 'sqlite', 'local-redis://'])
+def store_url(request, tmp_path):
+    if request.param == 'sqlite':
+        return f"sqlite:///{tmp_path / 'sessions.db'}"
+    return request.param
+
+
+def test_saved_session_continues_the_same_trajectory(store_url):
+    store = get_store(store_url)
+    sim = WealthInequalitySimulation(n_agents=200, seed=7)
+    sim.run(500)
+    session_id = new_session_id()
+    store.save_simulation(session_id, sim)
+    
+    restored = store.load_simulation(session_id)
+    sim.run(500)
+    restored.run(500)
+    assert restored.current_round == sim.current_round
+    np.testing.assert_array_equal(restored.wealth, sim.wealth)
+    
+    assert store.keys() == [session_id]
+    store.delete(session_id)
+    assert store.load_simulation(session_id) is None
+    assert store.keys() == []
+
+
+def test_expired_sessions_are_not_listed(store_url):
+    store = get_store(store_url, ttl=-1.0)
+    store.save('old', b'payload')
+    assert store.keys() == []
+
+
+def test_lock_serializes_workers(store_url):
+    store = get_store(store_url)
+    with store.lock('s1'):
+        with pytest.raises(TimeoutError):
+            with store.lock('s1', timeout=0.05):
+                pass
+        # Other sessions are independent
+        with store.lock('s2', timeout=0.05):
+            pass
+    with store.lock('s1', timeout=0.05):
+        pass
+
+
+def test_lock_guards_read_modify_write(store_url):
+    store = get_store(store_url)
+    store.save('counter', b'0')
+    
+    def increment():
+        for _ in range(20):
+            with store.lock('counter'):
+                store.save('counter', str(int(store.load('counter')) + 1).encode())
+    
+    threads = [threading.Thread(target=increment) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.load('counter') == b'80'
+
+
+def test_namespaces_are_separate(tmp_path):
+    url = f"sqlite:///{tmp_path / 'shared.db'}"
+    sessions = get_store(url)
+    sweeps = get_store(url, namespace='sweeps')
+    sessions.save('a', b'1')
+    sweeps.save('b', b'2')
+    assert sessions.keys() == ['a']
+    assert sweeps.keys() == ['b']
+    with pytest.raises(ValueError):
+        get_store('ftp://nowhere')
+
+
+def test_payload_is_data_only():
+    sim = WealthInequalitySimulation(n_agents=60, seed=5, stats_interval=10, checkpoint_interval=100,
+                                     snapshot_mode='histogram')
+    sim.run(800)
+    data = dumps_simulation(sim, max_history=None)
+    json.loads(data)
+    restored = loads_simulation(data)
+    assert sorted(restored.checkpoints) == sorted(sim.checkpoints)
+    assert restored.gini_history == sim.gini_history
+    assert restored.active_count_history == sim.active_count_history
+    sim.run(700)
+    restored.run(700)
+    np.testing.assert_array_equal(restored.wealth, sim.wealth)
+
+
+class _Exploit:
+    calls = []
+    
+    def __reduce__(self):
+        return _Exploit.calls.append, ('ran',)
+
+
+def test_pickled_payloads_are_rejected():
+    with pytest.raises(ValueError):
+        loads_simulation(pickle.dumps({'n_agents': 10, 'payload': _Exploit()}))
+    assert _Exploit.calls == []
+    # Only numeric arrays, never object arrays
+    with pytest.raises(ValueError):
+        loads_simulation(b'{"__ndarray__": "|O", "shape": [1], "data": ""}')
+    with pytest.raises(TypeError):
+        StateStore()
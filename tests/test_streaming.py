@@ -0,0 +1,31 @@
+import asyncio
+import dataclasses
+
+import pytest
+
+from wealth_inequality_sim import WealthInequalitySimulation
+
+
+def _statistics(snapshot):
+    return snapshot.gini, snapshot.active_count, snapshot.top_10_percent, snapshot.top_1_percent
+
+
+@pytest.mark.parametrize('stats_interval', [1, 7])
+def test_round_zero_snapshot_of_unreset_engine(stats_interval):
+    sim = WealthInequalitySimulation(n_agents=300, seed=4, stats_interval=stats_interval)
+    snapshot = sim.snapshot()
+    assert snapshot.round == 0
+    assert _statistics(snapshot) == pytest.approx(sim.compute_statistics())
+
+
+def test_stream_yields_real_statistics_and_is_frozen():
+    async def collect():
+        sim = WealthInequalitySimulation(n_agents=300, seed=4, stop_on_convergence=False)
+        return sim, [snapshot async for snapshot in sim.stream(every=500, max_rounds=1200)]
+    
+    sim, snapshots = asyncio.run(collect())
+    assert [s.round for s in snapshots] == [0, 500, 1000, 1200]
+    assert _statistics(snapshots[0]) == pytest.approx((0.0, 300, 10.0, 1.0))
+    assert _statistics(snapshots[-1]) == pytest.approx(sim.compute_statistics())
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        snapshots[0].gini = 1.0
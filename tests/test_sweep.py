@@ -0,0 +1,113 @@
+import time
+
+import numpy as np
+import pytest
+
+from state_store import get_store
+from sweep import (PREDICTION_PREFIX, SweepCache, SweepRunner, axis_values, plan_sweep,
+                   predicted_grid, prescreen_order, run_cell)
+from wealth_inequality_sim import WealthInequalitySimulation
+
+
+def _plan(n_rounds: int = 4000) -> dict:
+    return plan_sweep({'n_agents': 50}, 'rich_bias', axis_values(0.0, 0.1, 3),
+                      'greedy_ratio', axis_values(0.2, 0.6, 2), n_rounds, replicas=1)
+
+
+def _wait(runner: SweepRunner, timeout: float = 90.0):
+    deadline = time.monotonic() + timeout
+    while runner.pending and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert runner.pending == 0
+
+
+def test_plan_marks_invalid_cells_and_shares_keys():
+    plan = plan_sweep({'n_agents': 50, 'neutral_ratio': 0.5}, 'greedy_ratio', [0.2, 0.6],
+                      'wealth_tax_rate', [0.01, 0.05], 1000, replicas=2)
+    # greedy 0.6 + neutral 0.5 > 1
+    assert [row[1] for row in plan['keys']] == [None, None]
+    assert all(config['wealth_tax_enabled'] for config in plan['configs'].values())
+    again = plan_sweep({'neutral_ratio': 0.5, 'n_agents': 50}, 'greedy_ratio', [0.2, 0.6],
+                       'wealth_tax_rate', [0.01, 0.05], 1000, replicas=2)
+    assert again['keys'] == plan['keys']
+    longer = plan_sweep({'n_agents': 50, 'neutral_ratio': 0.5}, 'greedy_ratio', [0.2, 0.6],
+                        'wealth_tax_rate', [0.01, 0.05], 2000, replicas=2)
+    assert longer['keys'][0][0] != plan['keys'][0][0]
+    assert axis_values(0.0, 1.0, 100) == axis_values(0.0, 1.0, 25)
+
+
+def test_cells_use_common_seeds():
+    config = {'n_agents': 50, 'rich_bias': 0.05}
+    result = run_cell(config, 500, replicas=3)
+    ginis = []
+    for seed in range(3):
+        sim = WealthInequalitySimulation(seed=seed, **config)
+        sim.run(500)
+        ginis.append(sim.compute_statistics()[0])
+    assert result['replicas'] == 3
+    assert result['gini'] == pytest.approx(np.mean(ginis))
+    assert result['gini_half_width'] > 0
+
+
+@pytest.fixture
+def runner():
+    runner = SweepRunner(SweepCache(get_store('memory://')), max_workers=2)
+    yield runner
+    runner.shutdown()
+
+
+@pytest.mark.parametrize('prescreen', [False, True])
+def test_submit_returns_at_once_and_fills_the_cache(runner, prescreen):
+    plan = _plan()
+    start = time.perf_counter()
+    queued = runner.submit(plan, prescreen=prescreen)
+    # Not even the pool has started: everything runs in the background
+    assert time.perf_counter() - start < 0.1
+    assert queued == runner.pending == 6
+    # Queued or reserved cells are not queued twice
+    assert runner.submit(plan, prescreen=prescreen) == 0
+    
+    _wait(runner)
+    values, done, total = runner.cache.grid(plan['keys'])
+    assert done == total == 6 and not runner.failed
+    assert np.all((values['gini'] > 0) & (values['gini'] < 1))
+    predicted, predicted_done, _ = runner.cache.grid(plan['keys'], PREDICTION_PREFIX)
+    assert predicted_done == (6 if prescreen else 0)
+    # Cells keep their inputs, for the emulator
+    cell = runner.cache.get(plan['keys'][0][0])
+    assert cell['n_rounds'] == 4000 and cell['config']['n_agents'] == 50
+
+
+def test_cached_cells_are_not_queued(runner):
+    plan = _plan(2000)
+    runner.submit(plan)
+    _wait(runner)
+    assert runner.submit(plan, prescreen=True) == 0
+    _wait(runner)
+
+
+def test_prescreen_order_puts_steep_cells_first():
+    plan = {'keys': [['a', 'b', 'c'], ['d', None, 'f']]}
+    predicted = {'gini': np.array([[0.1, 0.1, 0.5], [0.1, np.nan, 0.5]])}
+    order = prescreen_order(plan, predicted)
+    assert sorted(order) == ['a', 'b', 'c', 'd', 'f']
+    # b and c straddle the jump; f only borders c (equal) and an invalid cell
+    assert set(order[:2]) == {'b', 'c'}
+
+
+def test_predicted_grid_is_cached(runner):
+    plan = _plan()
+    first = predicted_grid(plan, runner.cache)
+    assert all(runner.cache.get(PREDICTION_PREFIX + key) is not None for key in plan['configs'])
+    assert np.array_equal(predicted_grid(plan, runner.cache)['gini'], first['gini'])
+
+
+def test_precision_cells_run_in_waves(runner):
+    plan = plan_sweep({'n_agents': 50}, 'rich_bias', [0.0, 0.1], 'greedy_ratio', [0.3], 1500,
+                      replicas=4, precision=0.005, max_replicas=32)
+    runner.submit(plan)
+    _wait(runner)
+    for key in plan['configs']:
+        cell = runner.cache.get(key)
+        assert cell['replicas'] > 4
+        assert cell['gini_half_width'] <= 0.005 or cell['replicas'] == 32
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from trade_log import EVENT_DTYPE, TradeLog, read_events
+from wealth_inequality_sim import WealthInequalitySimulation
+
+
+def _logged_run(log, n_rounds=8000, **kwargs):
+    sim = WealthInequalitySimulation(n_agents=100, seed=5, **kwargs)
+    initial = sim.wealth.copy()
+    sim.event_log = log
+    sim.run(n_rounds)
+    return sim, initial
+
+
+def test_net_flows_match_the_engine_wealth(tmp_path):
+    spill = str(tmp_path / 'events.bin')
+    # A ring far smaller than the run: most events go through the spill file
+    with TradeLog(capacity=1000, spill=spill, block=256) as log:
+        sim, initial = _logged_run(log)
+        events = log.events()
+        assert log.total == len(events) == sim.current_round
+        np.testing.assert_array_equal(events.rounds, np.arange(1, sim.current_round + 1))
+        
+        flows = events.net_flows(sim.n_agents)
+        active = sim.active
+        assert 0 < active.sum() < sim.n_agents
+        np.testing.assert_allclose(sim.wealth[active], initial[active] + flows[active], atol=1e-9)
+        # Bankrupt agents forfeit what they had left below the minimum
+        residual = initial[~active] + flows[~active]
+        assert np.all((residual >= 0) & (residual < sim.min_wealth))
+        
+        rounds, agents = events.bankruptcies()
+        assert sorted(agents.tolist()) == np.flatnonzero(~active).tolist()
+        assert np.all(np.diff(rounds) >= 0)
+        assert events.trade_counts(sim.n_agents).sum() == 2 * len(events)
+    
+    assert len(read_events(spill)) == sim.current_round
+    assert read_events(spill).records.dtype.itemsize == EVENT_DTYPE.itemsize == 32
+
+
+def test_ring_keeps_the_newest_events():
+    log = TradeLog(capacity=500, block=64)
+    sim, _ = _logged_run(log, n_rounds=2000)
+    recent = log.recent()
+    assert len(recent) == 500
+    np.testing.assert_array_equal(recent.rounds, np.arange(1501, 2001))
+    assert log.dropped == 1500
+    window = recent.between(1600, 1609)
+    assert window.rounds.tolist() == list(range(1600, 1610))
+
+
+def test_rich_bias_shows_in_the_log():
+    log = TradeLog()
+    _logged_run(log, n_rounds=20000, rich_bias=0.1)
+    events = log.events()
+    # Equal wealths are rare after the first rounds; the richer agent wins ~60%
+    assert events.rich_won.mean() == pytest.approx(0.6, abs=0.02)
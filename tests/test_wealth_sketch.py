@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from wealth_inequality_sim import WealthInequalitySimulation
+from wealth_sketch import WealthSketch, merge_sketches
+
+SAMPLES = {
+    'lognormal': np.random.default_rng(0).lognormal(2.0, 1.5, size=20000),
+    'pareto': np.random.default_rng(1).pareto(1.5, size=20000) + 1.0,
+    'with-zeros': np.concatenate([np.zeros(500), np.random.default_rng(2).exponential(10.0, size=5000)]),
+}
+
+
+@pytest.mark.parametrize('name', list(SAMPLES))
+def test_bounds_contain_the_exact_statistics(name):
+    values = SAMPLES[name]
+    sketch = WealthSketch.from_values(values, relative_accuracy=0.01)
+    gini, _, top_10, top_1 = WealthInequalitySimulation(n_agents=2).compute_statistics(values)
+    
+    estimate, lower, upper = sketch.gini_bounds()
+    assert lower <= gini <= upper
+    assert abs(estimate - gini) < 0.002
+    for fraction, exact in ((0.1, top_10), (0.01, top_1)):
+        estimate, lower, upper = sketch.top_share_bounds(fraction)
+        assert lower <= exact <= upper
+    median = np.sort(values)[int(0.5 * (len(values) - 1))]
+    assert sketch.quantile(0.5) == pytest.approx(median, rel=0.01)
+
+
+def test_merge_equals_the_sketch_of_pooled_values():
+    values = SAMPLES['lognormal']
+    merged = merge_sketches([WealthSketch.from_values(part) for part in np.array_split(values, 4)])
+    pooled = WealthSketch.from_values(values)
+    assert merged.count == pooled.count
+    for left, right in zip(merged.buckets(), pooled.buckets()):
+        np.testing.assert_allclose(left, right)
+    with pytest.raises(ValueError):
+        merged.merge(WealthSketch(relative_accuracy=0.02))
+
+
+def test_deletes_undo_inserts():
+    values = SAMPLES['pareto'][:1000]
+    sketch = WealthSketch.from_values(values)
+    sketch.move_many(values[:500], values[:500] * 3.0)
+    sketch.delete_many(values[:500] * 3.0)
+    sketch.delete_many(values[500:])
+    assert sketch.count == 0 and sketch.n_buckets == 0
+
+
+def test_engine_sketch_follows_the_live_population():
+    sim = WealthInequalitySimulation(n_agents=500, seed=3, stats_mode='sketch', ubi_enabled=True,
+                                     wealth_tax_enabled=True, wealth_tax_interval=10,
+                                     safety_net_enabled=True)
+    for _ in range(4):
+        sim.run(1500)
+        active = sim.wealth[sim.active_ids]
+        assert sim.sketch.count == len(active)
+        rebuilt = WealthSketch.from_values(active, sim.sketch_accuracy)
+        np.testing.assert_array_equal(sim.sketch.buckets()[1], rebuilt.buckets()[1])
+        gini = sim.compute_statistics()[0]
+        assert sim.sketch.statistics()[0] == pytest.approx(gini, abs=0.005)
@@ -0,0 +1,219 @@
+"""Binary trade event log: who traded, the stake, who won, bankruptcies
+
+Attach a `TradeLog` to a simulation (`sim.event_log = TradeLog()`) and
+every exchange is recorded as one fixed-width record of EVENT_DTYPE
+(32 bytes): round, agent_a, agent_b, stake, winner (0 = agent_a, 1 =
+agent_b) and flags (EVENT_BANKRUPT: the loser went bankrupt; EVENT_RICH_WON:
+the richer agent won). Rounds are numbered like the histories: the first
+round's trade is round 1.
+
+Records go to a preallocated ring buffer of `capacity` events, so memory
+is fixed and the newest events are always at hand. With `spill` set,
+events about to be overwritten are first appended to that file (raw
+records, no header), so file + ring hold the whole run; `read_events`
+maps the file back with np.memmap. Each trade only appends four numbers
+to a staging list (rounds are implicit while they are consecutive); each
+staged block is converted and copied into the ring with a handful of
+vectorized assignments.
+
+`TradeEvents` wraps a record array for vectorized analysis (winners,
+bankruptcies, per-agent trade counts and net flows, round ranges).
+"""
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+EVENT_DTYPE = np.dtype({
+    'names': ['round', 'agent_a', 'agent_b', 'stake', 'winner', 'flags'],
+    'formats': ['<i8', '<i4', '<i4', '<f8', 'u1', 'u1'],
+    'offsets': [0, 8, 12, 16, 24, 25],
+    'itemsize': 32,  # Padded so records stay 8-byte aligned
+})
+EVENT_BANKRUPT = 1  # The loser fell below min_wealth on this trade
+EVENT_RICH_WON = 2  # The richer of the two won
+
+
+def _join(parts: List[np.ndarray]) -> np.ndarray:
+    # np.concatenate would promote EVENT_DTYPE to a packed (26-byte) dtype
+    out = np.empty(sum(len(part) for part in parts), dtype=EVENT_DTYPE)
+    np.concatenate(parts, out=out)
+    return out
+
+
+class TradeEvents:
+    """Vectorized views over a record array of EVENT_DTYPE (in round order)"""
+    
+    def __init__(self, records: np.ndarray):
+        self.records = records
+    
+    def __len__(self) -> int:
+        return len(self.records)
+    
+    @property
+    def rounds(self) -> np.ndarray:
+        return self.records['round']
+    
+    @property
+    def stakes(self) -> np.ndarray:
+        return self.records['stake']
+    
+    @property
+    def winners(self) -> np.ndarray:
+        r = self.records
+        return np.where(r['winner'] == 0, r['agent_a'], r['agent_b'])
+    
+    @property
+    def losers(self) -> np.ndarray:
+        r = self.records
+        return np.where(r['winner'] == 0, r['agent_b'], r['agent_a'])
+    
+    @property
+    def bankrupt(self) -> np.ndarray:
+        return (self.records['flags'] & EVENT_BANKRUPT) != 0
+    
+    @property
+    def rich_won(self) -> np.ndarray:
+        return (self.records['flags'] & EVENT_RICH_WON) != 0
+    
+    def bankruptcies(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Round and agent id of every bankruptcy"""
+        mask = self.bankrupt
+        return self.rounds[mask], self.losers[mask]
+    
+    def between(self, first_round: int, last_round: int) -> 'TradeEvents':
+        """Events of rounds first_round..last_round (inclusive)"""
+        rounds = self.rounds
+        lo, hi = np.searchsorted(rounds, [first_round, last_round + 1])
+        return TradeEvents(self.records[lo:hi])
+    
+    def trade_counts(self, n_agents: int) -> np.ndarray:
+        """Trades each agent took part in"""
+        r = self.records
+        return (np.bincount(r['agent_a'], minlength=n_agents)
+                + np.bincount(r['agent_b'], minlength=n_agents))
+    
+    def net_flows(self, n_agents: int) -> np.ndarray:
+        """Stakes won minus stakes lost, per agent"""
+        stakes = self.stakes
+        return (np.bincount(self.winners, weights=stakes, minlength=n_agents)
+                - np.bincount(self.losers, weights=stakes, minlength=n_agents))
+
+
+class TradeLog:
+    """Fixed-size ring buffer of trade events, optionally spilling to a file
+    
+    `capacity` events stay in memory (32 bytes each); `block` events are
+    staged before each copy into the ring. Without a spill file, `dropped`
+    counts the events overwritten so far.
+    """
+    
+    def __init__(self, capacity: int = 1 << 20, spill: Optional[str] = None, block: int = 4096):
+        self.capacity = max(1, int(capacity))
+        self.block = max(1, min(int(block), self.capacity))
+        self.ring = np.zeros(self.capacity, dtype=EVENT_DTYPE)
+        self.count = 0  # Events copied into the ring so far
+        self.oldest = 0  # Events before this one were spilled (or dropped)
+        self.dropped = 0
+        self.spill_path = spill
+        self._spill_file = open(spill, 'wb') if spill is not None else None
+        # Staged events: flat (agent_a, agent_b, stake, outcome) for consecutive
+        # rounds from _first_round on; outcome = winner + 2 * flags
+        self._staged: List[float] = []
+        self._first_round = 0
+        self._next_round = 0
+        self._stage_limit = 4 * self.block
+    
+    def record(self, round_number: int, agent_a: int, agent_b: int, stake: float, outcome: int):
+        """Called by the engine once per exchange (outcome = winner + 2 * flags)"""
+        if round_number != self._next_round:
+            # Not the next round (first event, or after a seek): start a new block
+            self.flush()
+            self._first_round = round_number
+        self._next_round = round_number + 1
+        staged = self._staged
+        staged += (agent_a, agent_b, stake, outcome)
+        if len(staged) >= self._stage_limit:
+            self.flush()
+    
+    def flush(self):
+        """Copy the staged events into the ring (spilling what they overwrite)"""
+        if not self._staged:
+            return
+        # One float64 conversion, then a cast per field (ids are exact below 2^53)
+        rows = np.array(self._staged, dtype=np.float64).reshape(-1, 4)
+        self._staged = []
+        block = np.zeros(len(rows), dtype=EVENT_DTYPE)  # Zeroed padding keeps files deterministic
+        block['round'] = np.arange(self._first_round, self._first_round + len(rows))
+        block['agent_a'] = rows[:, 0]
+        block['agent_b'] = rows[:, 1]
+        block['stake'] = rows[:, 2]
+        outcome = rows[:, 3].astype(np.uint8)
+        block['winner'] = outcome & 1
+        block['flags'] = outcome >> 1
+        self._first_round += len(rows)
+        n = len(block)
+        # Events that have to leave the ring to make room
+        evicted = self.count + n - self.oldest - self.capacity
+        if evicted > 0:
+            if self._spill_file is not None:
+                self._spill_file.write(self._ordered(self.oldest, self.oldest + evicted).tobytes())
+            else:
+                self.dropped += evicted
+            self.oldest += evicted
+        start = self.count % self.capacity
+        first = min(n, self.capacity - start)
+        self.ring[start:start + first] = block[:first]
+        self.ring[:n - first] = block[first:]
+        self.count += n
+    
+    def _ordered(self, first: int, last: int) -> np.ndarray:
+        """Events first..last-1 (absolute indices, still in the ring) in order"""
+        if first >= last:
+            return self.ring[:0]
+        start, stop = first % self.capacity, last % self.capacity or self.capacity
+        if start < stop:
+            return self.ring[start:stop]
+        return _join([self.ring[start:], self.ring[:stop]])
+    
+    @property
+    def total(self) -> int:
+        """Events recorded (including staged, spilled and dropped ones)"""
+        return self.count + len(self._staged) // 4
+    
+    def recent(self) -> TradeEvents:
+        """The last `capacity` (or fewer) events, oldest first"""
+        self.flush()
+        return TradeEvents(self._ordered(max(0, self.count - self.capacity), self.count).copy())
+    
+    def events(self) -> TradeEvents:
+        """Every event still available: the spill file, then the ring"""
+        self.flush()
+        in_ring = self._ordered(self.oldest, self.count)
+        if self.spill_path is None or self.oldest == 0:
+            return TradeEvents(in_ring.copy())
+        if self._spill_file is not None:
+            self._spill_file.flush()
+        return TradeEvents(_join([read_events(self.spill_path).records[:self.oldest], in_ring]))
+    
+    def close(self):
+        """Spill everything left, so the file holds the whole log"""
+        self.flush()
+        if self._spill_file is not None:
+            self._spill_file.write(self._ordered(self.oldest, self.count).tobytes())
+            self.oldest = self.count
+            self._spill_file.close()
+            self._spill_file = None
+    
+    def __enter__(self) -> 'TradeLog':
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_events(path: str) -> TradeEvents:
+    """Memory-map a spill file (read-only) as TradeEvents"""
+    if os.path.getsize(path) == 0:
+        return TradeEvents(np.zeros(0, dtype=EVENT_DTYPE))
+    return TradeEvents(np.memmap(path, dtype=EVENT_DTYPE, mode='r'))
@@ -1,13 +1,35 @@
+import json
+import time
 import numpy as np
 from dataclasses import dataclass
-from typing import Literal, List, Tuple
+from types import MappingProxyType
+from typing import AsyncIterator, Callable, Dict, Literal, List, Mapping, Sequence, Tuple, Optional, Union
 from enum import Enum
+from array_codec import decode_array, encode_array, is_encoded
+from convergence import ConvergenceDetector
+from inequality_metrics import InequalityMetrics
+from memory_budget import PRECISIONS, TRIM_SLACK, KahanSum, estimate_memory, index_dtype, plan_memory
+from network_topology import Topology, build_topology
+from progressive_tax import RunningQuantile, progressive_tax_amounts
+from snapshot_store import SnapshotStore, histogram_edges
+from wealth_sketch import WealthSketch
 
 class AgentStyle(Enum):
     GREEDY = "greedy"
     NEUTRAL = "neutral"
     CONTRARIAN = "contrarian"
 
+# Style codes used by the array-backed engine (index into this list)
+STYLES: List[AgentStyle] = list(AgentStyle)
+
+# Percentage of wealth each style is willing to stake
+RISK_PERCENTAGE = {
+    AgentStyle.GREEDY: 0.30,  # 30% stake
+    AgentStyle.NEUTRAL: 0.20,  # 20% stake
+    AgentStyle.CONTRARIAN: 0.10,  # 10% stake
+}
+STAKE_FRACTIONS = np.array([RISK_PERCENTAGE[style] for style in STYLES])
+
 @dataclass
 class Agent:
     """Individual agent in wealth exchange model"""
@@ -18,16 +40,33 @@ class Agent:
     
     def get_risk_percentage(self) -> float:
         """Get percentage of wealth agent is willing to stake based on style"""
-        if self.style == AgentStyle.GREEDY:
-            return 0.30  # 30% stake
-        elif self.style == AgentStyle.NEUTRAL:
-            return 0.20  # 20% stake
-        else:  # CONTRARIAN
-            return 0.10  # 10% stake
+        return RISK_PERCENTAGE[self.style]
+
+
+@dataclass(frozen=True)
+class StatsSnapshot:
+    """Immutable summary of a simulation at one round (what `stream` yields)"""
+    round: int
+    gini: float
+    active_count: int
+    top_10_percent: float
+    top_1_percent: float
+    bankrupt_count: int
+    total_taxes_collected: float
+    total_ubi_distributed: float
+    safety_net_interventions: int
+    converged_at_round: Optional[int] = None
+    convergence_reason: Optional[str] = None
+    wealth: Optional[np.ndarray] = None  # Read-only active wealths, if requested
+    metrics: Optional[Mapping[str, object]] = None  # Extended metrics, if configured
 
 
 class WealthInequalitySimulation:
-    """Wealth inequality emergence simulation - yard-sale model"""
+    """Wealth inequality emergence simulation - yard-sale model
+    
+    Agent state lives in flat NumPy arrays (wealth, active, style code) so the
+    engine scales to very large populations; `agents` gives an `Agent` view.
+    """
     
     def __init__(
         self,
@@ -40,11 +79,45 @@ class WealthInequalitySimulation:
         # Redistribution policies
         wealth_tax_enabled: bool = False,
         wealth_tax_threshold: float = 0.10,  # Tax top 10%
-        wealth_tax_rate: float = 0.02,  # 2% tax per round
+        wealth_tax_rate: float = 0.02,  # 2% tax per round (progressive: rate at the median)
+        wealth_tax_mode: Literal['flat', 'progressive'] = 'flat',
+        wealth_tax_exponent: float = 1.0,  # Progressivity gamma in r(w) = r0 * (w / w_median)^gamma
+        wealth_tax_max_rate: float = 0.5,  # Cap on progressive per-agent rates
+        wealth_tax_interval: int = 1,  # Apply the tax every k rounds
         ubi_enabled: bool = False,
         ubi_amount: float = 1.0,  # Fixed amount per agent per round
         safety_net_enabled: bool = False,
         safety_net_floor: float = 10.0,  # Minimum wealth floor
+        # Early stopping
+        convergence: Optional[ConvergenceDetector] = None,
+        stop_on_convergence: bool = True,
+        # Trading network (None = everyone can trade with everyone)
+        topology: Optional[Union[str, Topology]] = None,
+        topology_params: Optional[dict] = None,
+        # Random seed (None = different results each run)
+        seed: Optional[int] = None,
+        # Statistics: record every k rounds, optionally without keeping histories
+        stats_interval: int = 1,
+        keep_history: bool = True,
+        # Replay checkpoints every k rounds (None = off), thinned beyond max_checkpoints
+        checkpoint_interval: Optional[int] = None,
+        max_checkpoints: Optional[int] = None,
+        # Memory: wealth precision, retention limits, or a budget that sets them
+        precision: Literal['float64', 'float32'] = 'float64',
+        memory_budget: Optional[Union[int, str]] = None,
+        history_limit: Optional[int] = None,
+        snapshot_limit: Optional[int] = None,
+        # Wealth snapshots: exact arrays or fixed-bin / quantile summaries, compressed
+        snapshot_mode: Literal['full', 'histogram', 'quantiles'] = 'full',
+        snapshot_bins: int = 256,
+        snapshot_quantiles: int = 1000,
+        # Extra inequality metrics per snapshot (names from inequality_metrics.METRICS)
+        metrics: Optional[Union[Sequence[str], InequalityMetrics]] = None,
+        metrics_params: Optional[dict] = None,
+        # Approximate statistics from a maintained sketch, sorting only every exact_stats_interval rounds
+        stats_mode: Literal['exact', 'sketch'] = 'exact',
+        sketch_accuracy: float = 0.01,
+        exact_stats_interval: Optional[int] = None,
         # For deserialization
         _skip_init: bool = False
     ):
@@ -60,146 +133,476 @@ class WealthInequalitySimulation:
         self.wealth_tax_enabled = wealth_tax_enabled
         self.wealth_tax_threshold = wealth_tax_threshold
         self.wealth_tax_rate = wealth_tax_rate
+        self.wealth_tax_mode = wealth_tax_mode
+        self.wealth_tax_exponent = wealth_tax_exponent
+        self.wealth_tax_max_rate = wealth_tax_max_rate
+        self.wealth_tax_interval = max(1, int(wealth_tax_interval))
         self.ubi_enabled = ubi_enabled
         self.ubi_amount = ubi_amount
         self.safety_net_enabled = safety_net_enabled
         self.safety_net_floor = safety_net_floor
         
+        # Maintained median estimate for the progressive tax
+        self.median_tracker = RunningQuantile(q=0.5)
+        
+        # Convergence detection
+        self.convergence = convergence if convergence is not None else ConvergenceDetector()
+        self.stop_on_convergence = stop_on_convergence
+        self.converged_at_round: Optional[int] = None
+        self.convergence_reason: Optional[str] = None
+        
+        # Trading network
+        if isinstance(topology, str):
+            topology = build_topology(topology, n_agents, **(topology_params or {}))
+        if topology is not None and topology.n_nodes != n_agents:
+            raise ValueError(f"Topology has {topology.n_nodes} nodes but n_agents is {n_agents}")
+        self.topology: Optional[Topology] = topology
+        
+        # Random number generator (owned by this simulation)
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}' (expected float64 or float32)")
+        self.precision = precision
+        
         # Initialize
-        self.agents: List[Agent] = []
-        self.wealth_history: List[List[float]] = []
+        self._allocate_state()
+        self.snapshot_mode = snapshot_mode
+        self.snapshot_bins = snapshot_bins
+        self.snapshot_quantiles = snapshot_quantiles
+        edges = histogram_edges(min_wealth, n_agents * initial_wealth, snapshot_bins) \
+            if snapshot_mode == 'histogram' else None
+        self.wealth_history = SnapshotStore(snapshot_mode, edges, snapshot_quantiles)
         self.gini_history: List[float] = []
         self.active_count_history: List[int] = []
         self.top_10_percent_history: List[float] = []
         self.top_1_percent_history: List[float] = []
         self.current_round = 0
         
-        # Redistribution tracking
-        self.total_taxes_collected: float = 0.0
-        self.total_ubi_distributed: float = 0.0
+        # Redistribution tracking (compensated sums, see the properties below)
+        self.total_taxes_collected = 0.0
+        self.total_ubi_distributed = 0.0
+        self.total_safety_net_paid = 0.0
         self.safety_net_interventions: int = 0
         
-        # Stats recording interval
+        # Stats recording interval (histories) and snapshot interval (wealth_history)
+        self.stats_interval = max(1, int(stats_interval))
+        self.keep_history = keep_history
+        self.last_statistics: Tuple[float, int, float, float] = (0.0, n_agents, 0.0, 0.0)
         self.stats_record_interval = 5
+        # Called with the simulation after every recorded round (e.g. export.RunExporter)
+        self.listeners: List[Callable[['WealthInequalitySimulation'], None]] = []
+        # Receives every exchange, if attached (see trade_log.TradeLog)
+        self.event_log = None
+        
+        # Checkpoints (agent arrays + RNG state) for seek(), keyed by round
+        self.checkpoint_interval = int(checkpoint_interval) if checkpoint_interval else None
+        self.max_checkpoints = max_checkpoints
+        self.checkpoints: Dict[int, dict] = {}
+        self.furthest_round = 0  # Latest round ever reached (seek can go back from it)
+        
+        # Extended metrics reuse the statistics sort (see inequality_metrics)
+        if metrics is not None and not isinstance(metrics, InequalityMetrics):
+            metrics = InequalityMetrics(metrics, **(metrics_params or {}))
+        self.metrics: Optional[InequalityMetrics] = metrics
+        self.last_metrics: Dict[str, Union[float, np.ndarray]] = {}
+        self.metrics_history: Dict[str, List[float]] = {
+            key: [] for key in (metrics.scalar_keys if metrics is not None else ())}
+        
+        # Sketch mode: trades and policies update a WealthSketch and the recorded
+        # statistics are its estimates; an exact sort resyncs it at coarse intervals
+        if stats_mode not in ('exact', 'sketch'):
+            raise ValueError(f"Unknown stats_mode '{stats_mode}' (expected exact or sketch)")
+        if stats_mode == 'sketch' and metrics is not None:
+            raise ValueError("Extended metrics need stats_mode='exact'")
+        self.stats_mode = stats_mode
+        self.sketch_accuracy = sketch_accuracy
+        interval = exact_stats_interval or self.checkpoint_interval or max(self.stats_interval, n_agents)
+        # Rounded up to a recorded round
+        self.exact_stats_interval = -(-int(interval) // self.stats_interval) * self.stats_interval
+        self.sketch: Optional[WealthSketch] = None
+        
+        # History retention (None = keep everything, snapshot_limit=0 = no snapshots)
+        self.history_limit = history_limit
+        self.snapshot_limit = snapshot_limit
+        self.memory_budget = memory_budget
+        if memory_budget is not None:
+            plan = plan_memory(n_agents, memory_budget, precision, self.stats_interval,
+                               self.checkpoint_interval, topology.n_edges if topology is not None else 0,
+                               metric_series=len(self.metrics_history),
+                               snapshot_bytes=self._snapshot_bytes())
+            self.stats_record_interval = plan['snapshot_interval']
+            self.history_limit = plan['history_limit']
+            self.snapshot_limit = plan['snapshot_limit']
+            self.max_checkpoints = plan['max_checkpoints']
         
         if not _skip_init:
             self._initialize_agents()
-        
+            # Round 0 is recorded (and checkpointed) as reset() does it, so a
+            # fresh engine never reports the placeholder statistics above and
+            # seek() can always go back to the start
+            self._record_statistics()
+            self._save_checkpoint()
+    
+    def _allocate_state(self):
+        """Allocate the per-agent arrays"""
+        n = self.n_agents
+        dtype = PRECISIONS[self.precision]
+        self.wealth = np.zeros(n, dtype=dtype)
+        self.active = np.zeros(n, dtype=bool)
+        self.styles = np.zeros(n, dtype=np.int8)
+        self._stake_fraction = np.zeros(n, dtype=dtype)
+        # Dense list of active agent ids (first _n_active entries) and each
+        # agent's position in it, for O(1) sampling and O(1) removal
+        self._index_dtype = index_dtype(n)
+        self._active_ids = np.arange(n, dtype=self._index_dtype)
+        self._active_pos = np.arange(n, dtype=self._index_dtype)
+        self._n_active = 0
+        # Per-style agent counts, active counts and active wealth, kept up to
+        # date by every trade / policy / bankruptcy (see style_aggregates)
+        self._style_totals = [0] * len(STYLES)
+        self._style_active = [0] * len(STYLES)
+        self._style_wealth = [0.0] * len(STYLES)
+    
     def _initialize_agents(self):
         """Create initial agent population - everyone starts equal"""
-        for agent_id in range(self.n_agents):
-            style = self._random_style()
-            self.agents.append(Agent(
-                id=agent_id,
-                style=style,
-                wealth=self.initial_wealth,
-                active=True
-            ))
-    
-    def _random_style(self) -> AgentStyle:
-        """Randomly assign agent style based on ratios"""
-        rand = np.random.random()
-        if rand < self.greedy_ratio:
-            return AgentStyle.GREEDY
-        elif rand < self.greedy_ratio + self.neutral_ratio:
-            return AgentStyle.NEUTRAL
-        else:
-            return AgentStyle.CONTRARIAN
+        # Refill the existing arrays in place (no second copy of the state)
+        self.styles[:] = self._random_styles(self.n_agents)
+        self._stake_fraction[:] = STAKE_FRACTIONS[self.styles]
+        self.wealth[:] = self.initial_wealth
+        self.active[:] = True
+        self._active_ids[:] = np.arange(self.n_agents, dtype=self._index_dtype)
+        self._active_pos[:] = self._active_ids
+        self._n_active = self.n_agents
+        self._recount_styles()
+        self._rebuild_sketch()
+    
+    def _random_styles(self, n: int) -> np.ndarray:
+        """Randomly assign agent style codes based on ratios"""
+        rand = self.rng.random(n)
+        styles = np.full(n, STYLES.index(AgentStyle.CONTRARIAN), dtype=np.int8)
+        styles[rand < self.greedy_ratio + self.neutral_ratio] = STYLES.index(AgentStyle.NEUTRAL)
+        styles[rand < self.greedy_ratio] = STYLES.index(AgentStyle.GREEDY)
+        return styles
+    
+    def _rebuild_active_index(self):
+        """Rebuild the dense active-id list from the active mask"""
+        ids = np.flatnonzero(self.active)
+        self._n_active = len(ids)
+        inactive = np.flatnonzero(~self.active)
+        self._active_ids = np.concatenate([ids, inactive]).astype(self._index_dtype)
+        self._active_pos = np.empty(self.n_agents, dtype=self._index_dtype)
+        self._active_pos[self._active_ids] = np.arange(self.n_agents)
+    
+    def style_aggregates(self, exact: bool = False) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Agents, active agents and active wealth per style code
+        
+        Reads the incrementally maintained totals (O(#styles)); exact=True
+        recomputes them from the agent arrays with np.bincount instead, e.g.
+        to verify the running totals.
+        """
+        if not exact:
+            return (np.array(self._style_totals), np.array(self._style_active),
+                    np.array(self._style_wealth))
+        n_styles = len(STYLES)
+        totals = np.bincount(self.styles, minlength=n_styles)
+        active = np.bincount(self.styles, weights=self.active, minlength=n_styles).astype(np.int64)
+        wealth = np.bincount(self.styles, weights=np.where(self.active, self.wealth, 0.0), minlength=n_styles)
+        return totals, active, wealth
+    
+    def _recount_styles(self):
+        """Reset the running per-style totals from the agent arrays"""
+        totals, active, wealth = self.style_aggregates(exact=True)
+        self._style_totals = totals.tolist()
+        self._style_active = active.tolist()
+        self._style_wealth = wealth.tolist()
+    
+    def _add_style_wealth(self, amounts: np.ndarray, ids: Optional[np.ndarray] = None):
+        """Add per-agent wealth changes (of ids, or of every agent) to the style totals"""
+        styles = self.styles if ids is None else self.styles[ids]
+        sums = np.bincount(styles, weights=amounts, minlength=len(STYLES))
+        for code, amount in enumerate(sums.tolist()):
+            self._style_wealth[code] += amount
+    
+    def _assign_wealth(self, ids: np.ndarray, wealths: np.ndarray):
+        """Overwrite the wealth of active agents ids, keeping the style totals in step"""
+        before = self.wealth[ids]
+        self._add_style_wealth(wealths - before.astype(np.float64), ids)
+        self.wealth[ids] = wealths
+        self._sketch_moved(ids, before)
+    
+    def _rebuild_sketch(self, wealths: Optional[np.ndarray] = None):
+        """Build the statistics sketch afresh from the active wealths (sketch mode only)"""
+        if self.stats_mode != 'sketch':
+            return
+        if wealths is None:
+            wealths = self.wealth[self.active_ids]
+        self.sketch = WealthSketch.from_values(wealths, self.sketch_accuracy)
+    
+    def _sketch_moved(self, ids: np.ndarray, before: Optional[np.ndarray]):
+        """Move agents ids from their old wealths (before) to their current ones in the sketch"""
+        if self.sketch is not None:
+            self.sketch.move_many(before, self.wealth[ids])
+    
+    @property
+    def total_taxes_collected(self) -> float:
+        return self._taxes_total.value
+    
+    @total_taxes_collected.setter
+    def total_taxes_collected(self, value: float):
+        self._taxes_total = KahanSum(value)
+    
+    @property
+    def total_ubi_distributed(self) -> float:
+        return self._ubi_total.value
+    
+    @total_ubi_distributed.setter
+    def total_ubi_distributed(self, value: float):
+        self._ubi_total = KahanSum(value)
+    
+    @property
+    def total_safety_net_paid(self) -> float:
+        """Wealth added by safety-net top-ups"""
+        return self._safety_net_total.value
+    
+    @total_safety_net_paid.setter
+    def total_safety_net_paid(self, value: float):
+        self._safety_net_total = KahanSum(value)
+    
+    def memory_estimate(self, rounds: Optional[int] = None) -> dict:
+        """Estimated memory use in bytes by component (see memory_budget.estimate_memory)"""
+        return estimate_memory(
+            self.n_agents, self.precision, rounds, stats_interval=self.stats_interval,
+            snapshot_interval=self.stats_record_interval, history_limit=self.history_limit,
+            snapshot_limit=self.snapshot_limit, checkpoint_interval=self.checkpoint_interval,
+            max_checkpoints=self.max_checkpoints,
+            n_edges=self.topology.n_edges if self.topology is not None else 0,
+            keep_history=self.keep_history, metric_series=len(self.metrics_history),
+            snapshot_bytes=self._snapshot_bytes())
+    
+    def _snapshot_bytes(self) -> Optional[int]:
+        """Size of one summary snapshot (None = a full wealth array)"""
+        if self.snapshot_mode == 'full':
+            return None
+        return self.wealth_history.item_bytes(self.n_agents)
+    
+    @property
+    def active_count(self) -> int:
+        return self._n_active
+    
+    @property
+    def active_ids(self) -> np.ndarray:
+        """Ids of currently active agents (view, unordered)"""
+        return self._active_ids[:self._n_active]
+    
+    @property
+    def agents(self) -> List[Agent]:
+        """Agent objects built from the state arrays (read-only snapshot)"""
+        return [Agent(id=i, style=STYLES[s], wealth=float(w), active=bool(a))
+                for i, (s, w, a) in enumerate(zip(self.styles, self.wealth, self.active))]
     
     def reset(self):
         """Reset simulation to initial state"""
-        self.agents: List[Agent] = []
-        self.wealth_history: List[List[float]] = []
+        self.rng = np.random.default_rng(self.seed)
+        self.wealth_history.clear()
         self.gini_history: List[float] = []
         self.active_count_history: List[int] = []
         self.top_10_percent_history: List[float] = []
         self.top_1_percent_history: List[float] = []
+        self.metrics_history = {key: [] for key in self.metrics_history}
         self.current_round = 0
         
         # Redistribution tracking
         self.total_taxes_collected = 0.0
         self.total_ubi_distributed = 0.0
+        self.total_safety_net_paid = 0.0
         self.safety_net_interventions = 0
         
+        self.converged_at_round = None
+        self.convergence_reason = None
+        self.convergence.reset()
+        self.median_tracker = RunningQuantile(q=0.5)
+        
         self._initialize_agents()
         
         # Record initial state
         self._record_statistics()
+        
+        self.checkpoints = {}
+        self.furthest_round = 0
+        self._save_checkpoint()
     
-    def _check_bankruptcy(self, agent: Agent):
-        """Check if agent should be marked as bankrupt"""
-        if agent.active and agent.wealth < self.min_wealth:
-            agent.wealth = 0
-            agent.active = False
-            # Agent is now bankrupt and removed from future exchanges
+    def _check_bankruptcy(self, agent_id: int) -> bool:
+        """Check if agent should be marked as bankrupt (returns True if it just went bankrupt)"""
+        if self.active[agent_id] and self.wealth[agent_id] < self.min_wealth:
+            style = self.styles[agent_id]
+            self._style_wealth[style] -= float(self.wealth[agent_id])
+            self._style_active[style] -= 1
+            if self.sketch is not None:
+                self.sketch.delete(float(self.wealth[agent_id]))
+            self.wealth[agent_id] = 0
+            self.active[agent_id] = False
+            # Agent is now bankrupt and removed from future exchanges:
+            # swap it with the last active id
+            pos = self._active_pos[agent_id]
+            last = self._n_active - 1
+            last_id = self._active_ids[last]
+            self._active_ids[pos] = last_id
+            self._active_pos[last_id] = pos
+            self._active_ids[last] = agent_id
+            self._active_pos[agent_id] = last
+            self._n_active = last
+            return True
+        return False
     
-    def _apply_wealth_tax(self):
-        """Apply wealth tax to top X% of agents"""
+    def _apply_wealth_tax(self, round_number: Optional[int] = None):
+        """Apply wealth tax (flat on the top X%, or progressive on everyone)"""
         if not self.wealth_tax_enabled:
             return 0.0
         
-        active_agents = [a for a in self.agents if a.active]
-        if len(active_agents) == 0:
+        # Only collect every k rounds
+        if round_number is None:
+            round_number = self.current_round
+        if round_number % self.wealth_tax_interval != 0:
             return 0.0
         
-        # Sort by wealth
-        sorted_agents = sorted(active_agents, key=lambda a: a.wealth, reverse=True)
+        ids = self.active_ids
+        if len(ids) == 0:
+            return 0.0
+        
+        if self.wealth_tax_mode == 'progressive':
+            return self._apply_progressive_tax(ids)
         
         # Determine how many agents to tax
-        n_to_tax = max(1, int(len(sorted_agents) * self.wealth_tax_threshold))
-        agents_to_tax = sorted_agents[:n_to_tax]
+        n_to_tax = max(1, int(len(ids) * self.wealth_tax_threshold))
+        
+        # Select the richest without a full sort
+        wealths = self.wealth[ids]
+        if n_to_tax < len(ids):
+            top = np.argpartition(wealths, len(ids) - n_to_tax)[len(ids) - n_to_tax:]
+        else:
+            top = np.arange(len(ids))
+        ids_to_tax = ids[top]
         
         # Collect taxes
-        total_collected = 0.0
-        for agent in agents_to_tax:
-            tax_amount = agent.wealth * self.wealth_tax_rate
-            agent.wealth -= tax_amount
-            total_collected += tax_amount
+        before = self.wealth[ids_to_tax]
+        tax_amounts = before * self.wealth_tax_rate
+        self.wealth[ids_to_tax] -= tax_amounts
+        self._add_style_wealth(-tax_amounts, ids_to_tax)
+        self._sketch_moved(ids_to_tax, before)
+        
+        return float(tax_amounts.sum(dtype=np.float64))
+    
+    def _apply_progressive_tax(self, ids: np.ndarray) -> float:
+        """Progressive tax r(w) = r0 * (w / w_median)^gamma as one array operation"""
+        tracker = self.median_tracker
+        if tracker.needs_refresh(self.current_round):
+            positions = tracker.sample_positions(len(ids), self.rng)
+            sample_ids = ids if positions is None else ids[positions]
+            tracker.refresh(self.wealth[sample_ids], self.current_round)
+        median = tracker.estimate
+        
+        if 2 * len(ids) >= self.n_agents:
+            # Mostly active: work on the whole array in place - bankrupt agents
+            # hold exactly 0 and pay nothing, and we skip the gather/scatter
+            before = self.wealth[ids] if self.sketch is not None else None
+            tax_amounts = progressive_tax_amounts(self.wealth, median, self.wealth_tax_rate,
+                                                  self.wealth_tax_exponent, self.wealth_tax_max_rate)
+            self.wealth -= tax_amounts
+            self._add_style_wealth(-tax_amounts)
+            self._sketch_moved(ids, before)
+        else:
+            wealths = self.wealth[ids]
+            tax_amounts = progressive_tax_amounts(wealths, median, self.wealth_tax_rate,
+                                                  self.wealth_tax_exponent, self.wealth_tax_max_rate)
+            self.wealth[ids] = wealths - tax_amounts
+            self._add_style_wealth(-tax_amounts, ids)
+            self._sketch_moved(ids, wealths)
         
-        return total_collected
+        # The agent at the median pays exactly r0
+        tracker.scale(1.0 - min(self.wealth_tax_rate, self.wealth_tax_max_rate))
+        
+        return float(tax_amounts.sum(dtype=np.float64))
     
-    def _distribute_ubi(self, tax_revenue: float = 0.0):
-        """Distribute UBI to all active agents"""
+    def _distribute_ubi(self, tax_revenue: float = 0.0, rounds: int = 1):
+        """Distribute UBI to all active agents (`rounds` rounds' worth at once)"""
         if not self.ubi_enabled:
             return 0.0
         
-        active_agents = [a for a in self.agents if a.active]
-        if len(active_agents) == 0:
+        ids = self.active_ids
+        if len(ids) == 0:
             return 0.0
         
         # Calculate UBI amount (either fixed or from tax revenue)
-        ubi_per_agent = self.ubi_amount
+        ubi_per_agent = self.ubi_amount * rounds
         
         # Optionally, can use tax revenue to fund UBI
-        # ubi_per_agent = tax_revenue / len(active_agents) if tax_revenue > 0 else self.ubi_amount
+        # ubi_per_agent = tax_revenue / len(ids) if tax_revenue > 0 else self.ubi_amount
         
-        total_distributed = 0.0
-        for agent in active_agents:
-            agent.wealth += ubi_per_agent
-            total_distributed += ubi_per_agent
+        before = self.wealth[ids] if self.sketch is not None else None
+        self.wealth[ids] += ubi_per_agent
+        self._sketch_moved(ids, before)
+        self.median_tracker.shift(ubi_per_agent)
+        for code, active in enumerate(self._style_active):
+            self._style_wealth[code] += ubi_per_agent * active
         
-        return total_distributed
+        return ubi_per_agent * len(ids)
     
     def _apply_safety_net(self):
         """Ensure no agent falls below safety net floor"""
         if not self.safety_net_enabled:
             return 0
         
-        interventions = 0
-        for agent in self.agents:
-            if agent.active and agent.wealth < self.safety_net_floor:
-                agent.wealth = self.safety_net_floor
-                interventions += 1
+        ids = self.active_ids
+        below = ids[self.wealth[ids] < self.safety_net_floor]
+        if len(below):
+            before = self.wealth[below]
+            top_ups = self.safety_net_floor - before.astype(np.float64)
+            self._add_style_wealth(top_ups, below)
+            self._safety_net_total.add(float(top_ups.sum()))
+            self.wealth[below] = self.safety_net_floor
+            self._sketch_moved(below, before)
+        self.median_tracker.floor(self.safety_net_floor)
+        
+        return len(below)
+    
+    def _apply_policies(self, first_round: int, rounds: int = 1):
+        """Tax (on its interval), UBI and the safety net of `rounds` rounds from
+        first_round on, with no trades in between (e.g. sharded.ShardedSimulation)
         
-        return interventions
+        Between two tax rounds, k rounds of "add UBI, then floor" compose to
+        UBI, floor, (k - 1) x UBI, floor, so each stretch costs a few passes.
+        """
+        round_number, end = first_round, first_round + rounds
+        while round_number < end:
+            taxes = self._apply_wealth_tax(round_number)
+            if taxes:
+                self._taxes_total.add(taxes)
+            
+            stretch = end - round_number
+            if self.wealth_tax_enabled:
+                # Up to the next tax round
+                interval = self.wealth_tax_interval
+                stretch = min(stretch, (round_number // interval + 1) * interval - round_number)
+            for count in ((1, stretch - 1) if stretch > 1 else (1,)):
+                ubi_distributed = self._distribute_ubi(taxes, count)
+                if ubi_distributed:
+                    self._ubi_total.add(ubi_distributed)
+                self.safety_net_interventions += self._apply_safety_net()
+            round_number += stretch
     
-    def _wealth_exchange(self, agent_a: Agent, agent_b: Agent):
+    def _wealth_exchange(self, agent_a: int, agent_b: int, coin: Optional[float] = None):
         """
-        Execute wealth exchange between two agents
+        Execute wealth exchange between two agents (`coin`: a given uniform for the win draw)
         """
+        wealth = self.wealth
+        wealth_a = float(wealth[agent_a])
+        wealth_b = float(wealth[agent_b])
+        
         # Get each agent's stake willingness
-        stake_a = agent_a.get_risk_percentage() * agent_a.wealth
-        stake_b = agent_b.get_risk_percentage() * agent_b.wealth
+        stake_a = self._stake_fraction[agent_a] * wealth_a
+        stake_b = self._stake_fraction[agent_b] * wealth_b
         
         # Actual stake is minimum of the two
         stake = min(stake_a, stake_b)
@@ -207,7 +610,7 @@ class WealthInequalitySimulation:
         # No minimum threshold - allow all exchanges to continue until bankruptcy
         
         # Determine who is richer
-        if agent_a.wealth > agent_b.wealth:
+        if wealth_a > wealth_b:
             rich_agent = agent_a
             poor_agent = agent_b
         else:
@@ -218,7 +621,14 @@ class WealthInequalitySimulation:
         win_prob_rich = 0.5 + self.rich_bias
         
         # Determine winner
-        if np.random.random() < win_prob_rich:
+        if coin is None:
+            rich_wins = self.rng.random() < win_prob_rich
+        else:
+            # Shared draw: couple on agent_a's identity rather than on who is
+            # richer, so variants whose rankings differ still mostly agree
+            a_wins = coin < (win_prob_rich if rich_agent == agent_a else 1.0 - win_prob_rich)
+            rich_wins = a_wins == (rich_agent == agent_a)
+        if rich_wins:
             winner = rich_agent
             loser = poor_agent
         else:
@@ -226,153 +636,527 @@ class WealthInequalitySimulation:
             loser = rich_agent
         
         # Transfer wealth
-        winner.wealth += stake
-        loser.wealth -= stake
+        wealth[winner] += stake
+        wealth[loser] -= stake
+        
+        sketch = self.sketch
+        if sketch is not None:
+            sketch.move(wealth_a, float(wealth[agent_a]))
+            sketch.move(wealth_b, float(wealth[agent_b]))
+        
+        style_winner = self.styles.item(winner)
+        style_loser = self.styles.item(loser)
+        if style_winner != style_loser:
+            # Stored change (float32 wealth rounds the stake)
+            before = wealth_a if winner == agent_a else wealth_b
+            gained = float(wealth[winner]) - before
+            self._style_wealth[style_winner] += gained
+            self._style_wealth[style_loser] -= gained
+        
+        # Traders are a random sample: nudge the running median
+        tracker = self.median_tracker
+        if tracker.estimate is not None:
+            tracker.observe(wealth_a + stake if winner == agent_a else wealth_a - stake, self._n_active)
+            tracker.observe(wealth_b + stake if winner == agent_b else wealth_b - stake, self._n_active)
         
         # Check for bankruptcy
-        self._check_bankruptcy(loser)
+        bankrupt = self._check_bankruptcy(loser)
+        
+        event_log = self.event_log
+        if event_log is not None:
+            # Outcome: winner (0 = a, 1 = b) + 2 * flags (1 = loser bankrupt, 2 = rich won)
+            event_log.record(self.current_round + 1, agent_a, agent_b, stake,
+                             (winner == agent_b) + 2 * bankrupt + 4 * rich_wins)
     
-    def _calculate_gini(self, wealths: List[float]) -> float:
-        """Calculate Gini coefficient"""
-        if len(wealths) == 0:
-            return 0.0
+    def _pick_shared(self, draws: Sequence[float], start: int, exclude: int = -1) -> Tuple[int, int]:
+        """First active agent (other than `exclude`) among the candidate ids
+        int(u * n_agents) of draws[start:], and the position after it; -1 if
+        none is. Uniform over the eligible agents, as in rejection sampling."""
+        active = self.active
+        n_agents = self.n_agents
+        for k in range(start, len(draws)):
+            agent = int(draws[k] * n_agents)
+            if agent != exclude and active[agent]:
+                return agent, k + 1
+        return -1, len(draws)
+    
+    def _select_pair(self, draws: Optional[Sequence[float]] = None) -> Tuple[int, int]:
+        """Pick two distinct active trading partners, or (-1, -1) if none can trade"""
+        n = self._n_active
+        ids = self._active_ids
+        rng = self.rng
         
-        wealths = np.array(sorted(wealths))
-        n = len(wealths)
+        if self.topology is None:
+            if draws is not None and len(draws) > 3:
+                # Shared candidate ids: variants that differ in who went
+                # bankrupt still pick the same pair whenever both are active
+                agent_a, k = self._pick_shared(draws, 3)
+                if agent_a >= 0:
+                    agent_b = self._pick_shared(draws, k, exclude=agent_a)[0]
+                    if agent_b >= 0:
+                        return agent_a, agent_b
+                    # Candidates ran out: any other active agent, uniformly
+                    j = int(draws[1] * (n - 1))
+                    if j >= self._active_pos[agent_a]:
+                        j += 1
+                    return agent_a, int(ids[j])
+            # Well-mixed population: uniform pair from the dense active list
+            i = int((rng.random() if draws is None else draws[0]) * n)
+            j = int((rng.random() if draws is None else draws[1]) * (n - 1))
+            if j >= i:
+                j += 1
+            return int(ids[i]), int(ids[j])
+        
+        if draws is not None:
+            # Shared first pick; the neighbor comes from this engine's own stream
+            agent_a = self._pick_shared(draws, 3)[0] if len(draws) > 3 else -1
+            if agent_a < 0:
+                agent_a = int(ids[int(draws[0] * n)])
+            agent_b = self.topology.sample_neighbor(agent_a, self.active, rng)
+            if agent_b >= 0:
+                return agent_a, agent_b
         
-        if wealths.sum() == 0:
+        # Networked: uniform active agent, then a uniform active neighbor
+        for _ in range(64):
+            agent_a = int(ids[int(rng.random() * n)])
+            agent_b = self.topology.sample_neighbor(agent_a, self.active, rng)
+            if agent_b >= 0:
+                return agent_a, agent_b
+        
+        # Repeatedly drew isolated agents - make sure trading is still possible
+        if not self.topology.has_active_edge(self.active):
+            return -1, -1
+        while True:
+            agent_a = int(ids[int(rng.random() * n)])
+            agent_b = self.topology.sample_neighbor(agent_a, self.active, rng)
+            if agent_b >= 0:
+                return agent_a, agent_b
+    
+    def _calculate_gini(self, wealths: np.ndarray) -> float:
+        """Calculate Gini coefficient"""
+        if len(wealths) == 0:
             return 0.0
         
-        index = np.arange(1, n + 1)
-        gini = (2 * np.sum(index * wealths)) / (n * wealths.sum()) - (n + 1) / n
-        return gini
+        return self._calculate_gini_from_sorted(np.sort(wealths)[::-1])
     
-    def _calculate_top_wealth_share(self, wealths: List[float], top_percent: float) -> float:
+    def _calculate_top_wealth_share(self, wealths: np.ndarray, top_percent: float) -> float:
         """Calculate what % of total wealth is owned by top X%"""
         if len(wealths) == 0:
             return 0.0
         
-        total_wealth = sum(wealths)
+        wealths = np.asarray(wealths, dtype=np.float64)
+        total_wealth = wealths.sum()
         if total_wealth == 0:
             return 0.0
         
-        sorted_wealths = sorted(wealths, reverse=True)
         n_top = max(1, int(len(wealths) * top_percent))
-        top_wealth = sum(sorted_wealths[:n_top])
+        top_wealth = np.partition(wealths, len(wealths) - n_top)[len(wealths) - n_top:].sum()
         
-        return (top_wealth / total_wealth) * 100
+        return float(top_wealth / total_wealth) * 100
+    
+    def compute_statistics(self, wealths: Optional[np.ndarray] = None) -> Tuple[float, int, float, float]:
+        """Current (gini, active count, top 10% share, top 1% share)"""
+        if wealths is None:
+            wealths = self.wealth[self.active_ids]
+        return self._statistics_from_sorted(np.sort(wealths))
+    
+    def _statistics_from_sorted(self, ascending: np.ndarray) -> Tuple[float, int, float, float]:
+        """compute_statistics on an already sorted (ascending) wealth array"""
+        if len(ascending) == 0:
+            return 0.0, 0, 0.0, 0.0
+        
+        # Only sort once and reuse (descending)
+        sorted_wealths = ascending[::-1]
+        
+        # Gini calculation
+        gini = self._calculate_gini_from_sorted(sorted_wealths)
+        
+        # Top wealth shares (reuse sorted array)
+        total_wealth = sorted_wealths.sum(dtype=np.float64)
+        if total_wealth > 0:
+            n_top_10 = max(1, int(len(sorted_wealths) * 0.10))
+            top_10 = float(sorted_wealths[:n_top_10].sum(dtype=np.float64) / total_wealth) * 100
+            
+            n_top_1 = max(1, int(len(sorted_wealths) * 0.01))
+            top_1 = float(sorted_wealths[:n_top_1].sum(dtype=np.float64) / total_wealth) * 100
+        else:
+            top_10 = 0.0
+            top_1 = 0.0
+        
+        return gini, len(sorted_wealths), top_10, top_1
+    
+    def _refresh_statistics(self, wealths: Optional[np.ndarray] = None):
+        """Recompute last_statistics and last_metrics from one sort"""
+        if wealths is None:
+            wealths = self.wealth[self.active_ids]
+        ascending = np.sort(wealths)
+        self.last_statistics = self._statistics_from_sorted(ascending)
+        if self.metrics is not None:
+            self.last_metrics = self.metrics.compute(ascending)
     
     def _record_statistics(self):
         """Record current statistics - optimized for performance"""
-        active_agents = [a for a in self.agents if a.active]
-        wealths = [a.wealth for a in active_agents]
+        # Sketch mode reads the maintained sketch and only sorts at exact rounds
+        exact = self.sketch is None or self.current_round % self.exact_stats_interval == 0
+        take_snapshot = (self.keep_history and self.snapshot_limit != 0
+                         and self.current_round % self.stats_record_interval == 0)
+        wealths = self.wealth[self.active_ids] if exact or take_snapshot else None
         
         # Don't store full wealth history every round (too expensive)
         # Only store every 5th round for history, but always calculate current metrics
-        if self.current_round % 5 == 0:
-            self.wealth_history.append(wealths.copy())
+        if take_snapshot:
+            self.wealth_history.append(wealths, self.current_round)
+            if self.snapshot_limit and len(self.wealth_history) > self.snapshot_limit * TRIM_SLACK:
+                del self.wealth_history[:-self.snapshot_limit]
         
-        self.active_count_history.append(len(active_agents))
+        if exact:
+            self._refresh_statistics(wealths)
+            # Resync: drops the rounding drift of the bucket sums
+            self._rebuild_sketch(wealths)
+        else:
+            self.last_statistics = self.sketch.statistics()
         
-        if len(wealths) > 0:
-            # Only sort once and reuse
-            sorted_wealths = sorted(wealths, reverse=True)
-            
-            # Gini calculation
-            gini = self._calculate_gini_from_sorted(sorted_wealths)
+        if self.keep_history:
+            gini, active_count, top_10, top_1 = self.last_statistics
             self.gini_history.append(gini)
-            
-            # Top wealth shares (reuse sorted array)
-            total_wealth = sum(sorted_wealths)
-            if total_wealth > 0:
-                n_top_10 = max(1, int(len(sorted_wealths) * 0.10))
-                top_10 = (sum(sorted_wealths[:n_top_10]) / total_wealth) * 100
-                
-                n_top_1 = max(1, int(len(sorted_wealths) * 0.01))
-                top_1 = (sum(sorted_wealths[:n_top_1]) / total_wealth) * 100
-            else:
-                top_10 = 0.0
-                top_1 = 0.0
-            
+            self.active_count_history.append(active_count)
             self.top_10_percent_history.append(top_10)
             self.top_1_percent_history.append(top_1)
-        else:
-            self.gini_history.append(0.0)
-            self.top_10_percent_history.append(0.0)
-            self.top_1_percent_history.append(0.0)
+            for key, history in self.metrics_history.items():
+                history.append(self.last_metrics[key])
+            # Trim in batches so the front deletion is amortized
+            if self.history_limit and len(self.gini_history) > self.history_limit * TRIM_SLACK:
+                for history in (self.gini_history, self.active_count_history,
+                                self.top_10_percent_history, self.top_1_percent_history,
+                                *self.metrics_history.values()):
+                    del history[:-self.history_limit]
+        
+        for listener in self.listeners:
+            listener(self)
     
-    def _calculate_gini_from_sorted(self, sorted_wealths: List[float]) -> float:
-        """Calculate Gini coefficient from already-sorted wealth array"""
+    def _calculate_gini_from_sorted(self, sorted_wealths: np.ndarray) -> float:
+        """Calculate Gini coefficient from already-sorted (descending) wealth array"""
         if len(sorted_wealths) == 0:
             return 0.0
         
         # Reverse sort to ascending order for Gini formula
-        wealths = np.array(sorted_wealths[::-1])
+        wealths = np.asarray(sorted_wealths, dtype=np.float64)[::-1]
         n = len(wealths)
         
-        if wealths.sum() == 0:
+        total = wealths.sum()
+        if total == 0:
             return 0.0
         
         index = np.arange(1, n + 1)
-        gini = (2 * np.sum(index * wealths)) / (n * wealths.sum()) - (n + 1) / n
-        return gini
+        gini = (2 * np.dot(index, wealths)) / (n * total) - (n + 1) / n
+        return float(gini)
+    
+    def _check_convergence(self):
+        """Run the convergence detector on the recorded histories"""
+        if self.converged_at_round is not None:
+            return
+        
+        gini, active_count, _, _ = self.last_statistics
+        reason = self.convergence.update(gini, active_count)
+        if reason is not None:
+            self.converged_at_round = self.current_round
+            self.convergence_reason = reason
+    
+    @property
+    def converged(self) -> bool:
+        return self.converged_at_round is not None
     
-    def step(self) -> bool:
-        """Run one round of simulation. Returns True if simulation can continue."""
-        # Get active agents
-        active_agents = [a for a in self.agents if a.active]
+    def step(self, draws: Optional[Sequence[float]] = None) -> bool:
+        """Run one round of simulation. Returns True if simulation can continue.
         
-        if len(active_agents) < 2:
+        `draws` (uniforms in [0, 1): the two partner picks, the coin flip and
+        optionally candidate agent ids) replaces the engine's own random
+        numbers for the round, so several engines can share them (see
+        paired.PairedSimulation). Partners are the first active candidates;
+        the partner picks only index the active list when candidates run out.
+        """
+        if self.stop_on_convergence and self.converged:
             return False
         
-        # Randomly select two distinct agents
-        agent_a, agent_b = np.random.choice(active_agents, size=2, replace=False)
+        if self._n_active < 2:
+            return False
+        
+        # Randomly select two distinct (neighboring) agents
+        agent_a, agent_b = self._select_pair(draws)
+        if agent_a < 0:
+            # No active agent has an active neighbor left: nothing can change
+            if self.converged_at_round is None:
+                self.converged_at_round = self.current_round
+                self.convergence_reason = 'isolated'
+            return False
         
         # Execute wealth exchange
-        self._wealth_exchange(agent_a, agent_b)
+        self._wealth_exchange(agent_a, agent_b, None if draws is None else draws[2])
         
         # Apply redistribution policies
         taxes = self._apply_wealth_tax()
-        self.total_taxes_collected += taxes
+        if taxes:
+            self._taxes_total.add(taxes)
         
         ubi_distributed = self._distribute_ubi(taxes)
-        self.total_ubi_distributed += ubi_distributed
+        if ubi_distributed:
+            self._ubi_total.add(ubi_distributed)
         
         interventions = self._apply_safety_net()
         self.safety_net_interventions += interventions
         
-        # Record statistics
-        self._record_statistics()
-        
         self.current_round += 1
-        return True
+        if self.current_round > self.furthest_round:
+            self.furthest_round = self.current_round
+        
+        # Record statistics (every stats_interval rounds)
+        if self.current_round % self.stats_interval == 0:
+            self._record_statistics()
+            self._check_convergence()
+        
+        if self.checkpoint_interval and self.current_round % self.checkpoint_interval == 0:
+            self._save_checkpoint()
+        
+        return not (self.stop_on_convergence and self.converged)
+    
+    def run(self, max_rounds: int) -> int:
+        """Run up to max_rounds rounds, stopping early on convergence or when
+        fewer than two agents are left. Returns the number of rounds executed."""
+        start_round = self.current_round
+        for _ in range(max_rounds):
+            if not self.step():
+                break
+        return self.current_round - start_round
     
-    def get_current_results(self) -> dict:
-        """Get current simulation results"""
-        active_agents = [a for a in self.agents if a.active]
+    def _save_checkpoint(self):
+        """Snapshot everything the next rounds depend on (not the histories)"""
+        if not self.checkpoint_interval or self.current_round in self.checkpoints:
+            return
+        
+        self.checkpoints[self.current_round] = {
+            'wealth': self.wealth.copy(),
+            # Active-list order decides which agents get sampled, so keep it exactly
+            'order': self._active_ids.copy(),
+            'n_active': self._n_active,
+            'rng_state': self.rng.bit_generator.state,
+            'total_taxes_collected': self.total_taxes_collected,
+            'total_ubi_distributed': self.total_ubi_distributed,
+            'total_safety_net_paid': self.total_safety_net_paid,
+            'safety_net_interventions': self.safety_net_interventions,
+            'converged_at_round': self.converged_at_round,
+            'convergence_reason': self.convergence_reason,
+            'convergence': self.convergence.to_dict(),
+            'median_tracker': self.median_tracker.to_dict(),
+            'last_statistics': self.last_statistics,
+            'last_metrics': dict(self.last_metrics),
+        }
         
-        # Group by style
+        while self.max_checkpoints and len(self.checkpoints) > self.max_checkpoints:
+            # Thin out: keep every other checkpoint and double the interval
+            self.checkpoint_interval *= 2
+            self.checkpoints = {r: c for r, c in self.checkpoints.items()
+                                if r % self.checkpoint_interval == 0}
+    
+    def _restore_checkpoint(self, round_number: int):
+        """Put the engine back into the state saved at round_number"""
+        checkpoint = self.checkpoints[round_number]
+        self._truncate_history(round_number)
+        
+        self.wealth[:] = checkpoint['wealth']
+        self._active_ids = checkpoint['order'].astype(self._index_dtype)
+        self._active_pos[self._active_ids] = np.arange(self.n_agents)
+        self._n_active = checkpoint['n_active']
+        self.active[:] = False
+        self.active[self.active_ids] = True
+        self._recount_styles()
+        self._rebuild_sketch()
+        self.rng.bit_generator.state = checkpoint['rng_state']
+        
+        self.current_round = round_number
+        self.total_taxes_collected = checkpoint['total_taxes_collected']
+        self.total_ubi_distributed = checkpoint['total_ubi_distributed']
+        self.total_safety_net_paid = checkpoint.get('total_safety_net_paid', 0.0)
+        self.safety_net_interventions = checkpoint['safety_net_interventions']
+        self.converged_at_round = checkpoint['converged_at_round']
+        self.convergence_reason = checkpoint['convergence_reason']
+        self.convergence = ConvergenceDetector.from_dict(checkpoint['convergence'])
+        self.median_tracker = RunningQuantile.from_dict(checkpoint['median_tracker'])
+        self.last_statistics = checkpoint['last_statistics']
+        self.last_metrics = dict(checkpoint.get('last_metrics', {}))
+    
+    def _truncate_history(self, round_number: int):
+        """Drop history entries recorded after round_number
+        
+        Entries are recorded at every multiple of stats_interval (wealth
+        snapshots at multiples of lcm(stats_interval, 5)), so the count to drop
+        follows from the round numbers even when older entries were trimmed.
+        """
+        if not self.keep_history or round_number >= self.current_round:
+            return
+        
+        n_drop = self.current_round // self.stats_interval - round_number // self.stats_interval
+        if n_drop > 0:
+            keep = max(0, len(self.gini_history) - n_drop)
+            del self.gini_history[keep:]
+            del self.active_count_history[keep:]
+            del self.top_10_percent_history[keep:]
+            del self.top_1_percent_history[keep:]
+            for history in self.metrics_history.values():
+                del history[keep:]
+        
+        snapshot_interval = int(np.lcm(self.stats_interval, self.stats_record_interval))
+        n_drop = self.current_round // snapshot_interval - round_number // snapshot_interval
+        if n_drop > 0:
+            del self.wealth_history[max(0, len(self.wealth_history) - n_drop):]
+    
+    def seek(self, round_number: int) -> int:
+        """Move the simulation to round_number (backwards or forwards)
+        
+        Restores the nearest checkpoint at or before the target and replays
+        deterministically from there; the trajectory is identical to the
+        original run. Returns the round reached, which is earlier than the
+        target if the run stops (e.g. converges) before it.
+        """
+        round_number = max(0, int(round_number))
+        if round_number == self.current_round:
+            return self.current_round
+        
+        base = max((r for r in self.checkpoints if r <= round_number), default=None)
+        # Jumping ahead to a later checkpoint would leave a gap in the histories
+        skip_ahead = not self.keep_history and base is not None and base > self.current_round
+        if round_number < self.current_round or skip_ahead:
+            if base is None:
+                raise ValueError(f"No checkpoint at or before round {round_number} "
+                                 "(enable checkpoint_interval before reset)")
+            self._restore_checkpoint(base)
+        
+        self.run(round_number - self.current_round)
+        return self.current_round
+    
+    def snapshot(self, include_wealth: bool = False) -> StatsSnapshot:
+        """Compact immutable stats for the current round"""
+        if self.current_round % self.stats_interval == 0:
+            # Recorded by step() at this very round
+            gini, active_count, top_10, top_1 = self.last_statistics
+            metrics = self.last_metrics
+        elif self.sketch is not None:
+            gini, active_count, top_10, top_1 = self.sketch.statistics()
+            metrics = {}
+        else:
+            ascending = np.sort(self.wealth[self.active_ids])
+            gini, active_count, top_10, top_1 = self._statistics_from_sorted(ascending)
+            metrics = self.metrics.compute(ascending) if self.metrics is not None else {}
+        
+        wealth = None
+        if include_wealth:
+            wealth = self.wealth[self.active_ids]
+            wealth.flags.writeable = False
+        
+        return StatsSnapshot(
+            round=self.current_round, gini=gini, active_count=active_count,
+            top_10_percent=top_10, top_1_percent=top_1,
+            bankrupt_count=self.n_agents - self._n_active,
+            total_taxes_collected=self.total_taxes_collected,
+            total_ubi_distributed=self.total_ubi_distributed,
+            safety_net_interventions=self.safety_net_interventions,
+            converged_at_round=self.converged_at_round,
+            convergence_reason=self.convergence_reason,
+            wealth=wealth,
+            metrics=MappingProxyType(dict(metrics)) if self.metrics is not None else None,
+        )
+    
+    async def stream(self, every: int = 100, max_rounds: Optional[int] = None,
+                     include_wealth: bool = False, slice_seconds: float = 0.005) -> AsyncIterator[StatsSnapshot]:
+        """Advance the simulation and yield a StatsSnapshot every `every` rounds
+            
+            async for snap in sim.stream(every=1000, max_rounds=1_000_000):
+                print(snap.round, snap.gini)
+        
+        Rounds run in chunks sized to take about `slice_seconds`, with a
+        return to the event loop after each chunk, so many simulations can
+        share one loop fairly. Stops after max_rounds (None = until the run
+        stops on its own) with a final snapshot of the last round.
+        """
+        # Imported here: asyncio is most of the engine's own import time
+        import asyncio
+        
+        every = max(1, int(every))
+        end_round = None if max_rounds is None else self.current_round + max_rounds
+        chunk = 64
+        
+        yield self.snapshot(include_wealth)
+        last_yielded = self.current_round
+        
+        while end_round is None or self.current_round < end_round:
+            # Never run past the next snapshot or the end
+            limit = every - (self.current_round - last_yielded)
+            if end_round is not None:
+                limit = min(limit, end_round - self.current_round)
+            wanted = min(chunk, limit)
+            
+            start = time.perf_counter()
+            done = self.run(wanted)
+            elapsed = time.perf_counter() - start
+            
+            # Aim the next chunk at slice_seconds (within a factor of 4 per step)
+            if done == wanted:
+                scale = slice_seconds / elapsed if elapsed > 0 else 4.0
+                chunk = int(min(max(chunk * min(max(scale, 0.25), 4.0), 1), 1_000_000))
+            
+            if done < wanted:
+                # Converged or ran out of trading partners
+                if self.current_round != last_yielded:
+                    yield self.snapshot(include_wealth)
+                return
+            
+            if self.current_round - last_yielded >= every:
+                yield self.snapshot(include_wealth)
+                last_yielded = self.current_round
+            
+            await asyncio.sleep(0)
+        
+        if self.current_round != last_yielded:
+            yield self.snapshot(include_wealth)
+    
+    @property
+    def history_rounds(self) -> np.ndarray:
+        """Round number of each entry in the scalar histories
+        
+        Entries sit at every multiple of stats_interval up to the current
+        round, so this holds after trimming and seeking too.
+        """
+        last = self.current_round // self.stats_interval * self.stats_interval
+        n = len(self.gini_history)
+        return last - self.stats_interval * np.arange(n - 1, -1, -1)
+    
+    def get_current_results(self, include_agents: bool = True, include_wealths: bool = True) -> dict:
+        """Get current simulation results
+        
+        Per-style results come from the running aggregates in O(#styles).
+        The agent list and wealth array are the only O(N) parts; callers that
+        don't need them (e.g. per-tick UI updates) can leave them out.
+        """
         results_by_style = {}
-        for style in AgentStyle:
-            agents_of_style = [a for a in self.agents if a.style == style]
-            active_of_style = [a for a in agents_of_style if a.active]
+        for code, style in enumerate(STYLES):
+            total = self._style_totals[code]
+            active = self._style_active[code]
             
-            if len(agents_of_style) > 0:
-                survival_rate = len(active_of_style) / len(agents_of_style)
-                avg_wealth = np.mean([a.wealth for a in active_of_style]) if active_of_style else 0
+            if total > 0:
+                survival_rate = active / total
+                avg_wealth = self._style_wealth[code] / active if active else 0
             else:
                 survival_rate = 0
                 avg_wealth = 0
             
             results_by_style[style.value] = {
-                'total': len(agents_of_style),
-                'active': len(active_of_style),
+                'total': total,
+                'active': active,
                 'survival_rate': survival_rate,
                 'avg_wealth': avg_wealth
             }
         
         # Current wealth distribution
-        current_wealths = [a.wealth for a in active_agents]
+        current_wealths = self.wealth[self.active_ids] if include_wealths else None
         
         return {
             'gini_history': self.gini_history,
@@ -382,25 +1166,47 @@ class WealthInequalitySimulation:
             'top_1_percent_history': self.top_1_percent_history,
             'results_by_style': results_by_style,
             'current_wealths': current_wealths,
-            'agents': self.agents,
+            'agents': self.agents if include_agents else None,
             'n_rounds_completed': self.current_round,
-            'bankrupt_count': len([a for a in self.agents if not a.active]),
+            'bankrupt_count': self.n_agents - self._n_active,
             'total_taxes_collected': self.total_taxes_collected,
             'total_ubi_distributed': self.total_ubi_distributed,
+            'total_safety_net_paid': self.total_safety_net_paid,
             'safety_net_interventions': self.safety_net_interventions,
+            'converged_at_round': self.converged_at_round,
+            'convergence_reason': self.convergence_reason,
         }
     
-    def to_dict(self) -> dict:
+    def to_dict(self, max_history: Optional[int] = 1000, compact: bool = False) -> dict:
         """Serialize simulation state to dictionary for storage
-        Only keep last 1000 data points to prevent huge JSON payloads"""
-        max_history = 1000
+        Only keep last max_history data points (default 1000) to prevent huge JSON payloads
         
+        compact=True stores agents as NumPy arrays (for binary state stores);
+        otherwise agents and histories are base64 typed arrays (array_codec),
+        which stay JSON-friendly at roughly half the size of number lists.
+        """
         def limit_history(data_list):
             """Keep only recent history to limit size"""
-            if len(data_list) > max_history:
+            if max_history is not None and len(data_list) > max_history:
                 return data_list[-max_history:]
             return data_list
         
+        if compact:
+            agents = {'styles': self.styles.copy(), 'wealth': self.wealth.copy(),
+                      'active': self.active.copy(), 'order': self._active_ids.copy()}
+        else:
+            # Wealth and histories keep full precision so a round trip is exact
+            wealth_code = 'f4' if self.precision == 'float32' else 'f8'
+            agents = {'styles': encode_array(self.styles, 'i1'),
+                      'wealth': encode_array(self.wealth, wealth_code),
+                      'active': encode_array(self.active, 'u1'),
+                      'order': encode_array(self._active_ids, 'u4')}
+        
+        def encode(data_list, dtype='f8'):
+            # Histories: plain lists (compact) or base64 typed arrays (JSON)
+            recent = limit_history(data_list)
+            return recent if compact else encode_array(recent, dtype)
+        
         return {
             # Parameters
             'n_agents': self.n_agents,
@@ -412,26 +1218,64 @@ class WealthInequalitySimulation:
             'wealth_tax_enabled': self.wealth_tax_enabled,
             'wealth_tax_threshold': self.wealth_tax_threshold,
             'wealth_tax_rate': self.wealth_tax_rate,
+            'wealth_tax_mode': self.wealth_tax_mode,
+            'wealth_tax_exponent': self.wealth_tax_exponent,
+            'wealth_tax_max_rate': self.wealth_tax_max_rate,
+            'wealth_tax_interval': self.wealth_tax_interval,
             'ubi_enabled': self.ubi_enabled,
             'ubi_amount': self.ubi_amount,
             'safety_net_enabled': self.safety_net_enabled,
             'safety_net_floor': self.safety_net_floor,
+            'convergence': self.convergence.to_dict(),
+            'stop_on_convergence': self.stop_on_convergence,
+            'topology': self.topology.to_dict() if self.topology is not None else None,
+            'seed': self.seed,
+            'stats_interval': self.stats_interval,
+            'keep_history': self.keep_history,
+            'checkpoint_interval': self.checkpoint_interval,
+            'max_checkpoints': self.max_checkpoints,
+            'furthest_round': self.furthest_round,
+            'precision': self.precision,
+            'memory_budget': self.memory_budget,
+            'stats_record_interval': self.stats_record_interval,
+            'history_limit': self.history_limit,
+            'snapshot_limit': self.snapshot_limit,
+            'snapshot_mode': self.snapshot_mode,
+            'snapshot_bins': self.snapshot_bins,
+            'snapshot_quantiles': self.snapshot_quantiles,
+            'metrics': self.metrics.to_dict() if self.metrics is not None else None,
+            'stats_mode': self.stats_mode,
+            'sketch_accuracy': self.sketch_accuracy,
+            'exact_stats_interval': self.exact_stats_interval,
+            # Generator state as a JSON string (128-bit ints don't survive JS numbers)
+            'rng_state': json.dumps(self.rng.bit_generator.state),
             # State - only serialize agents and recent history
-            'agents': [{'id': a.id, 'style': a.style.value, 'wealth': a.wealth, 'active': a.active} 
-                      for a in self.agents],
-            'gini_history': limit_history(self.gini_history),
-            'active_count_history': limit_history(self.active_count_history),
-            'top_10_percent_history': limit_history(self.top_10_percent_history),
-            'top_1_percent_history': limit_history(self.top_1_percent_history),
+            'agents': agents,
+            'gini_history': encode(self.gini_history),
+            'active_count_history': encode(self.active_count_history, 'i4'),
+            'top_10_percent_history': encode(self.top_10_percent_history),
+            'top_1_percent_history': encode(self.top_1_percent_history),
+            'metrics_history': {key: encode(history) for key, history in self.metrics_history.items()},
+            # Summary snapshots are a few KB each: binary stores keep them (full arrays are dropped)
+            'wealth_history': (self.wealth_history.to_dict(max_history)
+                               if compact and self.snapshot_mode != 'full' else None),
             'current_round': self.current_round,
             'total_taxes_collected': self.total_taxes_collected,
             'total_ubi_distributed': self.total_ubi_distributed,
+            'total_safety_net_paid': self.total_safety_net_paid,
             'safety_net_interventions': self.safety_net_interventions,
+            'converged_at_round': self.converged_at_round,
+            'convergence_reason': self.convergence_reason,
+            'median_tracker': self.median_tracker.to_dict(),
+            # Checkpoints hold arrays: binary stores only
+            'checkpoints': self.checkpoints if compact else {},
         }
     
     @classmethod
     def from_dict(cls, data: dict) -> 'WealthInequalitySimulation':
         """Deserialize simulation state from dictionary"""
+        topology_data = data.get('topology')
+        
         # Create instance without initialization
         sim = cls(
             n_agents=data['n_agents'],
@@ -443,31 +1287,86 @@ class WealthInequalitySimulation:
             wealth_tax_enabled=data['wealth_tax_enabled'],
             wealth_tax_threshold=data['wealth_tax_threshold'],
             wealth_tax_rate=data['wealth_tax_rate'],
+            wealth_tax_mode=data.get('wealth_tax_mode', 'flat'),
+            wealth_tax_exponent=data.get('wealth_tax_exponent', 1.0),
+            wealth_tax_max_rate=data.get('wealth_tax_max_rate', 0.5),
+            wealth_tax_interval=data.get('wealth_tax_interval', 1),
             ubi_enabled=data['ubi_enabled'],
             ubi_amount=data['ubi_amount'],
             safety_net_enabled=data['safety_net_enabled'],
             safety_net_floor=data['safety_net_floor'],
+            convergence=ConvergenceDetector.from_dict(data.get('convergence')),
+            stop_on_convergence=data.get('stop_on_convergence', True),
+            topology=Topology.from_dict(topology_data, data['n_agents']) if topology_data else None,
+            seed=data.get('seed'),
+            stats_interval=data.get('stats_interval', 1),
+            keep_history=data.get('keep_history', True),
+            checkpoint_interval=data.get('checkpoint_interval'),
+            max_checkpoints=data.get('max_checkpoints'),
+            precision=data.get('precision', 'float64'),
+            history_limit=data.get('history_limit'),
+            snapshot_limit=data.get('snapshot_limit'),
+            snapshot_mode=data.get('snapshot_mode', 'full'),
+            snapshot_bins=data.get('snapshot_bins', 256),
+            snapshot_quantiles=data.get('snapshot_quantiles', 1000),
+            metrics=InequalityMetrics.from_dict(data.get('metrics')),
+            stats_mode=data.get('stats_mode', 'exact'),
+            sketch_accuracy=data.get('sketch_accuracy', 0.01),
+            exact_stats_interval=data.get('exact_stats_interval'),
             _skip_init=True
         )
+        if data.get('rng_state'):
+            sim.rng.bit_generator.state = json.loads(data['rng_state'])
         
         # Restore agents
-        sim.agents = [Agent(
-            id=a['id'],
-            style=AgentStyle(a['style']),
-            wealth=a['wealth'],
-            active=a['active']
-        ) for a in data['agents']]
-        
-        # Restore history (wealth_history not serialized to save space)
-        sim.wealth_history = []  # Not needed for display
-        sim.gini_history = data['gini_history']
-        sim.active_count_history = data['active_count_history']
-        sim.top_10_percent_history = data['top_10_percent_history']
-        sim.top_1_percent_history = data['top_1_percent_history']
+        agents = data['agents']
+        if isinstance(agents, dict):
+            # Array form: NumPy arrays (compact) or base64 typed arrays (JSON)
+            sim.styles[:] = decode_array(agents['styles'])
+            sim.wealth[:] = decode_array(agents['wealth'])
+            sim.active[:] = decode_array(agents['active'])
+        else:
+            style_codes = {style.value: code for code, style in enumerate(STYLES)}
+            sim.styles[:] = [style_codes[a['style']] for a in agents]
+            sim.wealth[:] = [a['wealth'] for a in agents]
+            sim.active[:] = [a['active'] for a in agents]
+        sim._stake_fraction[:] = STAKE_FRACTIONS[sim.styles]
+        if isinstance(agents, dict) and 'order' in agents:
+            # Exact active-list order keeps the continued run reproducible
+            sim._active_ids = decode_array(agents['order']).astype(sim._index_dtype)
+            sim._active_pos[sim._active_ids] = np.arange(sim.n_agents)
+            sim._n_active = int(sim.active.sum())
+        else:
+            sim._rebuild_active_index()
+        sim._recount_styles()
+        sim._rebuild_sketch()
+        
+        def decode_history(values):
+            # Lists (compact and older payloads) or base64 typed arrays
+            return decode_array(values).tolist() if is_encoded(values) else list(values)
+        
+        # Restore history (full wealth snapshots are not serialized to save space)
+        if data.get('wealth_history'):
+            sim.wealth_history = SnapshotStore.from_dict(data['wealth_history'])
+        sim.gini_history = decode_history(data['gini_history'])
+        sim.active_count_history = decode_history(data['active_count_history'])
+        sim.top_10_percent_history = decode_history(data['top_10_percent_history'])
+        sim.top_1_percent_history = decode_history(data['top_1_percent_history'])
+        for key, history in (data.get('metrics_history') or {}).items():
+            sim.metrics_history[key] = decode_history(history)
         sim.current_round = data['current_round']
         sim.total_taxes_collected = data['total_taxes_collected']
         sim.total_ubi_distributed = data['total_ubi_distributed']
+        sim.total_safety_net_paid = data.get('total_safety_net_paid', 0.0)
         sim.safety_net_interventions = data['safety_net_interventions']
+        sim.converged_at_round = data.get('converged_at_round')
+        sim.convergence_reason = data.get('convergence_reason')
+        sim._refresh_statistics()
+        sim.median_tracker = RunningQuantile.from_dict(data.get('median_tracker'))
+        sim.checkpoints = dict(data.get('checkpoints') or {})
+        # Planned once at creation - restore the outcome rather than re-planning
+        sim.memory_budget = data.get('memory_budget')
+        sim.stats_record_interval = data.get('stats_record_interval', 5)
+        sim.furthest_round = data.get('furthest_round', sim.current_round)
         
         return sim
-
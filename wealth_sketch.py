@@ -0,0 +1,289 @@
+"""Mergeable log-bucket sketch of a wealth distribution
+
+`WealthSketch` is a DDSketch-style quantile sketch: value v > min_value
+falls in bucket k = ceil(log_gamma v) with gamma = (1 + a) / (1 - a), so
+every bucket spans a relative width of gamma and its representative value
+is within relative error a of anything in it. Each bucket also keeps the
+sum and the sum of squares of its values. Unlike KLL or t-digest, this supports deletes:
+a trade moves two agents between buckets in O(1), so the sketch follows
+the live population instead of a stream of insertions.
+
+Because buckets are disjoint value ranges, the grouped data gives
+guaranteed bounds (n = count, a = relative_accuracy):
+
+- Gini: pairs in different buckets contribute exactly; only pairs inside
+  one bucket are unknown, so the true Gini lies in [lower, lower + width]
+  with width <= (gamma - 1) / 4 = a / (2 (1 - a)), about 0.0051 for a = 1%
+  (far less in practice: the bucket variances also cap it, so identical
+  values cost nothing). The estimate adds the within-bucket term of a
+  uniform spread with each bucket's variance.
+- Top shares: only the bucket straddling the cutoff is split, so the true
+  share lies in [low, high] with high - low < (gamma - 1) * share, i.e.
+  relative error below 2a / (1 - a), about 2% for a = 1%.
+
+Sketches with the same accuracy merge by adding buckets (shards,
+replicas), and merging is exact: a merged sketch equals the sketch of the
+pooled values.
+"""
+import math
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+
+class WealthSketch:
+    """Counts and sums of values in logarithmic buckets, with inserts and deletes
+    
+    Values at or below min_value join the lowest bucket, which starts at 0.
+    """
+    
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 1e-9):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f"relative_accuracy must be in (0, 1), got {relative_accuracy}")
+        self.relative_accuracy = float(relative_accuracy)
+        self.min_value = float(min_value)
+        self.gamma = (1 + self.relative_accuracy) / (1 - self.relative_accuracy)
+        self._inv_log_gamma = 1.0 / math.log(self.gamma)
+        self._k_min = math.ceil(math.log(self.min_value) * self._inv_log_gamma)
+        self._counts: Dict[int, int] = {}
+        self._sums: Dict[int, float] = {}
+        self._squares: Dict[int, float] = {}
+        self.count = 0
+    
+    @classmethod
+    def from_values(cls, values: np.ndarray, relative_accuracy: float = 0.01,
+                    min_value: float = 1e-9) -> 'WealthSketch':
+        sketch = cls(relative_accuracy, min_value)
+        sketch.insert_many(values)
+        return sketch
+    
+    # --- Bucket indices ----------------------------------------------------
+    
+    def index(self, value: float) -> int:
+        """Bucket of one value"""
+        if value <= self.min_value:
+            return self._k_min
+        return math.ceil(math.log(value) * self._inv_log_gamma)
+    
+    def indices(self, values: np.ndarray) -> np.ndarray:
+        """Buckets of an array of values, identical to index() element by element"""
+        values = np.asarray(values, dtype=np.float64)
+        x = np.log(np.maximum(values, self.min_value)) * self._inv_log_gamma
+        result = np.ceil(x).astype(np.int64)
+        # np.log may differ from math.log in the last ulp: settle values next
+        # to a bucket edge the scalar way so inserts and deletes always agree
+        for i in np.flatnonzero(np.abs(x - np.rint(x)) < 1e-7):
+            result[i] = self.index(float(values[i]))
+        result[values <= self.min_value] = self._k_min
+        return result
+    
+    def _bump(self, k: int, count: int, amount: float, square: float):
+        remaining = self._counts.get(k, 0) + count
+        if remaining:
+            self._counts[k] = remaining
+            self._sums[k] = self._sums.get(k, 0.0) + amount
+            self._squares[k] = self._squares.get(k, 0.0) + square
+        else:
+            # Empty buckets are dropped, which also clears rounding drift in the sums
+            self._counts.pop(k, None)
+            self._sums.pop(k, None)
+            self._squares.pop(k, None)
+        self.count += count
+    
+    # --- Updates -----------------------------------------------------------
+    
+    def insert(self, value: float):
+        self._bump(self.index(value), 1, value, value * value)
+    
+    def delete(self, value: float):
+        """Remove one previously inserted value"""
+        self._bump(self.index(value), -1, -value, -value * value)
+    
+    def move(self, old: float, new: float):
+        """Replace one value (an agent's wealth before and after a change)"""
+        floor, inv = self.min_value, self._inv_log_gamma
+        i = math.ceil(math.log(old) * inv) if old > floor else self._k_min
+        j = math.ceil(math.log(new) * inv) if new > floor else self._k_min
+        counts, sums, squares = self._counts, self._sums, self._squares
+        if i == j:
+            sums[i] += new - old
+            squares[i] += new * new - old * old
+            return
+        # Inlined _bump pair (this runs twice per trade)
+        remaining = counts[i] - 1
+        if remaining:
+            counts[i] = remaining
+            sums[i] -= old
+            squares[i] -= old * old
+        else:
+            del counts[i], sums[i], squares[i]
+        if j in counts:
+            counts[j] += 1
+            sums[j] += new
+            squares[j] += new * new
+        else:
+            counts[j] = 1
+            sums[j] = new
+            squares[j] = new * new
+    
+    def insert_many(self, values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64)
+        self._apply_many([self.indices(values)], [values], [1])
+    
+    def delete_many(self, values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64)
+        self._apply_many([self.indices(values)], [values], [-1])
+    
+    def move_many(self, old: np.ndarray, new: np.ndarray):
+        """Replace old[i] by new[i] for every i; O(len + #buckets), no sort"""
+        old = np.asarray(old, dtype=np.float64)
+        new = np.asarray(new, dtype=np.float64)
+        self._apply_many([self.indices(old), self.indices(new)], [old, new], [-1, 1])
+    
+    def _apply_many(self, index_arrays, value_arrays, signs):
+        index_arrays = [k for k in index_arrays if len(k)]
+        if not index_arrays:
+            return
+        # Buckets span a narrow index range: bincount instead of a sort
+        lo = min(int(k.min()) for k in index_arrays)
+        size = max(int(k.max()) for k in index_arrays) - lo + 1
+        counts = np.zeros(size, dtype=np.int64)
+        sums = np.zeros(size)
+        squares = np.zeros(size)
+        for k, values, sign in zip(index_arrays, value_arrays, signs):
+            counts += sign * np.bincount(k - lo, minlength=size)
+            sums += sign * np.bincount(k - lo, weights=values, minlength=size)
+            squares += sign * np.bincount(k - lo, weights=values * values, minlength=size)
+        for offset in np.flatnonzero((counts != 0) | (sums != 0)).tolist():
+            self._bump(lo + offset, int(counts[offset]), float(sums[offset]), float(squares[offset]))
+    
+    def merge(self, other: 'WealthSketch') -> 'WealthSketch':
+        """Add another sketch's values to this one (in place); returns self"""
+        if other.gamma != self.gamma or other.min_value != self.min_value:
+            raise ValueError("Only sketches with the same accuracy and min_value can be merged")
+        for k, count in other._counts.items():
+            self._bump(k, count, other._sums[k], other._squares[k])
+        return self
+    
+    def copy(self) -> 'WealthSketch':
+        sketch = WealthSketch(self.relative_accuracy, self.min_value)
+        sketch._counts = dict(self._counts)
+        sketch._sums = dict(self._sums)
+        sketch._squares = dict(self._squares)
+        sketch.count = self.count
+        return sketch
+    
+    # --- Queries -----------------------------------------------------------
+    
+    @property
+    def total(self) -> float:
+        return float(math.fsum(self._sums.values()))
+    
+    @property
+    def n_buckets(self) -> int:
+        return len(self._counts)
+    
+    def buckets(self) -> Tuple[np.ndarray, ...]:
+        """Ascending (index, count, sum, sum of squares, lower edge, upper edge) of the non-empty buckets"""
+        keys = sorted(self._counts)
+        counts = np.array([self._counts[k] for k in keys], dtype=np.float64)
+        sums = np.array([self._sums[k] for k in keys])
+        squares = np.array([self._squares[k] for k in keys])
+        keys = np.array(keys, dtype=np.int64)
+        upper = self.gamma ** keys.astype(np.float64)
+        lower = np.where(keys == self._k_min, 0.0, upper / self.gamma)
+        return keys, counts, sums, squares, lower, upper
+    
+    def quantile(self, q: float) -> float:
+        """Value at quantile q, within relative error relative_accuracy"""
+        if self.count == 0:
+            return 0.0
+        keys, counts, sums, _, _, _ = self.buckets()
+        b = int(np.searchsorted(np.cumsum(counts), q * (self.count - 1), side='right'))
+        b = min(b, len(keys) - 1)
+        if keys[b] == self._k_min:
+            return float(sums[b] / counts[b])
+        return float(2 * self.gamma ** float(keys[b]) / (self.gamma + 1))
+    
+    def gini_bounds(self) -> Tuple[float, float, float]:
+        """(estimate, lower, upper) Gini coefficient; the true value is within [lower, upper]"""
+        return self._gini(self.buckets(), self.total)
+    
+    def top_share_bounds(self, fraction: float) -> Tuple[float, float, float]:
+        """(estimate, lower, upper) % of the total held by the richest max(1, fraction * n)"""
+        return self._top_share(self.buckets(), self.total, fraction)
+    
+    def statistics(self) -> Tuple[float, int, float, float]:
+        """Estimated (gini, count, top 10% share, top 1% share), as the engine reports them"""
+        buckets, total = self.buckets(), self.total
+        return (self._gini(buckets, total)[0], self.count,
+                self._top_share(buckets, total, 0.10)[0], self._top_share(buckets, total, 0.01)[0])
+    
+    def _gini(self, buckets, total: float) -> Tuple[float, float, float]:
+        if self.count == 0 or total <= 0:
+            return 0.0, 0.0, 0.0
+        _, counts, sums, squares, lower, upper = buckets
+        # sum_{i<j} |w_i - w_j| across buckets is exact from the counts and sums
+        counts_below = np.cumsum(counts) - counts
+        sums_below = np.cumsum(sums) - sums
+        cross = float(np.dot(counts_below, sums) - np.dot(sums_below, counts))
+        # Within a bucket of width d and standard deviation s the pair sum is at
+        # most min(n^2 d / 4, n s sqrt(n (n - 1) / 2)) (Cauchy-Schwarz), and
+        # n (n - 1) s / sqrt(3) for a uniform spread
+        std = np.sqrt(np.maximum(squares / counts - (sums / counts) ** 2, 0.0))
+        pairs = counts * (counts - 1) / 2
+        within_max = float(np.minimum(counts * counts * (upper - lower) / 4,
+                                      counts * std * np.sqrt(pairs)).sum())
+        within_uniform = min(float(np.dot(pairs, std)) * 2 / np.sqrt(3), within_max)
+        scale = self.count * total
+        # Clipped: with everything near 0, rounding drift in the lowest bucket dominates
+        return tuple(float(np.clip(pair_sum / scale, 0.0, 1.0)) for pair_sum in
+                     (cross + within_uniform, cross, cross + within_max))
+    
+    def _top_share(self, buckets, total: float, fraction: float) -> Tuple[float, float, float]:
+        if self.count == 0 or total <= 0:
+            return 0.0, 0.0, 0.0
+        _, counts, sums, squares, lower, upper = buckets
+        counts, sums, squares = counts[::-1], sums[::-1], squares[::-1]
+        lower, upper = lower[::-1], upper[::-1]
+        needed = max(1, int(self.count * fraction))
+        cumulative = np.cumsum(counts)
+        b = min(int(np.searchsorted(cumulative, needed)), len(counts) - 1)
+        above = float(sums[:b].sum())
+        # r richest of the straddling bucket: at least its mean each, at most
+        # its upper edge, the others hold at least the lower edge, and they
+        # exceed the mean by at most s sqrt(r (n - r)) in total
+        n, r = counts[b], needed - (cumulative[b] - counts[b])
+        mean = sums[b] / n
+        std = np.sqrt(max(squares[b] / n - mean * mean, 0.0))
+        low = above + r * mean
+        high = above + min(r * upper[b], sums[b] - (n - r) * lower[b],
+                           r * mean + std * np.sqrt(r * (n - r)))
+        high = max(high, low)
+        return tuple(float(np.clip(x / total * 100, 0.0, 100.0)) for x in ((low + high) / 2, low, high))
+    
+    def to_dict(self) -> dict:
+        keys = sorted(self._counts)
+        return {'relative_accuracy': self.relative_accuracy, 'min_value': self.min_value,
+                'keys': keys, 'counts': [self._counts[k] for k in keys],
+                'sums': [self._sums[k] for k in keys], 'squares': [self._squares[k] for k in keys]}
+    
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> Optional['WealthSketch']:
+        if not data:
+            return None
+        sketch = cls(data['relative_accuracy'], data['min_value'])
+        for k, count, amount, square in zip(data['keys'], data['counts'], data['sums'], data['squares']):
+            sketch._bump(int(k), int(count), float(amount), float(square))
+        return sketch
+
+
+def merge_sketches(sketches: Iterable[WealthSketch]) -> WealthSketch:
+    """One sketch of the pooled values of several (e.g. one per shard or replica)"""
+    sketches = list(sketches)
+    if not sketches:
+        raise ValueError("Nothing to merge")
+    merged = sketches[0].copy()
+    for sketch in sketches[1:]:
+        merged.merge(sketch)
+    return merged